@@ -0,0 +1,268 @@
+"""
+Archive closed years of expenses into a SQLite file next to the database.
+
+Usage (from the backend directory):
+
+    python -m app.archive list
+    python -m app.archive archive 2021
+    python -m app.archive unarchive 2021
+
+Archived rows are moved out of the hot gastos table into a single
+``<database>.archive.db`` file, which also lists the archived years. Every
+pooled connection attaches it read-only as ``archive`` (one attachment,
+however many years are archived: SQLite allows at most ten), and
+GastoRepository adds it to queries whose date range reaches an archived
+year, so queries on the current year only ever touch the hot table.
+Monthly totals (resumen_mensual) stay in the main database and are not
+affected. When a running server sees the archive change (archived from
+this command or in process), it drops its analytics snapshot and cached
+summaries, which were computed from where the rows used to be.
+"""
+import argparse
+import os
+import sqlite3
+from contextlib import closing
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, event, func, select, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, aliased
+
+from .models.gasto import Gasto
+
+SCHEMA = "archive"
+
+_archive_metadata = MetaData()
+
+# Years whose expenses are in the archive file
+anios_archivados = Table(
+    "anios_archivados", _archive_metadata, Column("anio", Integer, primary_key=True)
+)
+
+_attached_metadata = MetaData()
+archive_table = Gasto.__table__.to_metadata(_attached_metadata, schema=SCHEMA)
+
+
+def archive_path(bind: Engine) -> Path | None:
+    """Archive file of a SQLite file database, None for other databases"""
+    if bind.dialect.name != "sqlite" or not bind.url.database or bind.url.database == ":memory:":
+        return None
+    database = Path(bind.url.database)
+    return database.parent / f"{database.name}.archive.db"
+
+
+def _read_years(connection, table: str) -> set[int]:
+    return {anio for (anio,) in connection.execute(f"SELECT anio FROM {table}")}
+
+
+def archived_years(bind: Engine) -> set[int]:
+    """Years held by the archive of a database"""
+    path = archive_path(bind)
+    if path is None or not path.exists():
+        return set()
+    with closing(sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)) as conn:
+        return _read_years(conn, anios_archivados.name)
+
+
+def install_archive_attach(bind: Engine) -> None:
+    """Keep the archive of a SQLite database attached to every pooled connection"""
+    path = archive_path(bind)
+    if path is None:
+        return
+    # Archive mtime last seen by any connection of the engine
+    seen = {"mtime": 0}
+
+    @event.listens_for(bind, "checkout")
+    def sync_archive(dbapi_connection, connection_record, connection_proxy):
+        # Checkout happens between transactions, where ATTACH/DETACH are allowed
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        info = connection_record.info
+        if info.get("archive_mtime", 0) == mtime:
+            return
+
+        attached = info.get("archive_attached", False)
+        if mtime is None:
+            if attached:
+                dbapi_connection.execute(f"DETACH DATABASE {SCHEMA}")
+            years = set()
+        else:
+            if not attached:
+                uri = f"{path.resolve().as_uri()}?mode=ro"
+                dbapi_connection.execute(f"ATTACH DATABASE ? AS {SCHEMA}", (uri,))
+            years = _read_years(dbapi_connection, f"{SCHEMA}.{anios_archivados.name}")
+        info["archive_attached"] = mtime is not None
+        info["archive_years"] = years
+        info["archive_mtime"] = mtime
+        if seen["mtime"] != mtime:
+            if seen["mtime"] != 0:
+                _forget_derived(bind)
+            seen["mtime"] = mtime
+
+
+def _forget_derived(bind: Engine) -> None:
+    """Drop the analytics snapshot and cached summaries of a database whose archive changed"""
+    from .services.analytics_store import get_expense_store
+    from .services.result_cache import database_tag, summary_cache
+
+    with Session(bind) as db:
+        store = get_expense_store(db)
+        if store is not None:
+            store.clear()
+        summary_cache.invalidate(database_tag(db))
+
+
+def gastos_for_range(db: Session, start: date | None, end: date | None):
+    """
+    Gasto, or an alias of it that also covers the archive
+
+    The archive is only included if it is attached to the session's
+    connection and holds a year overlapping start..end (open ended when
+    None).
+    """
+    years = db.connection().info.get("archive_years")
+    if not years:
+        return Gasto
+
+    first = start.year if start is not None else min(years)
+    last = end.year if end is not None else max(years)
+    if not any(first <= year <= last for year in years):
+        return Gasto
+
+    union = union_all(select(Gasto.__table__), select(archive_table)).subquery(Gasto.__tablename__)
+    return aliased(Gasto, union)
+
+
+def _create_archive(path: Path) -> None:
+    """Create an empty archive file, complete before it becomes visible"""
+    partial = path.with_name(f"{path.name}.partial")
+    partial.unlink(missing_ok=True)
+    archive_engine = create_engine(f"sqlite:///{partial}")
+    Gasto.__table__.create(archive_engine)
+    anios_archivados.create(archive_engine)
+    archive_engine.dispose()
+    os.replace(partial, path)
+
+
+def _copy_columns() -> str:
+    return ", ".join(column.name for column in Gasto.__table__.columns)
+
+
+def archive_year(bind: Engine, year: int) -> int:
+    """Move the expenses of a closed year into the archive, returns the rows moved"""
+    if year >= date.today().year:
+        raise ValueError(f"Year {year} is not closed yet")
+    path = archive_path(bind)
+    if path is None:
+        raise ValueError("Archiving is only supported for SQLite file databases")
+    if year in archived_years(bind):
+        raise ValueError(f"Year {year} is already archived")
+
+    first_day, last_day = date(year, 1, 1), date(year, 12, 31)
+    with bind.connect() as conn:
+        max_archived = conn.execute(
+            select(func.max(Gasto.id)).where(Gasto.fecha.between(first_day, last_day))
+        ).scalar()
+        if max_archived is None:
+            return 0
+        # Without AUTOINCREMENT (tables created before it) SQLite hands out
+        # max(id) + 1, so archiving the newest rows would let ids be reused
+        autoincrement = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'gastos' AND sql LIKE '%AUTOINCREMENT%'"
+        ).first()
+        if not autoincrement:
+            max_hot = conn.execute(
+                select(func.max(Gasto.id)).where(~Gasto.fecha.between(first_day, last_day))
+            ).scalar()
+            if max_hot is None or max_hot < max_archived:
+                raise ValueError(f"Year {year} holds the newest expense ids and cannot be archived")
+    if not path.exists():
+        _create_archive(path)
+
+    start, end = first_day.isoformat(), last_day.isoformat()
+    columns = _copy_columns()
+    with bind.connect() as conn:
+        conn.exec_driver_sql("ATTACH DATABASE ? AS staging", (str(path),))
+        conn.commit()
+        try:
+            # Both files commit atomically in one transaction
+            with conn.begin():
+                moved = conn.exec_driver_sql(
+                    f"INSERT INTO staging.gastos ({columns}) "
+                    f"SELECT {columns} FROM main.gastos WHERE fecha BETWEEN ? AND ?",
+                    (start, end)
+                ).rowcount
+                conn.exec_driver_sql("INSERT INTO staging.anios_archivados (anio) VALUES (?)", (year,))
+                conn.exec_driver_sql(
+                    "DELETE FROM main.gastos WHERE fecha BETWEEN ? AND ?", (start, end)
+                )
+        finally:
+            conn.exec_driver_sql("DETACH DATABASE staging")
+            conn.commit()
+    return moved
+
+
+def unarchive_year(bind: Engine, year: int) -> int:
+    """Move the expenses of an archived year back into the hot table, returns the rows moved"""
+    if year not in archived_years(bind):
+        raise ValueError(f"Year {year} is not archived")
+
+    start, end = date(year, 1, 1).isoformat(), date(year, 12, 31).isoformat()
+    columns = _copy_columns()
+    with bind.connect() as conn:
+        conn.exec_driver_sql("ATTACH DATABASE ? AS staging", (str(archive_path(bind)),))
+        conn.commit()
+        try:
+            # Moved in one transaction so no reader sees the rows twice
+            with conn.begin():
+                moved = conn.exec_driver_sql(
+                    f"INSERT INTO main.gastos ({columns}) "
+                    f"SELECT {columns} FROM staging.gastos WHERE fecha BETWEEN ? AND ?",
+                    (start, end)
+                ).rowcount
+                conn.exec_driver_sql(
+                    "DELETE FROM staging.gastos WHERE fecha BETWEEN ? AND ?", (start, end)
+                )
+                conn.exec_driver_sql("DELETE FROM staging.anios_archivados WHERE anio = ?", (year,))
+        finally:
+            conn.exec_driver_sql("DETACH DATABASE staging")
+            conn.commit()
+    return moved
+
+
+def main(argv: list[str] | None = None) -> None:
+    from .database import engine as default_engine, init_db, make_engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.archive", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to archive (default: settings)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List archived years")
+    for command in ("archive", "unarchive"):
+        commands.add_parser(command, help=f"{command.capitalize()} a year").add_argument("year", type=int)
+    commands.choices["archive"].add_argument(
+        "--vacuum", action="store_true", help="Shrink the main database file afterwards"
+    )
+
+    args = parser.parse_args(argv)
+    bind = make_engine(args.database_url) if args.database_url else default_engine
+    init_db(bind)
+
+    if args.command == "list":
+        for year in sorted(archived_years(bind)):
+            print(year)
+    elif args.command == "archive":
+        print(f"[OK] Archived {archive_year(bind, args.year)} expenses of {args.year}")
+        if args.vacuum:
+            with bind.connect() as conn:
+                conn.exec_driver_sql("VACUUM")
+            print("[OK] Vacuumed the main database")
+    else:
+        print(f"[OK] Restored {unarchive_year(bind, args.year)} expenses of {args.year}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from typing import Literal
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 
@@ -7,6 +9,102 @@ class Settings(BaseSettings):
     debug: bool = True
 
     database_url: str = "sqlite:///./expenses.db"
+    # Journal mode set on every SQLite connection, e.g. "wal" so readers
+    # (and online backups) never block writers; unset keeps the file's mode
+    sqlite_journal_mode: str | None = None
+
+    # Connection pool (PostgreSQL and other server databases)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+
+    # Rows fetched per round trip when streaming exports
+    export_batch_size: int = 1000
+
+    # Group commit: expense creates/deletes are queued to one writer task per
+    # database, which commits everything pending every few ms or N writes
+    group_commit_enabled: bool = False
+    group_commit_max_delay_ms: float = 2
+    group_commit_max_batch: int = 256
+
+    # Online SQLite backups in WAL mode copy this many pages per step,
+    # sleeping in between to leave I/O for live traffic
+    backup_pages_per_step: int = 256
+    backup_sleep_seconds: float = 0.005
+
+    # Multi-tenant routing: "single" uses database_url for everyone,
+    # "per_user" gives each provisioned tenant its own SQLite file, chosen by
+    # the bearer token of the request
+    tenant_mode: Literal["single", "per_user"] = "single"
+    tenant_db_dir: str = "./tenants"
+    tenant_engine_cache_size: int = 64
+
+    # Key signing bearer tokens (required in per_user mode)
+    auth_secret: str | None = None
+
+    # Sent as X-Admin-Token to admin endpoints that expose data (slow
+    # statements, backups); unset disables them
+    admin_token: str | None = None
+
+    # In-memory columnar snapshot used for dashboard analytics
+    analytics_store_enabled: bool = False
+
+    # Memory bound of the summary result cache, 0 disables it
+    summary_cache_max_bytes: int = 8 * 1024 * 1024
+
+    # Statements slower than this are logged with their plan (unset disables it)
+    slow_query_threshold_ms: float | None = None
+    slow_query_log_size: int = 100
+
+    # Days of history (today included) the spend forecast is fitted on
+    forecast_history_days: int = 3653
+
+    # Yearly reports are built in a process pool and cached on disk by data version
+    report_workers: int = 2
+    report_cache_dir: str = "./reports"
+    report_jobs_max: int = 256
+    report_cache_max_files: int = 256
+
+    # Fractions of a category budget that raise an alert when crossed
+    budget_thresholds: list[float] = [0.8, 1.0]
+
+    # Background materialization of recurring subscriptions
+    scheduler_enabled: bool = True
+    scheduler_interval_seconds: float = 3600
+
+    # Server-sent events: pending events per stream before it is dropped as
+    # too slow, and seconds between keepalive comments on an idle stream
+    events_queue_size: int = 64
+    events_keepalive_seconds: float = 15
+    # Lifetime of the query-string tokens of event streams in per_user mode;
+    # EventSource reconnects with the same URL until they expire
+    events_token_seconds: int = 3600
+
+    # Admission control: concurrency and wait-queue limits per route class
+    admission_enabled: bool = True
+    admission_heavy_concurrency: int = 4
+    admission_heavy_queue: int = 16
+    admission_light_concurrency: int = 32
+    admission_light_queue: int = 256
+    admission_retry_after_seconds: int = 1
+    # "METHOD /path" patterns; a "?rule" suffix also matches the query string,
+    # an empty one only requests without any
+    admission_heavy_routes: list[str] = [
+        # Text search scans every row the other filters leave
+        "GET /api/expenses?q=*",
+        "GET /api/expenses?*&q=*",
+        "GET /api/expenses/dashboard/*",
+        "POST /api/batch",
+        "GET /api/expenses/export*",
+        "GET /api/expenses/forecast*",
+        "GET /api/expenses/stats*",
+        "GET /api/admin/backup",
+    ]
+    # Long-lived streams that would hold a slot for as long as they are open
+    admission_exempt_routes: list[str] = [
+        "GET /api/events",
+    ]
 
     cors_origins: list[str] = [
         "http://localhost:3000",
@@ -19,5 +117,11 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
 
+    @model_validator(mode="after")
+    def check_auth_secret(self) -> "Settings":
+        if self.tenant_mode == "per_user" and not self.auth_secret:
+            raise ValueError("AUTH_SECRET is required with TENANT_MODE=per_user")
+        return self
+
 
 settings = Settings()
@@ -1,25 +1,361 @@
-from sqlalchemy import create_engine
+import hashlib
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator
+from fastapi import HTTPException, Request, status
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, Session
 from .config import settings
+from .security import bearer_token, tenant_from_token
+from .utils.exceptions import UnknownTenantError
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False}  # Solo para SQLite
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+slow_query_logger = logging.getLogger("app.slow_queries")
 
 
-def get_db() -> Session:
+class SlowQueryLog:
+    """Ring buffer of the most recent slow statements"""
+
+    def __init__(self, max_size: int):
+        self._entries: deque[dict] = deque(maxlen=max_size)
+        self._lock = threading.Lock()
+
+    def record(self, entry: dict) -> None:
+        with self._lock:
+            self._entries.append(entry)
+        slow_query_logger.warning(json.dumps(entry, default=str))
+
+    def entries(self) -> list[dict]:
+        """Recorded statements, most recent first"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog(settings.slow_query_log_size)
+
+
+def _parameter_shape(parameters):
+    """Types of the bound parameters, without their values"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _calling_method() -> str | None:
+    """Name of the innermost app method (preferably a repository) on the stack"""
+    fallback = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("app.") and module != __name__:
+            owner = frame.f_locals.get("self")
+            name = frame.f_code.co_name
+            qualified = f"{type(owner).__name__}.{name}" if owner is not None else f"{module}.{name}"
+            if module.startswith("app.repositories."):
+                return qualified
+            fallback = fallback or qualified
+        frame = frame.f_back
+    return fallback
+
+
+def _query_plan(cursor, statement: str, parameters) -> list[str] | None:
+    """SQLite EXPLAIN QUERY PLAN of a statement, run on the same connection"""
+    try:
+        rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    except Exception:
+        return None
+    return [row[3] for row in rows]
+
+
+def install_slow_query_log(bind: Engine, threshold_ms: float, log: SlowQueryLog = slow_query_log) -> None:
+    """Record statements of an engine that take longer than threshold_ms"""
+
+    @event.listens_for(bind, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(bind, "after_cursor_execute")
+    def check_duration(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        if elapsed_ms < threshold_ms:
+            return
+
+        sample = parameters[0] if executemany and parameters else parameters
+        entry = {
+            "at": datetime.utcnow().isoformat(),
+            "duration_ms": round(elapsed_ms, 3),
+            "statement": statement,
+            "parameters": _parameter_shape(sample),
+            "executemany": len(parameters) if executemany else None,
+            "caller": _calling_method(),
+            "database": conn.engine.url.render_as_string(hide_password=True),
+            "plan": None,
+        }
+        if conn.dialect.name == "sqlite":
+            entry["plan"] = _query_plan(cursor, statement, sample)
+        log.record(entry)
+
+    @event.listens_for(bind, "handle_error")
+    def discard_timer(context):
+        # A failed statement never reaches after_cursor_execute
+        starts = context.connection.info.get("query_start") if context.connection else None
+        if context.execution_context is not None and starts:
+            starts.pop()
+
+
+def _set_journal_mode(bind: Engine, mode: str) -> None:
+    @event.listens_for(bind, "connect")
+    def set_journal_mode(dbapi_connection, connection_record):
+        dbapi_connection.execute(f"PRAGMA journal_mode = {mode}")
+
+
+# Writes rely on INSERT ... ON CONFLICT and RETURNING, which these share
+SUPPORTED_DIALECTS = ("sqlite", "postgresql")
+
+
+def make_engine(url: str) -> Engine:
+    """Create an engine for a database URL with dialect-specific settings"""
+    dialect = make_url(url).get_backend_name()
+    if dialect not in SUPPORTED_DIALECTS:
+        raise ValueError(
+            f"Unsupported database {dialect!r}, use one of: {', '.join(SUPPORTED_DIALECTS)}"
+        )
+
+    if dialect == "sqlite":
+        bind = create_engine(
+            url,
+            # uri lets archives be attached read-only with file:...?mode=ro
+            connect_args={"check_same_thread": False, "uri": True}
+        )
+        if settings.sqlite_journal_mode:
+            _set_journal_mode(bind, settings.sqlite_journal_mode)
+        from .archive import install_archive_attach
+        install_archive_attach(bind)
+    elif dialect == "postgresql":
+        bind = create_engine(
+            url,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=True
+        )
+
+    # Without a threshold no listener is installed, so there is no overhead
+    if settings.slow_query_threshold_ms is not None:
+        install_slow_query_log(bind, settings.slow_query_threshold_ms)
+    return bind
+
+
+def make_session_factory(bind: Engine) -> sessionmaker:
+    """Create the session factory used for a database"""
+    return sessionmaker(autocommit=False, autoflush=False, bind=bind)
+
+
+engine = make_engine(settings.database_url)
+
+SessionLocal = make_session_factory(engine)
+
+
+class TenantEngineCache:
+    """
+    LRU-bounded cache of per-tenant engines
+
+    Each tenant gets its own SQLite file, so tenants never contend for the
+    same write lock. Tenants are provisioned with create(); engines are
+    opened (and pending migrations applied) on first use, and the least
+    recently used one is disposed once the cache is full.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self._factories: OrderedDict[Path, sessionmaker] = OrderedDict()
+        # Held while a tenant's engine is opened, so only its requests wait
+        self._opening: dict[Path, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._eviction_listeners: list[Callable[[sessionmaker], None]] = []
+
+    def add_eviction_listener(self, listener: Callable[[sessionmaker], None]) -> None:
+        """Call listener with the session factory of every engine before it is disposed"""
+        self._eviction_listeners.append(listener)
+
+    def _dispose(self, factory: sessionmaker) -> None:
+        for listener in self._eviction_listeners:
+            listener(factory)
+        factory.kw["bind"].dispose()
+
+    def path_for(self, tenant_id: str) -> Path:
+        """Database file of a tenant, fanned out into subdirectories by hash"""
+        digest = hashlib.sha256(tenant_id.encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.db"
+
+    def create(self, tenant_id: str) -> Path:
+        """Provision a tenant's database, returns its path"""
+        path = self.path_for(tenant_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tenant_engine = make_engine(f"sqlite:///{path}")
+        try:
+            init_db(tenant_engine)
+        finally:
+            tenant_engine.dispose()
+        return path
+
+    def session_factory(self, tenant_id: str) -> sessionmaker:
+        """Return the session factory of a provisioned tenant"""
+        path = self.path_for(tenant_id)
+        if not path.exists():
+            raise UnknownTenantError(f"Tenant {tenant_id} is not provisioned")
+        return self._session_factory(path)
+
+    def _session_factory(self, path: Path) -> sessionmaker:
+        with self._lock:
+            factory = self._factories.get(path)
+            if factory is not None:
+                self._factories.move_to_end(path)
+                return factory
+            opening = self._opening.setdefault(path, threading.Lock())
+
+        with opening:
+            try:
+                with self._lock:
+                    factory = self._factories.get(path)
+                    if factory is not None:
+                        return factory
+                tenant_engine = make_engine(f"sqlite:///{path}")
+                try:
+                    init_db(tenant_engine)
+                except Exception:
+                    tenant_engine.dispose()
+                    raise
+                factory = make_session_factory(tenant_engine)
+
+                evicted = []
+                with self._lock:
+                    self._factories[path] = factory
+                    while len(self._factories) > self.max_size:
+                        evicted.append(self._factories.popitem(last=False)[1])
+            finally:
+                # Also after a failed open, so the next request tries afresh
+                with self._lock:
+                    if self._opening.get(path) is opening:
+                        del self._opening[path]
+        for old in evicted:
+            self._dispose(old)
+        return factory
+
+    def peek(self, path: Path) -> sessionmaker | None:
+        """The cached session factory of a database, without marking it used"""
+        with self._lock:
+            return self._factories.get(path)
+
+    def tenant_paths(self) -> list[Path]:
+        """All tenant databases on disk"""
+        return sorted(self.directory.glob("*/*.db"))
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def clear(self) -> None:
+        """Dispose every cached engine"""
+        with self._lock:
+            factories = list(self._factories.values())
+            self._factories.clear()
+        for factory in factories:
+            self._dispose(factory)
+
+
+tenant_engines = TenantEngineCache(settings.tenant_db_dir, settings.tenant_engine_cache_size)
+
+
+def get_session_factory(request: Request) -> sessionmaker:
+    """Resolve the session factory for the tenant making the request"""
+    if settings.tenant_mode != "per_user":
+        return SessionLocal
+    return tenant_session_factory(request_tenant(request))
+
+
+def request_tenant(request: Request) -> str:
+    """Tenant id of the request's bearer token (per_user mode)"""
+    token = bearer_token(request)
+    tenant_id = tenant_from_token(token) if token else None
+    if tenant_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing or invalid bearer token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return tenant_id
+
+
+def tenant_session_factory(tenant_id: str) -> sessionmaker:
+    """Session factory of an authenticated tenant, 403 if it was never provisioned"""
+    try:
+        return tenant_engines.session_factory(tenant_id)
+    except UnknownTenantError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+
+
+def session_factories() -> Iterator[sessionmaker]:
+    """
+    Session factories of every database, for background jobs
+
+    Tenants whose engine is not cached get a short-lived one, so background
+    work neither evicts the engines serving requests nor holds the cache lock.
+    """
+    if settings.tenant_mode != "per_user":
+        yield SessionLocal
+        return
+    for path in tenant_engines.tenant_paths():
+        factory = tenant_engines.peek(path)
+        if factory is not None:
+            yield factory
+            continue
+        tenant_engine = make_engine(f"sqlite:///{path}")
+        try:
+            init_db(tenant_engine)
+            yield make_session_factory(tenant_engine)
+        finally:
+            tenant_engine.dispose()
+
+
+def get_db(request: Request) -> Session:
     """Dependency for database session"""
-    db = SessionLocal()
+    db = get_session_factory(request)()
     try:
         yield db
     finally:
         db.close()
 
 
-def init_db():
+def get_write_db(request: Request) -> Session | None:
+    """
+    Dependency for the session of routes whose writes may be group committed
+
+    None when group_commit_enabled, as the writer task opens its own.
+    """
+    if settings.group_commit_enabled:
+        yield None
+        return
+    yield from get_db(request)
+
+
+def init_db(bind: Engine = engine):
     """Initialize database with tables"""
     from .models.base import Base
-    Base.metadata.create_all(bind=engine)
+    from .migrations import run_migrations
+    Base.metadata.create_all(bind=bind)
+    run_migrations(bind)
@@ -1,15 +1,53 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
+from .config import settings
+from .database import init_db, session_factories
+from .routers import (
+    gastos_router,
+    categorias_router,
+    presupuestos_router,
+    suscripciones_router,
+    batch_router,
+    admin_router,
+    reportes_router,
+    eventos_router,
+)
+from .middleware.admission import AdmissionControlMiddleware
+from .services.expense_writer import stop_expense_writers
+from .services.report_service import report_jobs
+from .services.scheduler import RecurringChargeScheduler
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create tables, apply pending migrations and start background jobs"""
+    if settings.tenant_mode == "single":
+        init_db()
+    scheduler = RecurringChargeScheduler(session_factories)
+    if settings.scheduler_enabled:
+        scheduler.start()
+    yield
+    await scheduler.stop()
+    await stop_expense_writers()
+    report_jobs.shutdown()
+
 
 app = FastAPI(
     title="Control de Gastos API",
     description="API backend para la aplicación de control de gastos",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Admission control - keep heavy routes from starving cheap ones. Added
+# before CORS so CORS wraps it and its 503 responses carry CORS headers
+if settings.admission_enabled:
+    app.add_middleware(AdmissionControlMiddleware)
+
 # CORS - Permitir acceso desde cualquier origen durante desarrollo
 app.add_middleware(
     CORSMiddleware,
@@ -17,8 +55,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursor of GET /api/expenses, and the wait of admission 503s
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
 
+app.include_router(gastos_router)
+app.include_router(categorias_router)
+app.include_router(presupuestos_router)
+app.include_router(suscripciones_router)
+app.include_router(batch_router)
+app.include_router(admin_router)
+app.include_router(reportes_router)
+app.include_router(eventos_router)
+
 # Get the absolute path to the frontend directory
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "frontend")
 
@@ -0,0 +1,3 @@
+from .admission import AdmissionControlMiddleware, AdmissionController, admission_controller
+
+__all__ = ["AdmissionControlMiddleware", "AdmissionController", "admission_controller"]
@@ -0,0 +1,155 @@
+"""
+Admission control for API routes.
+
+Every API request is assigned a concurrency class. Heavy routes (unfiltered
+listings, dashboards, batches) get a small bounded semaphore so they cannot
+take every worker thread and pool connection; light routes get their own,
+larger one. When a class is saturated and its wait queue is full the request
+is rejected right away with 503 and ``Retry-After`` instead of queueing
+behind slow work. Long-lived streams are exempt, they would hold a slot
+for as long as the client stays connected.
+"""
+import asyncio
+from fnmatch import fnmatchcase
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from ..config import settings
+
+
+class ConcurrencyClass:
+    """Bounded semaphore with a bounded wait queue and counters"""
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self) -> bool:
+        """Wait for a slot, returns False if the wait queue is already full"""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+def _route_matches(pattern: str, method: str, path: str, query_string: str) -> bool:
+    """
+    Match "METHOD /path" against a route pattern
+
+    Patterns match the method and path only. A pattern with a query rule
+    after "?" also needs the query string to match it; an empty rule means
+    no query string at all, e.g. "GET /api/expenses?" or
+    "GET /api/expenses?q=*".
+    """
+    route, has_query, query = pattern.partition("?")
+    if not fnmatchcase(f"{method} {path}", route):
+        return False
+    return not has_query or fnmatchcase(query_string, query)
+
+
+class AdmissionController:
+    """Maps requests to concurrency classes"""
+
+    def __init__(
+        self,
+        heavy: ConcurrencyClass,
+        light: ConcurrencyClass,
+        heavy_routes: list[str],
+        retry_after_seconds: int = 1,
+        exempt_routes: list[str] | None = None
+    ):
+        self.heavy = heavy
+        self.light = light
+        self.heavy_routes = heavy_routes
+        self.exempt_routes = exempt_routes or []
+        self.retry_after_seconds = retry_after_seconds
+
+    @classmethod
+    def from_settings(cls) -> "AdmissionController":
+        return cls(
+            heavy=ConcurrencyClass(
+                "heavy", settings.admission_heavy_concurrency, settings.admission_heavy_queue
+            ),
+            light=ConcurrencyClass(
+                "light", settings.admission_light_concurrency, settings.admission_light_queue
+            ),
+            heavy_routes=settings.admission_heavy_routes,
+            retry_after_seconds=settings.admission_retry_after_seconds,
+            exempt_routes=settings.admission_exempt_routes
+        )
+
+    def classify(self, method: str, path: str, query_string: str = "") -> ConcurrencyClass | None:
+        """Return the class for a request, or None for exempt routes and those outside /api"""
+        if not path.startswith("/api/"):
+            return None
+        if any(_route_matches(pattern, method, path, query_string) for pattern in self.exempt_routes):
+            return None
+        if any(_route_matches(pattern, method, path, query_string) for pattern in self.heavy_routes):
+            return self.heavy
+        return self.light
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {klass.name: klass.stats() for klass in (self.heavy, self.light)}
+
+
+admission_controller = AdmissionController.from_settings()
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying an AdmissionController to HTTP requests"""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController | None = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        klass = self.controller.classify(
+            scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1")
+        )
+        if klass is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await klass.acquire():
+            response = JSONResponse(
+                {"detail": f"Too many concurrent {klass.name} requests, retry later"},
+                status_code=503,
+                headers={"Retry-After": str(self.controller.retry_after_seconds)}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            klass.release()
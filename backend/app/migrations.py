@@ -0,0 +1,109 @@
+"""
+Lightweight schema migrations for existing databases.
+
+``Base.metadata.create_all`` only creates missing tables, so changes to
+tables that already exist are applied here. Every migration inspects the
+live schema first and is a no-op once it has been applied.
+"""
+from sqlalchemy import BigInteger, Integer, cast, extract, func, insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from .models.gasto import Gasto
+from .models.resumen_mensual import ResumenMensual
+
+
+def _column_names(conn: Connection, table: str) -> set[str]:
+    """Return the column names of a table, or an empty set if it is missing"""
+    inspector = inspect(conn)
+    if not inspector.has_table(table):
+        return set()
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def migrate_monto_to_centavos(conn: Connection) -> None:
+    """Replace NUMERIC gastos.monto with integer gastos.monto_centavos"""
+    columns = _column_names(conn, "gastos")
+    if "monto" not in columns or "monto_centavos" in columns:
+        return
+
+    conn.execute(text(
+        "ALTER TABLE gastos ADD COLUMN monto_centavos BIGINT NOT NULL DEFAULT 0"
+    ))
+    conn.execute(text(
+        "UPDATE gastos SET monto_centavos = CAST(ROUND(monto * 100) AS BIGINT)"
+    ))
+    conn.execute(text("ALTER TABLE gastos DROP COLUMN monto"))
+
+
+def add_gasto_version(conn: Connection) -> None:
+    """Add the gastos.version column used for optimistic concurrency"""
+    columns = _column_names(conn, "gastos")
+    if not columns or "version" in columns:
+        return
+
+    conn.execute(text("ALTER TABLE gastos ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def backfill_resumen_mensual(conn: Connection) -> None:
+    """Build resumen_mensual from gastos for databases created before it existed"""
+    if not _column_names(conn, "resumen_mensual"):
+        return
+    if conn.execute(select(func.count()).select_from(ResumenMensual)).scalar():
+        return
+
+    anio = cast(extract("year", Gasto.fecha), Integer)
+    mes = cast(extract("month", Gasto.fecha), Integer)
+    conn.execute(insert(ResumenMensual).from_select(
+        ["anio", "mes", "categoria_id", "total_centavos", "cantidad"],
+        select(
+            anio, mes, Gasto.categoria_id,
+            cast(func.sum(Gasto.monto_centavos), BigInteger), func.count(Gasto.id)
+        ).group_by(anio, mes, Gasto.categoria_id)
+    ))
+
+
+def create_missing_indexes(conn: Connection) -> None:
+    """Create indexes declared on models after their tables already existed"""
+    inspector = inspect(conn)
+    for table in (Gasto.__table__,):
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if index.name not in existing and {c.name for c in index.columns} <= columns:
+                index.create(conn)
+
+
+# Indexes no longer declared on models, each made redundant by another one
+DROPPED_INDEXES = {
+    # ix_gastos_fecha_categoria_monto leads with fecha
+    "gastos": ["ix_gastos_fecha"],
+}
+
+
+def drop_redundant_indexes(conn: Connection) -> None:
+    """Drop indexes that only cost writes since a wider index covers them"""
+    inspector = inspect(conn)
+    for table, names in DROPPED_INDEXES.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        for name in names:
+            if name in existing:
+                conn.execute(text(f"DROP INDEX {name}"))
+
+
+MIGRATIONS = [
+    migrate_monto_to_centavos,
+    add_gasto_version,
+    backfill_resumen_mensual,
+    create_missing_indexes,
+    drop_redundant_indexes,
+]
+
+
+def run_migrations(engine: Engine) -> None:
+    """Apply pending migrations in a single transaction"""
+    with engine.begin() as conn:
+        for migration in MIGRATIONS:
+            migration(conn)
@@ -1,5 +1,16 @@
 from .base import Base, TimestampMixin
 from .categoria import Categoria
 from .gasto import Gasto
+from .presupuesto import Presupuesto
+from .resumen_mensual import ResumenMensual
+from .suscripcion import Suscripcion
 
-__all__ = ["Base", "TimestampMixin", "Categoria", "Gasto"]
+__all__ = [
+    "Base",
+    "TimestampMixin",
+    "Categoria",
+    "Gasto",
+    "Presupuesto",
+    "ResumenMensual",
+    "Suscripcion",
+]
@@ -1,8 +1,9 @@
 from datetime import date
 from decimal import Decimal
-from sqlalchemy import String, Text, Date, Numeric, ForeignKey
+from sqlalchemy import String, Text, Date, BigInteger, Integer, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import Base, TimestampMixin
+from ..utils.money import to_centavos, from_centavos
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -11,13 +12,40 @@ if TYPE_CHECKING:
 
 class Gasto(Base, TimestampMixin):
     __tablename__ = "gastos"
+    __table_args__ = (
+        Index("ix_gastos_categoria_fecha", "categoria_id", "fecha"),
+        # Covers daily per-category totals, so forecasts never touch the table;
+        # also the date index (every write updates each index, keep them few)
+        Index("ix_gastos_fecha_categoria_monto", "fecha", "categoria_id", "monto_centavos"),
+        # Amount ranges and amount-ordered pages of the expense search
+        Index("ix_gastos_monto", "monto_centavos"),
+        # Category statistics step to amount ranks in order, dates checked in the index
+        Index("ix_gastos_categoria_monto", "categoria_id", "monto_centavos", "fecha"),
+        # Expenses are mostly appended in date order, so a tiny BRIN index
+        # serves large date-range scans on PostgreSQL
+        Index("ix_gastos_fecha_brin", "fecha", postgresql_using="brin").ddl_if(dialect="postgresql"),
+        # Ids are never reused, even once the newest rows move to an archive
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    monto: Mapped[Decimal] = mapped_column(Numeric(10, 2))
+    # Stored as integer minor units so SUMs are exact and stay integer math
+    monto_centavos: Mapped[int] = mapped_column(BigInteger)
     descripcion: Mapped[str] = mapped_column(String(255))
     categoria_id: Mapped[int] = mapped_column(ForeignKey("categorias.id"))
     fecha: Mapped[date] = mapped_column(Date)
     notas: Mapped[str | None] = mapped_column(Text)
+    # Row version for optimistic concurrency, bumped by every update
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
 
     # Relationships
     categoria: Mapped["Categoria"] = relationship(back_populates="gastos")
+
+    @property
+    def monto(self) -> Decimal:
+        """Amount as a two-decimal Decimal"""
+        return from_centavos(self.monto_centavos)
+
+    @monto.setter
+    def monto(self, value: Decimal) -> None:
+        self.monto_centavos = to_centavos(value)
@@ -0,0 +1,30 @@
+from decimal import Decimal
+from sqlalchemy import BigInteger, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from .base import Base, TimestampMixin
+from ..utils.money import to_centavos, from_centavos
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .categoria import Categoria
+
+
+class Presupuesto(Base, TimestampMixin):
+    """Monthly spending limit for a category"""
+    __tablename__ = "presupuestos"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    categoria_id: Mapped[int] = mapped_column(ForeignKey("categorias.id"), unique=True)
+    monto_centavos: Mapped[int] = mapped_column(BigInteger)
+
+    # Relationships
+    categoria: Mapped["Categoria"] = relationship()
+
+    @property
+    def monto(self) -> Decimal:
+        """Monthly limit as a two-decimal Decimal"""
+        return from_centavos(self.monto_centavos)
+
+    @monto.setter
+    def monto(self, value: Decimal) -> None:
+        self.monto_centavos = to_centavos(value)
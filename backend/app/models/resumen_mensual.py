@@ -0,0 +1,14 @@
+from sqlalchemy import Integer, BigInteger, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from .base import Base
+
+
+class ResumenMensual(Base):
+    """Month-to-date totals per category, maintained incrementally on writes"""
+    __tablename__ = "resumen_mensual"
+
+    anio: Mapped[int] = mapped_column(Integer, primary_key=True)
+    mes: Mapped[int] = mapped_column(Integer, primary_key=True)
+    categoria_id: Mapped[int] = mapped_column(ForeignKey("categorias.id"), primary_key=True)
+    total_centavos: Mapped[int] = mapped_column(BigInteger, default=0)
+    cantidad: Mapped[int] = mapped_column(Integer, default=0)
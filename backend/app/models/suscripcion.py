@@ -0,0 +1,37 @@
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import String, Date, Boolean, BigInteger, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from .base import Base, TimestampMixin
+from ..utils.money import to_centavos, from_centavos
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .categoria import Categoria
+
+
+class Suscripcion(Base, TimestampMixin):
+    """Recurring charge materialized as Gasto rows by the scheduler"""
+    __tablename__ = "suscripciones"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    nombre: Mapped[str] = mapped_column(String(100))
+    monto_centavos: Mapped[int] = mapped_column(BigInteger)
+    categoria_id: Mapped[int] = mapped_column(ForeignKey("categorias.id"))
+    periodicidad: Mapped[str] = mapped_column(String(10), default="mensual")
+    fecha_inicio: Mapped[date] = mapped_column(Date)
+    activo: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Watermark: date of the last charge already materialized as a Gasto
+    materializado_hasta: Mapped[date | None] = mapped_column(Date)
+
+    # Relationships
+    categoria: Mapped["Categoria"] = relationship()
+
+    @property
+    def monto(self) -> Decimal:
+        """Amount per period as a two-decimal Decimal"""
+        return from_centavos(self.monto_centavos)
+
+    @monto.setter
+    def monto(self, value: Decimal) -> None:
+        self.monto_centavos = to_centavos(value)
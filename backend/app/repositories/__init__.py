@@ -1,5 +1,15 @@
 from .base import BaseRepository
 from .gasto_repository import GastoRepository
 from .categoria_repository import CategoriaRepository
+from .presupuesto_repository import PresupuestoRepository
+from .resumen_repository import ResumenMensualRepository
+from .suscripcion_repository import SuscripcionRepository
 
-__all__ = ["BaseRepository", "GastoRepository", "CategoriaRepository"]
+__all__ = [
+    "BaseRepository",
+    "GastoRepository",
+    "CategoriaRepository",
+    "PresupuestoRepository",
+    "ResumenMensualRepository",
+    "SuscripcionRepository",
+]
@@ -1,5 +1,10 @@
 from typing import Generic, TypeVar, Type
+from sqlalchemy import Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.selectable import Alias
+from sqlalchemy.sql.visitors import InternalTraversal
 from ..models.base import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -19,6 +24,12 @@ class BaseRepository(Generic[ModelType]):
         self.db.refresh(entity)
         return entity
 
+    def add(self, entity: ModelType) -> ModelType:
+        """Add entity to the current transaction without committing"""
+        self.db.add(entity)
+        self.db.flush()
+        return entity
+
     def find_by_id(self, entity_id: int) -> ModelType | None:
         """Find entity by ID"""
         return self.db.query(self.model).filter(self.model.id == entity_id).first()
@@ -32,6 +43,11 @@ class BaseRepository(Generic[ModelType]):
         self.db.delete(entity)
         self.db.commit()
 
+    def remove(self, entity: ModelType) -> None:
+        """Delete entity within the current transaction without committing"""
+        self.db.delete(entity)
+        self.db.flush()
+
     def delete_by_id(self, entity_id: int) -> bool:
         """Delete entity by ID, returns True if deleted"""
         entity = self.find_by_id(entity_id)
@@ -39,3 +55,40 @@ class BaseRepository(Generic[ModelType]):
             self.delete(entity)
             return True
         return False
+
+
+def upsert_insert(db: Session, model: type[Base]):
+    """Return a dialect-specific INSERT supporting ON CONFLICT for the session's database"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    # make_engine() only creates engines for these two
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise ValueError(f"Upserts are not supported on {dialect}")
+
+
+class IndexedBy(Alias):
+    """A table under its own name that SQLite reads through one index"""
+
+    inherit_cache = True
+    _traverse_internals = Alias._traverse_internals + [("index", InternalTraversal.dp_string)]
+
+    def _init(self, selectable, name=None, index: str | None = None):
+        super()._init(selectable, name=name)
+        self.index = index
+
+
+@compiles(IndexedBy)
+def _compile_indexed_by(element: IndexedBy, compiler, **kw) -> str:
+    # SQLite has no optimizer hints, INDEXED BY follows the table in FROM;
+    # elsewhere this is a plain alias
+    text = compiler.visit_alias(element, **kw)
+    if kw.get("asfrom") and compiler.dialect.name == "sqlite":
+        text += f" INDEXED BY {element.index}"
+    return text
+
+
+def indexed_by(table: Table, index: str) -> IndexedBy:
+    """table read through index on SQLite, an error there if the planner cannot use it"""
+    return IndexedBy._construct(table, name=table.name, index=index)
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 from ..models.categoria import Categoria
-from .base import BaseRepository
+from .base import BaseRepository, upsert_insert
 
 
 class CategoriaRepository(BaseRepository[Categoria]):
@@ -21,3 +21,30 @@ class CategoriaRepository(BaseRepository[Categoria]):
     def find_by_nombre(self, nombre: str) -> Categoria | None:
         """Find category by name"""
         return self.db.query(Categoria).filter(Categoria.nombre == nombre).first()
+
+    def find_by_nombres(self, nombres: list[str]) -> list[Categoria]:
+        """Find categories by name"""
+        return (
+            self.db.query(Categoria)
+            .filter(Categoria.nombre.in_(nombres))
+            .order_by(Categoria.nombre)
+            .all()
+        )
+
+    def upsert_many(self, rows: list[dict], update_existing: bool = True) -> None:
+        """Insert categories in one statement, resolving name conflicts in the database"""
+        if not rows:
+            return
+        stmt = upsert_insert(self.db, Categoria).values(rows)
+        if update_existing:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Categoria.nombre],
+                set_={
+                    "icono": stmt.excluded.icono,
+                    "color": stmt.excluded.color,
+                    "activo": stmt.excluded.activo,
+                }
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[Categoria.nombre])
+        self.db.execute(stmt)
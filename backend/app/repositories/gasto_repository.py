@@ -1,8 +1,75 @@
+import calendar
+import math
 from datetime import date
-from sqlalchemy.orm import Session
-from sqlalchemy import extract, func
+from typing import Iterator, Sequence
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import BigInteger, Integer, Select, and_, cast, extract, func, or_, select, update
+from ..archive import archive_table, gastos_for_range
 from ..models.gasto import Gasto
-from .base import BaseRepository
+from ..models.categoria import Categoria
+from .base import BaseRepository, indexed_by
+
+
+def _month_range(year: int, month: int) -> tuple[date, date]:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+# Sort orders of the expense search: (column, descending). Ties are broken by
+# id in the same direction, which every index holds as its last column
+SEARCH_SORTS = {
+    "fecha": ("fecha", False),
+    "-fecha": ("fecha", True),
+    "monto": ("monto_centavos", False),
+    "-monto": ("monto_centavos", True),
+}
+
+
+def search_index(
+    dated: bool, categoria_ids: Sequence[int], exact_amount: bool, sort: str
+) -> str:
+    """
+    Index the expense search walks, from the filters present
+
+    An exact amount is an equality lookup matching a handful of rows. A
+    date range, or categories in date order, bound the scan to a range of a
+    date index (ix_gastos_fecha_categoria_monto, which also checks
+    categories and amounts without reading the table). Anything else walks
+    the index of the sort order with the filters applied to each row, so a
+    page stops after limit matches instead of sorting every match. The text
+    match is always checked on the rows the index leads to.
+    """
+    column, _ = SEARCH_SORTS[sort]
+    if exact_amount:
+        return "ix_gastos_monto"
+    if categoria_ids and (dated or column == "fecha"):
+        return "ix_gastos_categoria_fecha"
+    if dated:
+        return "ix_gastos_fecha_categoria_monto"
+    if column == "monto_centavos":
+        return "ix_gastos_monto"
+    return "ix_gastos_fecha_categoria_monto"
+
+
+# Share of the stored date span from which category statistics walk an
+# index to each rank instead of sorting the range
+STATS_WALK_FRACTION = 0.05
+
+
+def nearest_rank(count: int, percentile: int) -> int:
+    """1-based rank of an integer percentile among count ascending values"""
+    return max(1, (count * percentile + 99) // 100)
+
+
+def _runs(ranks: list[int]) -> Iterator[tuple[int, int]]:
+    """(first, last) of each run of consecutive ranks in a sorted list"""
+    first = previous = ranks[0]
+    for rank in ranks[1:]:
+        if rank != previous + 1:
+            yield first, previous
+            first = rank
+        previous = rank
+    yield first, previous
 
 
 class GastoRepository(BaseRepository[Gasto]):
@@ -11,53 +78,377 @@ class GastoRepository(BaseRepository[Gasto]):
     def __init__(self, db: Session):
         super().__init__(Gasto, db)
 
+    def _gastos(self, start_date: date | None = None, end_date: date | None = None):
+        """The hot table, plus the attached archives the date range reaches"""
+        return gastos_for_range(self.db, start_date, end_date)
+
+    def _through_index(self, index: str):
+        """
+        Gasto read through an index on SQLite
+
+        Without ANALYZE statistics SQLite guesses, and may walk the wrong
+        index over the whole table. Gasto itself if the database does not
+        have the index, as INDEXED BY would fail every query.
+        """
+        connection = self.db.connection()
+        if connection.dialect.name != "sqlite":
+            return Gasto
+        indexes = connection.info.get("gastos_indexes")
+        if not indexes:
+            indexes = connection.info["gastos_indexes"] = {
+                row[1] for row in connection.exec_driver_sql("PRAGMA index_list(gastos)")
+            }
+        if index not in indexes:
+            return Gasto
+        return aliased(Gasto, indexed_by(Gasto.__table__, index))
+
+    def find_all(self) -> list[Gasto]:
+        """Find all expenses, archived ones included"""
+        return self.db.query(self._gastos()).all()
+
     def find_by_date_range(self, start_date: date, end_date: date) -> list[Gasto]:
         """Find expenses within a date range"""
+        gastos = self._gastos(start_date, end_date)
         return (
-            self.db.query(Gasto)
-            .filter(Gasto.fecha >= start_date, Gasto.fecha <= end_date)
-            .order_by(Gasto.fecha.desc())
+            self.db.query(gastos)
+            .filter(gastos.fecha >= start_date, gastos.fecha <= end_date)
+            .order_by(gastos.fecha.desc())
             .all()
         )
 
     def find_by_month(self, year: int, month: int) -> list[Gasto]:
         """Find expenses for a specific month"""
-        return (
-            self.db.query(Gasto)
-            .filter(
-                extract('year', Gasto.fecha) == year,
-                extract('month', Gasto.fecha) == month
-            )
-            .order_by(Gasto.fecha.desc())
-            .all()
-        )
+        return self.find_by_date_range(*_month_range(year, month))
 
     def find_by_categoria(self, categoria_id: int) -> list[Gasto]:
         """Find expenses by category"""
+        gastos = self._gastos()
         return (
-            self.db.query(Gasto)
-            .filter(Gasto.categoria_id == categoria_id)
-            .order_by(Gasto.fecha.desc())
+            self.db.query(gastos)
+            .filter(gastos.categoria_id == categoria_id)
+            .order_by(gastos.fecha.desc())
             .all()
         )
 
+    def search_query(
+        self,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        categoria_ids: Sequence[int] = (),
+        monto_min: int | None = None,
+        monto_max: int | None = None,
+        texto: str | None = None,
+        sort: str = "-fecha",
+        after: tuple | None = None,
+        limit: int = 100,
+        use_index: bool = True
+    ) -> Select:
+        """
+        Statement of one page of the expense search, every filter combined
+
+        Amounts are in cents, texto matches the description or the notes and
+        after is the (sort value, id) of the last row of the previous page.
+        With use_index, SQLite is told the index to walk (see search_index).
+        """
+        gastos = self._gastos(start_date, end_date)
+        if gastos is Gasto and use_index:
+            # Archive unions are left to the planner
+            gastos = self._through_index(search_index(
+                start_date is not None or end_date is not None,
+                categoria_ids,
+                monto_min is not None and monto_min == monto_max,
+                sort,
+            ))
+        column, descending = SEARCH_SORTS[sort]
+        key = getattr(gastos, column)
+
+        conditions = []
+        if start_date is not None:
+            conditions.append(gastos.fecha >= start_date)
+        if end_date is not None:
+            conditions.append(gastos.fecha <= end_date)
+        if categoria_ids:
+            conditions.append(gastos.categoria_id.in_(categoria_ids))
+        if monto_min is not None:
+            conditions.append(gastos.monto_centavos >= monto_min)
+        if monto_max is not None:
+            conditions.append(gastos.monto_centavos <= monto_max)
+        if texto:
+            conditions.append(or_(
+                gastos.descripcion.icontains(texto, autoescape=True),
+                gastos.notas.icontains(texto, autoescape=True),
+            ))
+        if after is not None:
+            value, last_id = after
+            # The plain bound on the sort column is what narrows an index range
+            if descending:
+                conditions.append(and_(key <= value, or_(key < value, gastos.id < last_id)))
+            else:
+                conditions.append(and_(key >= value, or_(key > value, gastos.id > last_id)))
+
+        query = select(gastos).where(*conditions).limit(limit)
+        if descending:
+            query = query.order_by(key.desc(), gastos.id.desc())
+        else:
+            query = query.order_by(key, gastos.id)
+        return query
+
+    def search(self, **filters) -> list[Gasto]:
+        """Find one page of expenses matching every filter, see search_query"""
+        try:
+            return list(self.db.scalars(self.search_query(**filters)))
+        except OperationalError as e:
+            # SQLite refuses a statement whose INDEXED BY it cannot plan
+            if "no query solution" not in str(e.orig):
+                raise
+            return list(self.db.scalars(self.search_query(**filters, use_index=False)))
+
+    def update_if_version(self, expense_id: int, version: int, values: dict) -> Gasto | None:
+        """
+        Compare-and-swap update, returns the updated expense or None
+
+        The row is only changed if it is still at the expected version, which
+        is bumped in the same statement.
+        """
+        return self.db.execute(
+            update(Gasto)
+            .where(Gasto.id == expense_id, Gasto.version == version)
+            .values(**values, version=Gasto.version + 1)
+            .returning(Gasto)
+        ).scalar_one_or_none()
+
+    def reassign_categoria(self, source_id: int, target_id: int) -> int:
+        """Move every expense of a category to another one, returns the rows moved"""
+        result = self.db.execute(
+            update(Gasto)
+            .where(Gasto.categoria_id == source_id)
+            .values(categoria_id=target_id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def has_archived_categoria(self, categoria_id: int) -> bool:
+        """Whether the attached archive holds expenses of a category"""
+        if not self.db.connection().info.get("archive_years"):
+            return False
+        return self.db.execute(
+            select(archive_table.c.id).where(archive_table.c.categoria_id == categoria_id).limit(1)
+        ).first() is not None
+
     def find_recent(self, limit: int = 10) -> list[Gasto]:
         """Find most recent expenses"""
+        gastos = self._gastos()
         return (
-            self.db.query(Gasto)
-            .order_by(Gasto.fecha.desc(), Gasto.fecha_creacion.desc())
+            self.db.query(gastos)
+            .order_by(gastos.fecha.desc(), gastos.fecha_creacion.desc())
             .limit(limit)
             .all()
         )
 
-    def get_monthly_total(self, year: int, month: int) -> float:
-        """Get total expenses for a specific month"""
+    def stream_all(self, batch_size: int = 1000) -> Iterator[Gasto]:
+        """Iterate over all expenses in date order, fetching batch_size rows at a time"""
+        gastos = self._gastos()
+        # yield_per streams through a server-side cursor where the driver has one
+        return self.db.scalars(
+            select(gastos)
+            .order_by(gastos.fecha, gastos.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+    def get_monthly_total(self, year: int, month: int) -> int:
+        """Get total expenses for a specific month, in cents"""
+        start_date, end_date = _month_range(year, month)
+        gastos = self._gastos(start_date, end_date)
         result = (
-            self.db.query(func.sum(Gasto.monto))
-            .filter(
-                extract('year', Gasto.fecha) == year,
-                extract('month', Gasto.fecha) == month
-            )
+            self.db.query(func.coalesce(cast(func.sum(gastos.monto_centavos), BigInteger), 0))
+            .filter(gastos.fecha >= start_date, gastos.fecha <= end_date)
             .scalar()
         )
-        return float(result) if result else 0.0
+        return int(result)
+
+    def get_monthly_totals_by_categoria(self, year: int, month: int) -> list[tuple[str, int, int]]:
+        """Get (category name, count, total cents) for a month, aggregated in SQL"""
+        start_date, end_date = _month_range(year, month)
+        gastos = self._gastos(start_date, end_date)
+        return (
+            self.db.query(
+                Categoria.nombre,
+                func.count(gastos.id),
+                cast(func.sum(gastos.monto_centavos), BigInteger)
+            )
+            .join(Categoria, gastos.categoria_id == Categoria.id)
+            .filter(gastos.fecha >= start_date, gastos.fecha <= end_date)
+            .group_by(Categoria.id, Categoria.nombre)
+            .all()
+        )
+
+    def get_yearly_totals_by_month(self, year: int) -> list[tuple[int, int, int]]:
+        """Get (month, count, total cents) for each month of a year with expenses"""
+        start_date, end_date = date(year, 1, 1), date(year, 12, 31)
+        gastos = self._gastos(start_date, end_date)
+        month = cast(extract('month', gastos.fecha), Integer)
+        return (
+            self.db.query(
+                month,
+                func.count(gastos.id),
+                cast(func.sum(gastos.monto_centavos), BigInteger)
+            )
+            .filter(gastos.fecha >= start_date, gastos.fecha <= end_date)
+            .group_by(month)
+            .all()
+        )
+
+    def get_daily_totals_by_categoria(
+        self, start_date: date, end_date: date
+    ) -> list[tuple[date, int, int]]:
+        """Get (date, category id, total cents) for every day and category with expenses"""
+        gastos = self._gastos(start_date, end_date)
+        # Grouped in (fecha, categoria_id) order, ix_gastos_fecha_categoria_monto
+        # answers this from the index alone without a sort
+        return self.db.execute(
+            select(gastos.fecha, gastos.categoria_id, cast(func.sum(gastos.monto_centavos), BigInteger))
+            .where(gastos.fecha >= start_date, gastos.fecha <= end_date)
+            .group_by(gastos.fecha, gastos.categoria_id)
+        ).all()
+
+    def find_by_ids(self, ids: Sequence[int], start_date: date, end_date: date) -> list[Gasto]:
+        """Find expenses by id, looking in the archives of a date range too"""
+        gastos = self._gastos(start_date, end_date)
+        return self.db.query(gastos).filter(gastos.id.in_(ids)).all()
+
+    def get_amount_stats_by_categoria(
+        self, start_date: date, end_date: date, top: int, percentiles: Sequence[int]
+    ) -> list[tuple[int, int, int, list[int], list[tuple[int, int]]]]:
+        """
+        Get per-category amount statistics of a date range, ranked in SQL
+
+        Returns (category id, count, total cents, cents at each percentile,
+        [(expense id, cents)] of the top largest). Percentiles are integers
+        (50 is the median, 100 the maximum) using the nearest rank, with
+        amounts ranked by (monto_centavos, fecha, id). Only the rows at the
+        wanted ranks are read back.
+        """
+        gastos = self._gastos(start_date, end_date)
+        in_range = (gastos.fecha >= start_date, gastos.fecha <= end_date)
+        # Sorting the range costs O(n log n) of the rows in it, walking
+        # ix_gastos_categoria_monto to each rank costs a fraction of the table:
+        # only worth it for ranges covering a good part of the table
+        walk = gastos is Gasto and self._date_span_fraction(start_date, end_date) >= STATS_WALK_FRACTION
+
+        counted = gastos
+        if gastos is Gasto:
+            counted = self._through_index(
+                "ix_gastos_categoria_monto" if walk else "ix_gastos_fecha_categoria_monto"
+            )
+        totals = self.db.execute(
+            select(counted.categoria_id, func.count(), cast(func.sum(counted.monto_centavos), BigInteger))
+            .where(counted.fecha >= start_date, counted.fecha <= end_date)
+            .group_by(counted.categoria_id)
+        ).all()
+
+        wanted = {
+            categoria_id: sorted(
+                {nearest_rank(count, percentile) for percentile in percentiles}
+                | set(range(max(count - top, 0) + 1, count + 1))
+            )
+            for categoria_id, count, _ in totals
+        }
+        if walk:
+            counts = {categoria_id: count for categoria_id, count, _ in totals}
+            amounts = self._amounts_by_index_walk(start_date, end_date, counts, wanted)
+        else:
+            amounts = self._amounts_by_window(gastos, in_range, wanted)
+
+        return [
+            (
+                categoria_id,
+                count,
+                total,
+                [amounts[categoria_id, nearest_rank(count, percentile)][1] for percentile in percentiles],
+                [amounts[categoria_id, rank] for rank in range(count, max(count - top, 0), -1)],
+            )
+            for categoria_id, count, total in totals
+        ]
+
+    def _date_span_fraction(self, start_date: date, end_date: date) -> float:
+        """Share of the days between the oldest and newest expense a range covers"""
+        first, last = self.db.execute(select(
+            select(func.min(Gasto.fecha)).scalar_subquery(),
+            select(func.max(Gasto.fecha)).scalar_subquery(),
+        )).one()
+        if first is None:
+            return 0.0
+        covered = (min(end_date, last) - max(start_date, first)).days + 1
+        return max(covered, 0) / ((last - first).days + 1)
+
+    def _amounts_by_window(self, gastos, in_range, wanted: dict[int, list[int]]) -> dict:
+        """(category id, rank) -> (expense id, cents), ranking the whole range with ROW_NUMBER"""
+        if not wanted:
+            return {}
+        ranked = (
+            select(
+                gastos.categoria_id,
+                gastos.id,
+                gastos.monto_centavos,
+                func.row_number().over(
+                    partition_by=gastos.categoria_id,
+                    order_by=(gastos.monto_centavos, gastos.fecha, gastos.id),
+                ).label("rango"),
+            )
+            .where(*in_range)
+            .subquery()
+        )
+        rows = self.db.execute(
+            select(ranked).where(or_(*[
+                and_(ranked.c.categoria_id == categoria_id, ranked.c.rango.in_(ranks))
+                for categoria_id, ranks in wanted.items()
+            ]))
+        ).all()
+        return {(categoria_id, rango): (expense_id, monto) for categoria_id, expense_id, monto, rango in rows}
+
+    def _amounts_by_index_walk(
+        self, start_date: date, end_date: date, counts: dict[int, int], wanted: dict[int, list[int]]
+    ) -> dict:
+        """(category id, rank) -> (expense id, cents), stepping through ix_gastos_categoria_monto"""
+        amounts = {}
+        gastos = self._through_index("ix_gastos_categoria_monto")
+        order = (gastos.monto_centavos, gastos.fecha, gastos.id)
+        for categoria_id, ranks in wanted.items():
+            count = counts[categoria_id]
+            for first, last in _runs(ranks):
+                # Ranks in the upper half are reached faster from the largest amount
+                descending = first > count // 2
+                rows = self.db.execute(
+                    select(gastos.id, gastos.monto_centavos)
+                    .where(gastos.categoria_id == categoria_id, gastos.fecha >= start_date, gastos.fecha <= end_date)
+                    .order_by(*(column.desc() for column in order) if descending else order)
+                    .offset(count - last if descending else first - 1)
+                    .limit(last - first + 1)
+                ).all()
+                for position, row in enumerate(rows):
+                    amounts[categoria_id, last - position if descending else first + position] = tuple(row)
+        return amounts
+
+    def get_amount_percentiles(
+        self, start_date: date, end_date: date, quantiles: list[float]
+    ) -> list[int]:
+        """Get nearest-rank percentiles of amounts (cents) within a date range"""
+        gastos = self._gastos(start_date, end_date)
+        in_range = (gastos.fecha >= start_date, gastos.fecha <= end_date)
+        count = self.db.query(func.count(gastos.id)).filter(*in_range).scalar()
+        if not count:
+            return [0 for _ in quantiles]
+
+        percentiles = []
+        for quantile in quantiles:
+            rank = max(1, math.ceil(quantile * count))
+            value = (
+                self.db.query(gastos.monto_centavos)
+                .filter(*in_range)
+                .order_by(gastos.monto_centavos)
+                .offset(rank - 1)
+                .limit(1)
+                .scalar()
+            )
+            percentiles.append(value)
+        return percentiles
@@ -0,0 +1,39 @@
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+from ..models.categoria import Categoria
+from ..models.presupuesto import Presupuesto
+from ..models.resumen_mensual import ResumenMensual
+from .base import BaseRepository
+
+
+class PresupuestoRepository(BaseRepository[Presupuesto]):
+    """Repository for Presupuesto model"""
+
+    def __init__(self, db: Session):
+        super().__init__(Presupuesto, db)
+
+    def find_by_categoria(self, categoria_id: int) -> Presupuesto | None:
+        """Find the budget of a category"""
+        return (
+            self.db.query(Presupuesto)
+            .filter(Presupuesto.categoria_id == categoria_id)
+            .first()
+        )
+
+    def find_with_spend(self, anio: int, mes: int) -> list[tuple[Presupuesto, str, int]]:
+        """Find every budget with its category name and month-to-date spend in cents"""
+        return (
+            self.db.query(
+                Presupuesto,
+                Categoria.nombre,
+                func.coalesce(ResumenMensual.total_centavos, 0)
+            )
+            .join(Categoria, Presupuesto.categoria_id == Categoria.id)
+            .outerjoin(ResumenMensual, and_(
+                ResumenMensual.categoria_id == Presupuesto.categoria_id,
+                ResumenMensual.anio == anio,
+                ResumenMensual.mes == mes
+            ))
+            .order_by(Categoria.nombre)
+            .all()
+        )
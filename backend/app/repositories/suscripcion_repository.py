@@ -0,0 +1,46 @@
+from datetime import date
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from ..models.suscripcion import Suscripcion
+from .base import BaseRepository
+
+
+class SuscripcionRepository(BaseRepository[Suscripcion]):
+    """Repository for Suscripcion model"""
+
+    def __init__(self, db: Session):
+        super().__init__(Suscripcion, db)
+
+    def find_active(self) -> list[Suscripcion]:
+        """Find all active subscriptions"""
+        return (
+            self.db.query(Suscripcion)
+            .filter(Suscripcion.activo == True)
+            .order_by(Suscripcion.id)
+            .all()
+        )
+
+    def advance_watermark(
+        self, suscripcion_id: int, expected: date | None, new: date
+    ) -> bool:
+        """Move the materialization watermark only if nobody else moved it first"""
+        if expected is None:
+            matches = Suscripcion.materializado_hasta.is_(None)
+        else:
+            matches = Suscripcion.materializado_hasta == expected
+        result = self.db.execute(
+            update(Suscripcion)
+            .where(Suscripcion.id == suscripcion_id, matches)
+            .values(materializado_hasta=new)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def reassign_categoria(self, source_id: int, target_id: int) -> None:
+        """Move every subscription of a category to another one"""
+        self.db.execute(
+            update(Suscripcion)
+            .where(Suscripcion.categoria_id == source_id)
+            .values(categoria_id=target_id)
+            .execution_options(synchronize_session=False)
+        )
@@ -1,4 +1,19 @@
 from .gastos import router as gastos_router
 from .categorias import router as categorias_router
+from .presupuestos import router as presupuestos_router
+from .suscripciones import router as suscripciones_router
+from .batch import router as batch_router
+from .admin import router as admin_router
+from .reportes import router as reportes_router
+from .eventos import router as eventos_router
 
-__all__ = ["gastos_router", "categorias_router"]
+__all__ = [
+    "gastos_router",
+    "categorias_router",
+    "presupuestos_router",
+    "suscripciones_router",
+    "batch_router",
+    "admin_router",
+    "reportes_router",
+    "eventos_router",
+]
@@ -0,0 +1,65 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from ..database import get_db, slow_query_log
+from ..middleware.admission import admission_controller
+from ..security import require_admin
+from ..services.backup_service import BackupService, stream_tar_gz
+from ..services.event_broker import event_broker
+from ..services.result_cache import summary_cache
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+@router.get("/admission")
+async def get_admission_stats() -> dict[str, dict[str, int]]:
+    """Get in-flight, waiting, admitted and rejected counters per concurrency class"""
+    return admission_controller.stats()
+
+
+@router.get("/cache")
+async def get_cache_stats() -> dict[str, int]:
+    """Get size, hit, miss, eviction and invalidation counters of the summary cache"""
+    return summary_cache.stats()
+
+
+@router.get("/events")
+async def get_event_stats() -> dict[str, int]:
+    """Get open event streams and published, delivered and dropped counters"""
+    return event_broker.stats()
+
+
+@router.get("/slow-queries", dependencies=[Depends(require_admin)])
+async def get_slow_queries() -> list[dict]:
+    """Get the most recent statements over the slow query threshold, newest first"""
+    return slow_query_log.entries()
+
+
+@router.get("/backup", dependencies=[Depends(require_admin)])
+def get_backup(
+    pages_per_step: int | None = Query(None, ge=1, description="Pages copied per backup step (WAL only)"),
+    sleep_seconds: float | None = Query(None, ge=0, le=1, description="Pause between steps (WAL only)"),
+    db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Download a consistent snapshot of the database and its archive, as a
+    gzip-compressed tar
+
+    The snapshot is taken online with SQLite's backup API. In WAL mode it
+    is copied in small steps and writers are never blocked; otherwise it is
+    copied in one step during which writers wait.
+    """
+    try:
+        snapshot = BackupService(db).snapshot(pages_per_step, sleep_seconds)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    filename = f"gastos-{datetime.utcnow():%Y%m%d-%H%M%S}.tar.gz"
+    return StreamingResponse(
+        stream_tar_gz(snapshot),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from ..database import get_db
+from ..schemas.batch import BatchRequest, BatchResponse
+from ..services.batch_service import BatchService
+from ..utils.exceptions import BatchOperationError
+
+router = APIRouter(prefix="/api/batch", tags=["batch"])
+
+
+@router.post("", response_model=BatchResponse)
+def execute_batch(
+    batch: BatchRequest,
+    db: Session = Depends(get_db)
+) -> BatchResponse:
+    """
+    Execute several operations in one request and one database session
+
+    - **operations**: List of operations, each with an **op** field:
+      `create_expense`, `delete_expense`, `get_summary` or `list_categories`
+
+    Writes are committed together; if any operation fails nothing is saved
+    and the response identifies the failing operation.
+    """
+    try:
+        service = BatchService(db)
+        return BatchResponse(results=service.execute(batch.operations))
+    except BatchOperationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"index": e.index, "op": e.op, "error": str(e.error)}
+        )
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from ..database import get_db
-from ..schemas.categoria import CategoriaCreate, CategoriaResponse
+from ..schemas.categoria import (
+    CategoriaCreate,
+    CategoriaResponse,
+    CategoriaUpdate,
+    CategoryMergeResult,
+)
 from ..services.category_service import CategoryService
-from ..utils.exceptions import CategoryNotFoundError, DuplicateCategoryError
+from ..utils.exceptions import CategoryMergeError, CategoryNotFoundError, DuplicateCategoryError
 
 router = APIRouter(prefix="/api/categories", tags=["categories"])
 
@@ -31,6 +36,21 @@ async def create_category(
         )
 
 
+@router.post("/import", response_model=list[CategoriaResponse])
+async def import_categories(
+    categories: list[CategoriaCreate],
+    db: Session = Depends(get_db)
+) -> list[CategoriaResponse]:
+    """
+    Create or update several categories at once
+
+    Categories are matched by **nombre**; existing ones get the imported
+    icon, color and active flag.
+    """
+    service = CategoryService(db)
+    return service.import_categories(categories)
+
+
 @router.get("", response_model=list[CategoriaResponse])
 async def get_categories(
     active_only: bool = False,
@@ -63,3 +83,58 @@ async def get_category(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e)
         )
+
+
+@router.patch("/{category_id}", response_model=CategoriaResponse)
+async def update_category(
+    category_id: int,
+    changes: CategoriaUpdate,
+    db: Session = Depends(get_db)
+) -> CategoriaResponse:
+    """
+    Update a category
+
+    Only the fields sent are changed: rename with **nombre**, recolor with
+    **icono**/**color**, deactivate with **activo**: false.
+    """
+    try:
+        service = CategoryService(db)
+        return service.update_category(category_id, changes)
+    except CategoryNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except DuplicateCategoryError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/{category_id}/merge-into/{target_id}", response_model=CategoryMergeResult)
+def merge_category(
+    category_id: int,
+    target_id: int,
+    db: Session = Depends(get_db)
+) -> CategoryMergeResult:
+    """
+    Merge a category into another one
+
+    Every expense, subscription and monthly total of the category is moved
+    to the target in a single transaction; the merged category is deactivated.
+    """
+    try:
+        service = CategoryService(db)
+        categoria, moved = service.merge_category(category_id, target_id)
+        return CategoryMergeResult(categoria=categoria, gastos_reasignados=moved)
+    except CategoryNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except CategoryMergeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
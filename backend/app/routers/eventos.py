@@ -0,0 +1,73 @@
+import time
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from ..config import settings
+from ..database import get_session_factory, request_tenant, tenant_session_factory
+from ..security import events_token, tenant_from_events_token
+from ..services.event_broker import event_broker
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+
+def events_topic(request: Request, token: str | None) -> str:
+    """
+    Topic of the database a stream subscribes to
+
+    In per_user mode the tenant comes from a stream token in the query
+    string, which EventSource can send, or else from the bearer token.
+    """
+    if settings.tenant_mode != "per_user" or token is None:
+        factory = get_session_factory(request)
+    else:
+        tenant_id = tenant_from_events_token(token)
+        if tenant_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired event stream token"
+            )
+        factory = tenant_session_factory(tenant_id)
+    return str(factory.kw["bind"].url)
+
+
+@router.post("/token")
+def create_events_token(request: Request) -> dict[str, str | int]:
+    """
+    Short-lived token for ``GET /api/events?token=...``
+
+    Issued to the holder of a bearer token in per_user mode, so a browser
+    can open its tenant's stream with EventSource. Single mode streams need
+    no token.
+    """
+    if settings.tenant_mode != "per_user":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event stream tokens are only used in per_user tenant mode"
+        )
+    tenant_id = request_tenant(request)
+    tenant_session_factory(tenant_id)
+    expires = int(time.time()) + settings.events_token_seconds
+    return {"token": events_token(tenant_id, expires), "expires": expires}
+
+
+@router.get("")
+async def stream_events(request: Request, token: str | None = Query(None)) -> StreamingResponse:
+    """
+    Server-sent events of expense changes, for live dashboards
+
+    Every committed create, update or delete sends an ``expense_created``,
+    ``expense_updated`` or ``expense_deleted`` event with the expense and
+    the new totals of its month and category. An update that moves an
+    expense to another month or category, and each month and category that
+    materialized subscription charges land in, send ``totals_changed``
+    with that month and category's new totals. A client that falls behind
+    is disconnected and should reload its totals when EventSource
+    reconnects.
+    """
+    # Opening a tenant's database runs its migrations, off the event loop
+    topic = await run_in_threadpool(events_topic, request, token)
+    return StreamingResponse(
+        event_broker.stream(topic),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,17 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import calendar
+import csv
+import io
+from datetime import date
+from decimal import Decimal
+from typing import Literal
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from ..database import get_db
-from ..schemas.gasto import GastoCreate, GastoResponse, MonthlySummary
+from ..config import settings
+from ..database import get_db, get_session_factory, get_write_db
+from ..schemas.gasto import (
+    ExpenseForecast,
+    ExpenseStats,
+    GastoCreate,
+    GastoFilter,
+    GastoUpdate,
+    GastoResponse,
+    MonthlySummary,
+    YearlySummary,
+)
+from ..models.gasto import Gasto
 from ..services.expense_service import ExpenseService
-from ..utils.exceptions import ExpenseNotFoundError, CategoryNotFoundError
+from ..services.expense_writer import GroupCommitWriter, get_expense_writer
+from ..utils.encoding import (
+    MSGPACK_MEDIA_TYPE,
+    date_ordinal,
+    datetime_seconds,
+    pack_table,
+    wants_msgpack,
+)
+from ..utils.exceptions import (
+    ExpenseNotFoundError,
+    ExpenseVersionConflictError,
+    CategoryNotFoundError,
+)
 
 router = APIRouter(prefix="/api/expenses", tags=["expenses"])
 
+# Field order of expense rows in MessagePack responses
+MSGPACK_FIELDS = [
+    "id", "monto_centavos", "descripcion", "categoria_id", "fecha",
+    "notas", "version", "fecha_creacion", "fecha_actualizacion",
+]
+
+
+def _msgpack_row(expense: Gasto) -> list:
+    return [
+        expense.id, expense.monto_centavos, expense.descripcion, expense.categoria_id,
+        date_ordinal(expense.fecha), expense.notas, expense.version,
+        datetime_seconds(expense.fecha_creacion), datetime_seconds(expense.fecha_actualizacion),
+    ]
+
+
+def _etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _parse_if_match(value: str) -> list[int] | None:
+    """
+    Versions listed in an If-Match header such as "3", W/"3" or "1", "2"
+
+    None for *, which matches whatever version the expense is at.
+    """
+    if value.strip() == "*":
+        return None
+    versions = []
+    for tag in value.split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        try:
+            versions.append(int(tag))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid If-Match header: {value}"
+            )
+    return versions
+
+
+def get_writer(request: Request) -> GroupCommitWriter | None:
+    """Dependency for the group commit writer of the request's database, if enabled"""
+    if not settings.group_commit_enabled:
+        return None
+    return get_expense_writer(get_session_factory(request))
+
 
 @router.post("", response_model=GastoResponse, status_code=status.HTTP_201_CREATED)
 async def create_expense(
     expense: GastoCreate,
-    db: Session = Depends(get_db)
+    writer: GroupCommitWriter | None = Depends(get_writer),
+    db: Session | None = Depends(get_write_db)
 ) -> GastoResponse:
     """
     Create a new expense
@@ -23,6 +100,8 @@ async def create_expense(
     - **notas**: Optional notes
     """
     try:
+        if writer is not None:
+            return await writer.create(expense)
         service = ExpenseService(db)
         return service.create_expense(expense)
     except CategoryNotFoundError as e:
@@ -32,57 +111,236 @@ async def create_expense(
         )
 
 
+def _filter_range(
+    year: int | None, month: int | None, start: date | None, end: date | None
+) -> tuple[date | None, date | None]:
+    """Date range of the search, year and month narrowing start..end"""
+    if month is not None and year is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="month requires year"
+        )
+    if year is not None:
+        first = date(year, month or 1, 1)
+        last = date(year, month or 12, calendar.monthrange(year, month or 12)[1])
+        start = max(start, first) if start else first
+        end = min(end, last) if end else last
+    return start, end
+
+
 @router.get("", response_model=list[GastoResponse])
-async def get_expenses(
-    year: int | None = Query(None, description="Filter by year"),
-    month: int | None = Query(None, ge=1, le=12, description="Filter by month"),
-    categoria_id: int | None = Query(None, description="Filter by category ID"),
-    limit: int | None = Query(None, ge=1, le=100, description="Limit results"),
+def get_expenses(
+    request: Request,
+    response: Response,
+    start: date | None = Query(None, description="First date, inclusive"),
+    end: date | None = Query(None, description="Last date, inclusive"),
+    year: int | None = Query(None, ge=1, le=9999, description="Filter by year"),
+    month: int | None = Query(None, ge=1, le=12, description="Filter by month, with year"),
+    categoria_id: list[int] = Query([], description="Filter by category ID, repeat for several"),
+    monto_min: Decimal | None = Query(None, ge=0, description="Minimum amount, inclusive"),
+    monto_max: Decimal | None = Query(None, ge=0, description="Maximum amount, inclusive"),
+    q: str | None = Query(None, max_length=255, description="Text in the description or notes"),
+    sort: Literal["fecha", "-fecha", "monto", "-monto"] = Query("-fecha", description="Sort order"),
+    limit: int = Query(100, ge=1, le=1000, description="Page size"),
+    cursor: str | None = Query(None, description="X-Next-Cursor of the previous page"),
     db: Session = Depends(get_db)
 ) -> list[GastoResponse]:
     """
-    Get expenses with optional filters
+    Search expenses, every filter given is combined
+
+    - **start**, **end**: Date range (inclusive)
+    - **year**, **month**: Shorthand for the range of a year or a month
+    - **categoria_id**: Categories, e.g. `?categoria_id=1&categoria_id=3`
+    - **monto_min**, **monto_max**: Amount range (inclusive)
+    - **q**: Text in the description or notes
+    - **sort**: `fecha`, `monto`, prefixed by `-` for descending (default `-fecha`)
+    - **limit**: Page size
+
+    Results are always paginated: when there are more, the `X-Next-Cursor`
+    header holds the `cursor` of the next page.
 
-    - **year**: Filter by year
-    - **month**: Filter by month (1-12)
-    - **categoria_id**: Filter by category
-    - **limit**: Maximum number of results
+    With `Accept: application/msgpack` the expenses are sent as a header of
+    field names followed by one array per expense.
     """
+    start, end = _filter_range(year, month, start, end)
+    try:
+        filters = GastoFilter(
+            start=start, end=end, categoria_ids=categoria_id,
+            monto_min=monto_min, monto_max=monto_max, q=q, sort=sort
+        )
+        service = ExpenseService(db)
+        expenses, next_cursor = service.search_expenses(filters, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    # Both representations vary by Accept, or a shared cache could serve one for the other
+    headers = {"Vary": "Accept"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if wants_msgpack(request):
+        return Response(
+            content=b"".join(pack_table(MSGPACK_FIELDS, map(_msgpack_row, expenses))),
+            media_type=MSGPACK_MEDIA_TYPE,
+            headers=headers
+        )
+    response.headers.update(headers)
+    return expenses
+
+
+EXPORT_COLUMNS = ["id", "fecha", "monto", "categoria_id", "descripcion", "notas"]
+
+
+@router.get("/export")
+def export_expenses(request: Request, db: Session = Depends(get_db)) -> StreamingResponse:
+    """Export every expense as CSV (or MessagePack rows), streamed in batches"""
     service = ExpenseService(db)
 
-    if year and month:
-        return service.get_expenses_by_month(year, month)
-    elif categoria_id:
-        return service.get_expenses_by_categoria(categoria_id)
-    elif limit:
-        return service.get_recent_expenses(limit)
-    else:
-        return service.get_all_expenses()
+    if wants_msgpack(request):
+        return StreamingResponse(
+            pack_table(MSGPACK_FIELDS, map(_msgpack_row, service.export_expenses())),
+            media_type=MSGPACK_MEDIA_TYPE,
+            headers={"Vary": "Accept"}
+        )
+
+    def rows():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for index, expense in enumerate(service.export_expenses(), start=1):
+            writer.writerow([
+                expense.id, expense.fecha.isoformat(), expense.monto,
+                expense.categoria_id, expense.descripcion, expense.notas or ""
+            ])
+            if index % 500 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="gastos.csv"', "Vary": "Accept"}
+    )
+
+
+@router.get("/forecast", response_model=ExpenseForecast)
+def get_forecast(
+    months: int = Query(1, ge=1, le=24, description="Months to project, the current one first"),
+    db: Session = Depends(get_db)
+) -> ExpenseForecast:
+    """
+    Project where spending per category will end up
+
+    The current month's projection includes what was already spent.
+    """
+    service = ExpenseService(db)
+    return service.get_forecast(months)
+
+
+@router.get("/stats", response_model=ExpenseStats)
+def get_category_stats(
+    start: date = Query(..., description="First date, inclusive"),
+    end: date = Query(..., description="Last date, inclusive"),
+    top: int = Query(5, ge=0, le=50, description="Largest expenses listed per category"),
+    db: Session = Depends(get_db)
+) -> ExpenseStats:
+    """
+    Per-category count, total, mean, median, p90, maximum and largest expenses
+
+    Percentiles are nearest-rank over the expenses of start..end.
+    """
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    service = ExpenseService(db)
+    return service.get_category_stats(start, end, top)
 
 
 @router.get("/{expense_id}", response_model=GastoResponse)
 async def get_expense(
     expense_id: int,
+    response: Response,
     db: Session = Depends(get_db)
 ) -> GastoResponse:
     """Get a specific expense by ID"""
     try:
         service = ExpenseService(db)
-        return service.get_expense_by_id(expense_id)
+        expense = service.get_expense_by_id(expense_id)
     except ExpenseNotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e)
         )
+    response.headers["ETag"] = _etag(expense.version)
+    return expense
+
+
+@router.patch("/{expense_id}", response_model=GastoResponse)
+def update_expense(
+    expense_id: int,
+    changes: GastoUpdate,
+    response: Response,
+    if_match: str | None = Header(None),
+    db: Session = Depends(get_db)
+) -> GastoResponse:
+    """
+    Update an expense
+
+    Only the fields sent are changed. The version the client last read must
+    be given as an **If-Match** header (the ETag of GET) or as **version** in
+    the body; if the expense changed since, 409 is returned. If-Match may
+    also list several ETags, any of which matches, or be `*` to update
+    whatever the current version is.
+    """
+    versions = _parse_if_match(if_match) if if_match is not None else [changes.version]
+    if versions == [None]:
+        raise HTTPException(
+            status_code=status.HTTP_428_PRECONDITION_REQUIRED,
+            detail="Send the expected version as If-Match or in the body"
+        )
+
+    try:
+        service = ExpenseService(db)
+        if versions is not None and len(versions) == 1:
+            version = versions[0]
+        else:
+            # Settle on the current version if it is acceptable; the update
+            # itself still fails if the expense changes in between
+            version = service.get_expense_by_id(expense_id).version
+            if versions is not None and version not in versions:
+                raise ExpenseVersionConflictError(expense_id, versions[0])
+        expense = service.update_expense(expense_id, version, changes)
+    except (ExpenseNotFoundError, CategoryNotFoundError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except ExpenseVersionConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    response.headers["ETag"] = _etag(expense.version)
+    return expense
 
 
 @router.delete("/{expense_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_expense(
     expense_id: int,
-    db: Session = Depends(get_db)
+    writer: GroupCommitWriter | None = Depends(get_writer),
+    db: Session | None = Depends(get_write_db)
 ):
     """Delete an expense"""
     try:
+        if writer is not None:
+            await writer.delete(expense_id)
+            return
         service = ExpenseService(db)
         service.delete_expense(expense_id)
     except ExpenseNotFoundError as e:
@@ -93,7 +351,7 @@ async def delete_expense(
 
 
 @router.get("/dashboard/monthly", response_model=MonthlySummary)
-async def get_monthly_summary(
+def get_monthly_summary(
     year: int | None = Query(None, description="Year"),
     month: int | None = Query(None, ge=1, le=12, description="Month (1-12)"),
     db: Session = Depends(get_db)
@@ -109,3 +367,17 @@ async def get_monthly_summary(
         return service.get_monthly_summary(year, month)
     else:
         return service.get_current_month_summary()
+
+
+@router.get("/dashboard/yearly", response_model=YearlySummary)
+def get_yearly_summary(
+    year: int | None = Query(None, description="Year"),
+    db: Session = Depends(get_db)
+) -> YearlySummary:
+    """
+    Get per-month totals and amount percentiles for a year
+
+    If year is not provided, returns the current year
+    """
+    service = ExpenseService(db)
+    return service.get_yearly_summary(year or date.today().year)
@@ -0,0 +1,74 @@
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from ..database import get_db
+from ..schemas.presupuesto import PresupuestoCreate, PresupuestoResponse, BudgetStatus
+from ..services.budget_service import BudgetService
+from ..utils.exceptions import BudgetNotFoundError, CategoryNotFoundError
+
+router = APIRouter(prefix="/api/budgets", tags=["budgets"])
+
+
+@router.post("", response_model=PresupuestoResponse, status_code=status.HTTP_201_CREATED)
+async def set_budget(
+    budget: PresupuestoCreate,
+    db: Session = Depends(get_db)
+) -> PresupuestoResponse:
+    """
+    Create or replace the monthly budget of a category
+
+    - **categoria_id**: Category ID
+    - **monto**: Monthly limit (must be positive)
+    """
+    try:
+        service = BudgetService(db)
+        return service.set_budget(budget)
+    except CategoryNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.get("", response_model=list[PresupuestoResponse])
+async def get_budgets(db: Session = Depends(get_db)) -> list[PresupuestoResponse]:
+    """Get all budgets"""
+    service = BudgetService(db)
+    return service.get_all_budgets()
+
+
+@router.get("/status", response_model=list[BudgetStatus])
+async def get_budget_status(
+    year: int | None = Query(None, description="Year"),
+    month: int | None = Query(None, ge=1, le=12, description="Month (1-12)"),
+    db: Session = Depends(get_db)
+) -> list[BudgetStatus]:
+    """
+    Get month-to-date spend against every budget
+
+    Reads the incrementally maintained monthly totals, never the expenses
+    table. If year and month are not provided, uses the current month.
+    """
+    service = BudgetService(db)
+
+    if year and month:
+        return service.get_status(year, month)
+    else:
+        today = date.today()
+        return service.get_status(today.year, today.month)
+
+
+@router.delete("/{budget_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_budget(
+    budget_id: int,
+    db: Session = Depends(get_db)
+):
+    """Delete a budget"""
+    try:
+        service = BudgetService(db)
+        service.delete_budget(budget_id)
+    except BudgetNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
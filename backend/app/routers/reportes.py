@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from ..database import get_db
+from ..schemas.reporte import ReportJob, ReportRequest
+from ..services.report_service import report_jobs
+from ..services.result_cache import database_tag
+
+router = APIRouter(prefix="/api/reports", tags=["reports"])
+
+
+@router.post("", response_model=ReportJob, status_code=status.HTTP_202_ACCEPTED)
+def create_report(request: ReportRequest, db: Session = Depends(get_db)):
+    """
+    Start building a yearly report, returns the job to poll
+
+    Reports are built in a worker process. If the data has not changed
+    since the same report was last built, the job is already done.
+    """
+    try:
+        return report_jobs.submit(db, request.year).as_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/{job_id}", response_model=ReportJob)
+def get_report(job_id: str, db: Session = Depends(get_db)):
+    """Get the status of a report job, with the report once it is done"""
+    job = report_jobs.get(job_id, database_tag(db))
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Report job {job_id} not found"
+        )
+    return job.as_dict()
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from ..database import get_db
+from ..schemas.suscripcion import SuscripcionCreate, SuscripcionResponse, MaterializationResult
+from ..services.subscription_service import SubscriptionService
+from ..utils.exceptions import CategoryNotFoundError, SubscriptionNotFoundError
+
+router = APIRouter(prefix="/api/subscriptions", tags=["subscriptions"])
+
+
+@router.post("", response_model=SuscripcionResponse, status_code=status.HTTP_201_CREATED)
+async def create_subscription(
+    subscription: SuscripcionCreate,
+    db: Session = Depends(get_db)
+) -> SuscripcionResponse:
+    """
+    Create a new recurring subscription
+
+    - **nombre**: Subscription name, used as the expense description
+    - **monto**: Amount per period (must be positive)
+    - **categoria_id**: Category ID
+    - **periodicidad**: "mensual" or "anual"
+    - **fecha_inicio**: First charge date
+    """
+    try:
+        service = SubscriptionService(db)
+        return service.create_subscription(subscription)
+    except CategoryNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.get("", response_model=list[SuscripcionResponse])
+async def get_subscriptions(db: Session = Depends(get_db)) -> list[SuscripcionResponse]:
+    """Get all subscriptions"""
+    service = SubscriptionService(db)
+    return service.get_all_subscriptions()
+
+
+@router.post("/materialize", response_model=MaterializationResult)
+async def materialize_subscriptions(db: Session = Depends(get_db)) -> MaterializationResult:
+    """Materialize due charges now instead of waiting for the scheduler"""
+    service = SubscriptionService(db)
+    return MaterializationResult(gastos_creados=service.materialize_due())
+
+
+@router.delete("/{subscription_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_subscription(
+    subscription_id: int,
+    db: Session = Depends(get_db)
+):
+    """Delete a subscription"""
+    try:
+        service = SubscriptionService(db)
+        service.delete_subscription(subscription_id)
+    except SubscriptionNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
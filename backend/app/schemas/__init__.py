@@ -1,12 +1,84 @@
-from .categoria import CategoriaBase, CategoriaCreate, CategoriaResponse
-from .gasto import GastoBase, GastoCreate, GastoResponse, MonthlySummary
+from .categoria import (
+    CategoriaBase,
+    CategoriaCreate,
+    CategoriaResponse,
+    CategoriaUpdate,
+    CategoryMergeResult,
+)
+from .presupuesto import (
+    PresupuestoBase,
+    PresupuestoCreate,
+    PresupuestoResponse,
+    BudgetAlert,
+    BudgetStatus,
+)
+from .suscripcion import (
+    SuscripcionBase,
+    SuscripcionCreate,
+    SuscripcionResponse,
+    MaterializationResult,
+)
+from .batch import BatchOperation, BatchRequest, BatchResult, BatchResponse
+from .reporte import (
+    ReportRequest,
+    ReportMonth,
+    ReportCategory,
+    ReportDay,
+    ReportExpense,
+    YearlyReport,
+    ReportJob,
+)
+from .gasto import (
+    GastoBase,
+    GastoCreate,
+    GastoUpdate,
+    GastoFilter,
+    GastoResponse,
+    MonthlySummary,
+    YearlySummary,
+    MonthForecast,
+    ExpenseForecast,
+    StatsExpense,
+    CategoryStats,
+    ExpenseStats,
+)
 
 __all__ = [
     "CategoriaBase",
     "CategoriaCreate",
     "CategoriaResponse",
+    "CategoriaUpdate",
+    "CategoryMergeResult",
     "GastoBase",
     "GastoCreate",
+    "GastoUpdate",
+    "GastoFilter",
     "GastoResponse",
     "MonthlySummary",
+    "YearlySummary",
+    "MonthForecast",
+    "ExpenseForecast",
+    "StatsExpense",
+    "CategoryStats",
+    "ExpenseStats",
+    "PresupuestoBase",
+    "PresupuestoCreate",
+    "PresupuestoResponse",
+    "BudgetAlert",
+    "BudgetStatus",
+    "SuscripcionBase",
+    "SuscripcionCreate",
+    "SuscripcionResponse",
+    "MaterializationResult",
+    "BatchOperation",
+    "BatchRequest",
+    "BatchResult",
+    "BatchResponse",
+    "ReportRequest",
+    "ReportMonth",
+    "ReportCategory",
+    "ReportDay",
+    "ReportExpense",
+    "YearlyReport",
+    "ReportJob",
 ]
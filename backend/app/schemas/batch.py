@@ -0,0 +1,50 @@
+from typing import Annotated, Literal, Union
+from pydantic import BaseModel, Field
+from .categoria import CategoriaResponse
+from .gasto import GastoCreate, GastoResponse, MonthlySummary
+
+
+class CreateExpenseOperation(BaseModel):
+    op: Literal["create_expense"]
+    data: GastoCreate
+
+
+class DeleteExpenseOperation(BaseModel):
+    op: Literal["delete_expense"]
+    id: int = Field(..., gt=0)
+
+
+class GetSummaryOperation(BaseModel):
+    op: Literal["get_summary"]
+    year: int | None = None
+    month: int | None = Field(None, ge=1, le=12)
+
+
+class ListCategoriesOperation(BaseModel):
+    op: Literal["list_categories"]
+    active_only: bool = False
+
+
+BatchOperation = Annotated[
+    Union[
+        CreateExpenseOperation,
+        DeleteExpenseOperation,
+        GetSummaryOperation,
+        ListCategoriesOperation,
+    ],
+    Field(discriminator="op")
+]
+
+
+class BatchRequest(BaseModel):
+    """Operaciones ejecutadas en una sola sesión; las escrituras son atómicas"""
+    operations: list[BatchOperation] = Field(..., min_length=1, max_length=100)
+
+
+class BatchResult(BaseModel):
+    op: str
+    result: GastoResponse | MonthlySummary | list[CategoriaResponse] | None = None
+
+
+class BatchResponse(BaseModel):
+    results: list[BatchResult]
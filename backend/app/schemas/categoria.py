@@ -19,3 +19,17 @@ class CategoriaResponse(CategoriaBase):
 
     class Config:
         from_attributes = True
+
+
+class CategoriaUpdate(BaseModel):
+    """Partial update, only the fields sent are changed"""
+    nombre: str | None = Field(None, max_length=100)
+    icono: str | None = Field(None, max_length=50)
+    color: str | None = Field(None, max_length=7, pattern=r'^#[0-9A-Fa-f]{6}$')
+    activo: bool | None = None
+
+
+class CategoryMergeResult(BaseModel):
+    """Resultado de fusionar una categoría en otra"""
+    categoria: CategoriaResponse
+    gastos_reasignados: int
@@ -1,6 +1,9 @@
 from datetime import date, datetime
 from decimal import Decimal
-from pydantic import BaseModel, Field
+from typing import Annotated, Literal
+from pydantic import BaseModel, Field, model_validator
+from ..utils.money import to_centavos
+from .presupuesto import BudgetAlert
 
 
 class GastoBase(BaseModel):
@@ -10,15 +13,53 @@ class GastoBase(BaseModel):
     fecha: date
     notas: str | None = None
 
+    @property
+    def monto_centavos(self) -> int:
+        """Amount in integer minor units, as stored in the database"""
+        return to_centavos(self.monto)
+
 
 class GastoCreate(GastoBase):
     pass
 
 
+class GastoUpdate(BaseModel):
+    """Partial update, only the fields sent are changed"""
+    monto: Annotated[Decimal, Field(gt=0, decimal_places=2)] | None = None
+    descripcion: str | None = Field(None, max_length=255)
+    categoria_id: int | None = Field(None, gt=0)
+    fecha: date | None = None
+    notas: str | None = None
+    # Expected row version; may be sent as an If-Match header instead
+    version: int | None = None
+
+
+class GastoFilter(BaseModel):
+    """Expense search filters, every one sent is applied"""
+    start: date | None = None
+    end: date | None = None
+    categoria_ids: list[int] = []
+    monto_min: Annotated[Decimal, Field(ge=0, decimal_places=2)] | None = None
+    monto_max: Annotated[Decimal, Field(ge=0, decimal_places=2)] | None = None
+    # Matched anywhere in the description or the notes, case-insensitively
+    q: str | None = Field(None, max_length=255)
+    sort: Literal["fecha", "-fecha", "monto", "-monto"] = "-fecha"
+
+    @model_validator(mode="after")
+    def check_ranges(self) -> "GastoFilter":
+        if self.start and self.end and self.start > self.end:
+            raise ValueError("start must not be after end")
+        if self.monto_min is not None and self.monto_max is not None and self.monto_min > self.monto_max:
+            raise ValueError("monto_min must not be greater than monto_max")
+        return self
+
+
 class GastoResponse(GastoBase):
     id: int
+    version: int = 1
     fecha_creacion: datetime
     fecha_actualizacion: datetime | None = None
+    alertas_presupuesto: list[BudgetAlert] = []
 
     class Config:
         from_attributes = True
@@ -31,3 +72,57 @@ class MonthlySummary(BaseModel):
     total: Decimal
     count: int
     por_categoria: dict[str, Decimal] = {}
+
+
+class YearlySummary(BaseModel):
+    """Resumen anual de gastos"""
+    year: int
+    total: Decimal
+    count: int
+    por_mes: list[Decimal]
+    mediana: Decimal
+    p90: Decimal
+
+
+class MonthForecast(BaseModel):
+    """Proyección de gastos de un mes, con lo gastado hasta hoy incluido"""
+    year: int
+    month: int
+    total: Decimal
+    actual: Decimal
+    por_categoria: dict[str, Decimal] = {}
+
+
+class ExpenseForecast(BaseModel):
+    """Proyección de gastos por categoría del mes actual y los siguientes"""
+    fecha: date
+    history_days: int
+    por_mes: list[MonthForecast]
+
+
+class StatsExpense(BaseModel):
+    """Gasto entre los mayores de una categoría"""
+    id: int
+    fecha: date
+    descripcion: str
+    monto: Decimal
+
+
+class CategoryStats(BaseModel):
+    """Distribución de los gastos de una categoría"""
+    categoria_id: int
+    nombre: str
+    count: int
+    total: Decimal
+    media: Decimal
+    mediana: Decimal
+    p90: Decimal
+    maximo: Decimal
+    mayores: list[StatsExpense]
+
+
+class ExpenseStats(BaseModel):
+    """Estadísticas por categoría de los gastos de un rango de fechas"""
+    start: date
+    end: date
+    por_categoria: list[CategoryStats]
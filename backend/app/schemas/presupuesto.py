@@ -0,0 +1,46 @@
+from datetime import datetime
+from decimal import Decimal
+from pydantic import BaseModel, Field
+from ..utils.money import to_centavos
+
+
+class PresupuestoBase(BaseModel):
+    categoria_id: int = Field(..., gt=0)
+    monto: Decimal = Field(..., gt=0, decimal_places=2)
+
+    @property
+    def monto_centavos(self) -> int:
+        """Monthly limit in integer minor units, as stored in the database"""
+        return to_centavos(self.monto)
+
+
+class PresupuestoCreate(PresupuestoBase):
+    pass
+
+
+class PresupuestoResponse(PresupuestoBase):
+    id: int
+    fecha_creacion: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class BudgetAlert(BaseModel):
+    """Umbral de presupuesto cruzado por un gasto"""
+    categoria_id: int
+    year: int
+    month: int
+    umbral: float
+    presupuesto: Decimal
+    gastado: Decimal
+
+
+class BudgetStatus(BaseModel):
+    """Estado del presupuesto de una categoría en un mes"""
+    categoria_id: int
+    categoria: str
+    presupuesto: Decimal
+    gastado: Decimal
+    porcentaje: float
+    umbral_alcanzado: float | None = None
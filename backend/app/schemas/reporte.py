@@ -0,0 +1,62 @@
+from datetime import date
+from decimal import Decimal
+from typing import Literal
+from pydantic import BaseModel, Field
+
+
+class ReportRequest(BaseModel):
+    """Reporte anual a generar"""
+    year: int = Field(..., ge=1900, le=9999)
+
+
+class ReportMonth(BaseModel):
+    """Mes de un reporte anual, con suscripciones separadas de los gastos"""
+    mes: int
+    gastos: Decimal
+    suscripciones: Decimal
+    total: Decimal
+    count: int
+
+
+class ReportCategory(BaseModel):
+    categoria_id: int
+    nombre: str
+    total: Decimal
+    count: int
+    porcentaje: float
+    por_mes: list[Decimal]
+
+
+class ReportDay(BaseModel):
+    fecha: date
+    total: Decimal
+
+
+class ReportExpense(BaseModel):
+    id: int
+    fecha: date
+    descripcion: str
+    categoria: str
+    monto: Decimal
+
+
+class YearlyReport(BaseModel):
+    """Reporte anual: tablas por mes y por categoría más series para gráficos"""
+    year: int
+    meses: int
+    total: Decimal
+    count: int
+    por_mes: list[ReportMonth]
+    por_categoria: list[ReportCategory]
+    diario: list[ReportDay]
+    mayores: list[ReportExpense]
+
+
+class ReportJob(BaseModel):
+    """Estado de un reporte en curso, con el resultado una vez terminado"""
+    id: str
+    year: int
+    status: Literal["pending", "running", "done", "failed"]
+    version: str
+    error: str | None = None
+    resultado: YearlyReport | None = None
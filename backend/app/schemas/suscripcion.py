@@ -0,0 +1,37 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Literal
+from pydantic import BaseModel, Field
+from ..utils.money import to_centavos
+
+
+class SuscripcionBase(BaseModel):
+    nombre: str = Field(..., max_length=100)
+    monto: Decimal = Field(..., gt=0, decimal_places=2)
+    categoria_id: int = Field(..., gt=0)
+    periodicidad: Literal["mensual", "anual"] = "mensual"
+    fecha_inicio: date
+    activo: bool = True
+
+    @property
+    def monto_centavos(self) -> int:
+        """Amount per period in integer minor units, as stored in the database"""
+        return to_centavos(self.monto)
+
+
+class SuscripcionCreate(SuscripcionBase):
+    pass
+
+
+class SuscripcionResponse(SuscripcionBase):
+    id: int
+    materializado_hasta: date | None = None
+    fecha_creacion: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class MaterializationResult(BaseModel):
+    """Resultado de materializar cargos recurrentes"""
+    gastos_creados: int
@@ -0,0 +1,108 @@
+"""
+Signed bearer tokens.
+
+In per_user tenant mode every API request carries
+``Authorization: Bearer <token>``. A token is the tenant id and an
+HMAC-SHA256 of it keyed with ``auth_secret``, so a client can only reach
+the database of the tenant it was issued for. Tokens are printed when a
+tenant is provisioned (``python -m app.tenants create <id>``).
+
+Browsers' EventSource cannot send headers, so event streams take a
+short-lived token in the query string instead, issued to a bearer token's
+holder and carrying the tenant and an expiry under its own purpose.
+
+Admin endpoints that expose data take a separate shared ``admin_token``
+as ``X-Admin-Token``, so an operator's credential is not a tenant's.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import time
+
+from fastapi import Header, HTTPException, Request, status
+
+from .config import settings
+
+
+def _encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(purpose: str, value: str) -> bytes:
+    if not settings.auth_secret:
+        raise RuntimeError("AUTH_SECRET must be set to issue or check tokens")
+    message = f"{purpose}:{value}".encode("utf-8")
+    return hmac.new(settings.auth_secret.encode("utf-8"), message, hashlib.sha256).digest()
+
+
+def sign(purpose: str, value: str) -> str:
+    """Token carrying value, only valid for purpose"""
+    return f"{_encode(value.encode('utf-8'))}.{_encode(_signature(purpose, value))}"
+
+
+def verify(purpose: str, token: str) -> str | None:
+    """Value of a token signed for purpose, None if it is malformed or forged"""
+    encoded_value, _, encoded_signature = token.partition(".")
+    try:
+        value = _decode(encoded_value).decode("utf-8")
+        signature = _decode(encoded_signature)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not hmac.compare_digest(signature, _signature(purpose, value)):
+        return None
+    return value
+
+
+def tenant_token(tenant_id: str) -> str:
+    """Bearer token of a tenant"""
+    return sign("tenant", tenant_id)
+
+
+def tenant_from_token(token: str) -> str | None:
+    """Tenant id of a bearer token, None if it is invalid"""
+    return verify("tenant", token)
+
+
+def events_token(tenant_id: str, expires: int) -> str:
+    """Event stream token of a tenant, valid until the expires Unix time"""
+    return sign("events", f"{expires}:{tenant_id}")
+
+
+def tenant_from_events_token(token: str, now: float | None = None) -> str | None:
+    """Tenant id of an event stream token, None if it is invalid or expired"""
+    value = verify("events", token)
+    if value is None:
+        return None
+    expires, _, tenant_id = value.partition(":")
+    if int(expires) < (time.time() if now is None else now):
+        return None
+    return tenant_id
+
+
+def bearer_token(request: Request) -> str | None:
+    """Token of an ``Authorization: Bearer`` header"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token.strip()
+
+
+def require_admin(x_admin_token: str | None = Header(None)) -> None:
+    """Dependency of admin endpoints: the X-Admin-Token header must be admin_token"""
+    if not settings.admin_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled, set ADMIN_TOKEN to enable them"
+        )
+    if x_admin_token is None or not hmac.compare_digest(
+        x_admin_token.encode("utf-8"), settings.admin_token.encode("utf-8")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing or invalid X-Admin-Token"
+        )
@@ -0,0 +1,238 @@
+"""
+Seed the database with default categories and synthetic expenses.
+
+Usage (from the backend directory):
+
+    python -m app.seed categories
+    python -m app.seed expenses --rows 1000000 --start 2020-01-01 --seed 7
+
+Expenses are generated deterministically from --seed and bulk loaded with
+executemany batches inside a single transaction. On SQLite, durability
+pragmas are relaxed for the duration of the load and restored afterwards.
+"""
+import argparse
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterator
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .database import engine as default_engine, init_db, make_engine
+from .models.categoria import Categoria
+from .repositories.categoria_repository import CategoriaRepository
+from .repositories.resumen_repository import ResumenMensualRepository
+
+DEFAULT_CATEGORIES = [
+    {"nombre": "Comida", "icono": "🍔", "color": "#10B981"},
+    {"nombre": "Transporte", "icono": "🚗", "color": "#3B82F6"},
+    {"nombre": "Servicios", "icono": "💡", "color": "#F59E0B"},
+    {"nombre": "Compras", "icono": "🛍️", "color": "#8B5CF6"},
+    {"nombre": "Entretenimiento", "icono": "🎬", "color": "#EC4899"},
+    {"nombre": "Salud", "icono": "⚕️", "color": "#EF4444"},
+    {"nombre": "Otros", "icono": "📦", "color": "#6B7280"},
+]
+
+# Relative frequency of each default category in generated data
+DEFAULT_MIX = {
+    "Comida": 35,
+    "Transporte": 20,
+    "Servicios": 8,
+    "Compras": 15,
+    "Entretenimiento": 10,
+    "Salud": 5,
+    "Otros": 7,
+}
+
+DESCRIPCIONES = {
+    "Comida": ["Supermercado", "Almuerzo", "Cena", "Café", "Verdulería", "Delivery"],
+    "Transporte": ["Colectivo", "Nafta", "Taxi", "Peaje", "Estacionamiento"],
+    "Servicios": ["Luz", "Gas", "Agua", "Internet", "Teléfono"],
+    "Compras": ["Ropa", "Electrónica", "Hogar", "Librería"],
+    "Entretenimiento": ["Cine", "Streaming", "Salida", "Libro"],
+    "Salud": ["Farmacia", "Consulta", "Análisis"],
+}
+
+INSERT_BATCH_SIZE = 50_000
+
+_SQLITE_LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "journal_mode": "MEMORY",
+    "temp_store": "MEMORY",
+    "cache_size": "-262144",  # 256 MiB
+}
+
+
+def seed_categories(db: Session) -> int:
+    """Insert missing default categories, leaving existing ones untouched"""
+    now = datetime.utcnow()
+    CategoriaRepository(db).upsert_many(
+        [{**categoria, "activo": True, "fecha_creacion": now} for categoria in DEFAULT_CATEGORIES],
+        update_existing=False
+    )
+    db.commit()
+    return len(DEFAULT_CATEGORIES)
+
+
+def _relaxed_pragmas(conn: Connection) -> dict[str, str]:
+    """Relax SQLite durability for a bulk load, returns the previous values"""
+    previous = {}
+    for pragma, value in _SQLITE_LOAD_PRAGMAS.items():
+        previous[pragma] = str(conn.exec_driver_sql(f"PRAGMA {pragma}").scalar())
+        conn.exec_driver_sql(f"PRAGMA {pragma} = {value}")
+    return previous
+
+
+def _restore_pragmas(conn: Connection, previous: dict[str, str]) -> None:
+    for pragma, value in previous.items():
+        conn.exec_driver_sql(f"PRAGMA {pragma} = {value}")
+
+
+def _generate_rows(
+    rows: int,
+    categorias: dict[str, int],
+    mix: dict[str, float],
+    start: date,
+    end: date,
+    amount_median: float,
+    amount_sigma: float,
+    seed: int,
+    totals: dict[tuple[int, int, int], list[int]]
+) -> Iterator[list[tuple]]:
+    """Yield batches of gastos rows, accumulating monthly totals as it goes"""
+    rng = random.Random(seed)
+    nombres = [nombre for nombre in mix if nombre in categorias]
+    weights = [mix[nombre] for nombre in nombres]
+    span = (end - start).days + 1
+    dias = [start + timedelta(days=offset) for offset in range(span)]
+    fechas = [dia.isoformat() for dia in dias]
+    mu = math.log(amount_median * 100)
+    creado = datetime.utcnow().isoformat(sep=" ")
+
+    remaining = rows
+    while remaining:
+        size = min(INSERT_BATCH_SIZE, remaining)
+        remaining -= size
+        batch = []
+        elegidas = rng.choices(nombres, weights, k=size)
+        for nombre in elegidas:
+            categoria_id = categorias[nombre]
+            offset = rng.randrange(span)
+            monto = max(1, int(rng.lognormvariate(mu, amount_sigma)))
+            descripcion = rng.choice(DESCRIPCIONES.get(nombre, [nombre]))
+            batch.append((monto, descripcion, categoria_id, fechas[offset], None, creado))
+
+            dia = dias[offset]
+            total = totals[(dia.year, dia.month, categoria_id)]
+            total[0] += monto
+            total[1] += 1
+        yield batch
+
+
+def generate_expenses(
+    bind: Engine,
+    rows: int,
+    start: date,
+    end: date,
+    mix: dict[str, float] | None = None,
+    amount_median: float = 25.0,
+    amount_sigma: float = 1.0,
+    seed: int = 42
+) -> int:
+    """
+    Bulk load synthetic expenses in one transaction, returns the rows inserted
+
+    Amounts follow a log-normal distribution around amount_median; dates are
+    uniform between start and end; categories are drawn with the mix weights.
+    Monthly totals are updated once per month and category at the end.
+    """
+    mix = mix or DEFAULT_MIX
+    totals: dict[tuple[int, int, int], list[int]] = defaultdict(lambda: [0, 0])
+
+    with bind.connect() as conn:
+        categorias = dict(conn.execute(select(Categoria.nombre, Categoria.id)).all())
+        missing = set(mix) - set(categorias)
+        if missing:
+            raise ValueError(f"Unknown categories in mix: {', '.join(sorted(missing))}")
+
+        is_sqlite = bind.dialect.name == "sqlite"
+        previous = _relaxed_pragmas(conn) if is_sqlite else {}
+        placeholder = "?" if bind.dialect.paramstyle == "qmark" else "%s"
+        insert_sql = (
+            "INSERT INTO gastos "
+            "(monto_centavos, descripcion, categoria_id, fecha, notas, fecha_creacion) "
+            f"VALUES ({', '.join([placeholder] * 6)})"
+        )
+        conn.commit()  # End the autobegun read so the load gets its own transaction
+        try:
+            with conn.begin():
+                for batch in _generate_rows(
+                    rows, categorias, mix, start, end, amount_median, amount_sigma, seed, totals
+                ):
+                    conn.exec_driver_sql(insert_sql, batch)
+
+                resumen_repo = ResumenMensualRepository(Session(bind=conn))
+                for (anio, mes, categoria_id), (total, cantidad) in totals.items():
+                    resumen_repo.apply_delta(anio, mes, categoria_id, total, cantidad)
+        finally:
+            if is_sqlite:
+                _restore_pragmas(conn, previous)
+                conn.commit()
+    return rows
+
+
+def _parse_mix(value: str) -> dict[str, float]:
+    """Parse "Comida=30,Transporte=10" into a weights dict"""
+    mix = {}
+    for item in value.split(","):
+        nombre, _, weight = item.partition("=")
+        mix[nombre.strip()] = float(weight)
+    return mix
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.seed", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to seed (default: settings)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("categories", help="Insert the default categories")
+
+    expenses = commands.add_parser("expenses", help="Generate synthetic expenses")
+    expenses.add_argument("--rows", type=int, default=100_000)
+    expenses.add_argument("--start", type=date.fromisoformat,
+                          default=date.today().replace(month=1, day=1) - timedelta(days=4 * 365))
+    expenses.add_argument("--end", type=date.fromisoformat, default=date.today())
+    expenses.add_argument("--mix", type=_parse_mix,
+                          help='Category weights, e.g. "Comida=30,Transporte=10"')
+    expenses.add_argument("--amount-median", type=float, default=25.0,
+                          help="Median expense amount")
+    expenses.add_argument("--amount-sigma", type=float, default=1.0,
+                          help="Log-normal spread of amounts")
+    expenses.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args(argv)
+    bind = make_engine(args.database_url) if args.database_url else default_engine
+
+    init_db(bind)
+    with Session(bind=bind) as db:
+        count = seed_categories(db)
+    print(f"[OK] Ensured {count} default categories")
+
+    if args.command == "expenses":
+        started = time.perf_counter()
+        generate_expenses(
+            bind, args.rows, args.start, args.end, args.mix,
+            args.amount_median, args.amount_sigma, args.seed
+        )
+        elapsed = time.perf_counter() - started
+        print(f"[OK] Inserted {args.rows} expenses in {elapsed:.1f}s "
+              f"({args.rows / elapsed * 60:,.0f} rows/min)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,15 @@
 from .expense_service import ExpenseService
 from .category_service import CategoryService
+from .budget_service import BudgetService
+from .subscription_service import SubscriptionService
+from .batch_service import BatchService
+from .backup_service import BackupService
 
-__all__ = ["ExpenseService", "CategoryService"]
+__all__ = [
+    "ExpenseService",
+    "CategoryService",
+    "BudgetService",
+    "SubscriptionService",
+    "BatchService",
+    "BackupService",
+]
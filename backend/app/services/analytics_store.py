@@ -0,0 +1,279 @@
+"""
+Columnar in-memory snapshot of gastos for dashboard analytics.
+
+The snapshot keeps one contiguous NumPy array per column (id, date ordinal,
+category id and amount in cents). It is built lazily with a single query the
+first time an analytic is requested and then kept current by ExpenseService,
+which records every committed create/delete, so summaries, series and
+percentiles become vectorized operations instead of SQL round trips.
+
+Changes recorded while the load query runs are queued and replayed on the
+loaded arrays: an expense committed after the query read the table would
+otherwise be in neither. Replays are idempotent, so changes the query did
+see are not applied twice.
+"""
+import threading
+from datetime import date
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..archive import gastos_for_range
+from ..config import settings
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_INITIAL_CAPACITY = 1024
+
+
+def _month_bounds(year: int, month: int) -> tuple[int, int]:
+    """Return [start, end) date ordinals for a month"""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start.toordinal(), end.toordinal()
+
+
+class ColumnarExpenseStore:
+    """Append-friendly column arrays of expenses, ordered by id"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Serializes loads; held while the load query runs, unlike _lock
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        # Changes recorded during a load, None when no load is running
+        self._pending: list[tuple] | None = None
+        # Bumped by clear(), so a load that overlapped it is not kept
+        self._generation = 0
+        self._size = 0
+        self._ids = np.empty(_INITIAL_CAPACITY, dtype=np.int64)
+        self._fechas = np.empty(_INITIAL_CAPACITY, dtype=np.int32)
+        self._categorias = np.empty(_INITIAL_CAPACITY, dtype=np.int32)
+        self._montos = np.empty(_INITIAL_CAPACITY, dtype=np.int64)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the column buffers, including spare capacity"""
+        return (
+            self._ids.nbytes + self._fechas.nbytes
+            + self._categorias.nbytes + self._montos.nbytes
+        )
+
+    # Loading and incremental maintenance
+
+    def ensure_loaded(self, db: Session) -> None:
+        """Build the snapshot from the database if it has not been built yet"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._load(db)
+
+    def load(self, db: Session) -> None:
+        """(Re)build the snapshot with a single query"""
+        with self._load_lock:
+            self._load(db)
+
+    def _load(self, db: Session) -> None:
+        with self._lock:
+            self._pending = []
+            generation = self._generation
+        try:
+            # Archived years included, the snapshot serves every year
+            gastos = gastos_for_range(db, None, None)
+            rows = db.execute(
+                select(gastos.id, gastos.fecha, gastos.categoria_id, gastos.monto_centavos)
+                .order_by(gastos.id)
+            ).all()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        size = len(rows)
+        capacity = max(_INITIAL_CAPACITY, size)
+
+        with self._lock:
+            pending, self._pending = self._pending, None
+            if generation != self._generation:
+                # Cleared while loading: rows may predate what was cleared
+                return
+            self._ids = np.empty(capacity, dtype=np.int64)
+            self._fechas = np.empty(capacity, dtype=np.int32)
+            self._categorias = np.empty(capacity, dtype=np.int32)
+            self._montos = np.empty(capacity, dtype=np.int64)
+            if size:
+                ids, fechas, categorias, montos = zip(*rows)
+                self._ids[:size] = ids
+                self._fechas[:size] = [fecha.toordinal() for fecha in fechas]
+                self._categorias[:size] = categorias
+                self._montos[:size] = montos
+            self._size = size
+            for change, *args in pending:
+                change(*args)
+            self._loaded = True
+
+    def clear(self) -> None:
+        """Drop the snapshot; it is rebuilt on next use"""
+        with self._lock:
+            self._size = 0
+            self._loaded = False
+            self._generation += 1
+
+    def record_insert(
+        self, gasto_id: int, fecha: date, categoria_id: int, monto_centavos: int
+    ) -> None:
+        """Add a committed expense to the snapshot"""
+        self._record(self._insert, gasto_id, fecha, categoria_id, monto_centavos)
+
+    def record_delete(self, gasto_id: int) -> None:
+        """Remove a committed deletion from the snapshot"""
+        self._record(self._delete, gasto_id)
+
+    def record_reassign(self, source_id: int, target_id: int) -> None:
+        """Apply a committed category merge to the snapshot"""
+        self._record(self._reassign, source_id, target_id)
+
+    def _record(self, change, *args) -> None:
+        """Apply a change now, queue it for the running load, or drop it before the first load"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((change, *args))
+            elif self._loaded:
+                change(*args)
+
+    # Changes, called with _lock held
+
+    def _insert(self, gasto_id: int, fecha: date, categoria_id: int, monto_centavos: int) -> None:
+        if self._size == len(self._ids):
+            self._grow()
+        size = self._size
+        # Ids are autoincremented, so appends almost always stay sorted
+        position = size
+        if size and gasto_id <= self._ids[size - 1]:
+            position = int(np.searchsorted(self._ids[:size], gasto_id))
+            if self._ids[position] == gasto_id:
+                # Already read by the load this was queued during
+                return
+            for column in self._columns():
+                column[position + 1:size + 1] = column[position:size]
+        self._ids[position] = gasto_id
+        self._fechas[position] = fecha.toordinal()
+        self._categorias[position] = categoria_id
+        self._montos[position] = monto_centavos
+        self._size = size + 1
+
+    def _delete(self, gasto_id: int) -> None:
+        position = self._position(gasto_id)
+        if position is None:
+            return
+        size = self._size
+        for column in self._columns():
+            column[position:size - 1] = column[position + 1:size]
+        self._size = size - 1
+
+    def _reassign(self, source_id: int, target_id: int) -> None:
+        categorias = self._categorias[:self._size]
+        categorias[categorias == source_id] = target_id
+
+    def _columns(self) -> tuple[np.ndarray, ...]:
+        return self._ids, self._fechas, self._categorias, self._montos
+
+    def _position(self, gasto_id: int) -> int | None:
+        position = int(np.searchsorted(self._ids[:self._size], gasto_id))
+        if position < self._size and self._ids[position] == gasto_id:
+            return position
+        return None
+
+    def _grow(self) -> None:
+        capacity = max(_INITIAL_CAPACITY, len(self._ids) * 2)
+        self._ids = np.resize(self._ids, capacity)
+        self._fechas = np.resize(self._fechas, capacity)
+        self._categorias = np.resize(self._categorias, capacity)
+        self._montos = np.resize(self._montos, capacity)
+
+    # Vectorized queries
+
+    def _select(self, start: int, end: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return (fechas, categorias, montos) for date ordinals in [start, end)"""
+        with self._lock:
+            size = self._size
+            fechas = self._fechas[:size]
+            mask = (fechas >= start) & (fechas < end)
+            return fechas[mask], self._categorias[:size][mask], self._montos[:size][mask]
+
+    def _totals_by_categoria(self, start: int, end: int) -> dict[int, tuple[int, int]]:
+        _, categorias, montos = self._select(start, end)
+        if not len(categorias):
+            return {}
+        counts = np.bincount(categorias)
+        # Float weights are exact for sums below 2**53 cents
+        totals = np.bincount(categorias, weights=montos)
+        return {
+            int(categoria_id): (int(counts[categoria_id]), int(round(totals[categoria_id])))
+            for categoria_id in np.flatnonzero(counts)
+        }
+
+    def totals_by_categoria(self, start: date, end: date) -> dict[int, tuple[int, int]]:
+        """Return {categoria_id: (count, total cents)} for start <= fecha <= end"""
+        return self._totals_by_categoria(start.toordinal(), end.toordinal() + 1)
+
+    def month_totals_by_categoria(self, year: int, month: int) -> dict[int, tuple[int, int]]:
+        """Return {categoria_id: (count, total cents)} for one month"""
+        return self._totals_by_categoria(*_month_bounds(year, month))
+
+    def monthly_series(self, year: int) -> tuple[list[int], list[int]]:
+        """Return per-month (counts, total cents) for a year, January first"""
+        start, end = date(year, 1, 1).toordinal(), date(year + 1, 1, 1).toordinal()
+        fechas, _, montos = self._select(start, end)
+        months = (
+            (fechas - _EPOCH_ORDINAL).astype("datetime64[D]")
+            .astype("datetime64[M]").astype(np.int64)
+            - (year - 1970) * 12
+        )
+        counts = np.bincount(months, minlength=12)
+        totals = np.bincount(months, weights=montos, minlength=12)
+        return [int(c) for c in counts], [int(round(t)) for t in totals]
+
+    def daily_totals(self, categoria_ids: list[int], start: date, end: date) -> np.ndarray:
+        """Return a (categories x days) matrix of daily total cents for start <= fecha <= end"""
+        days = end.toordinal() - start.toordinal() + 1
+        fechas, categorias, montos = self._select(start.toordinal(), end.toordinal() + 1)
+        size = max(max(categoria_ids, default=0), int(categorias.max(initial=0))) + 1
+        lookup = np.full(size, -1, dtype=np.int64)
+        lookup[categoria_ids] = np.arange(len(categoria_ids))
+        positions = lookup[categorias]
+        known = positions >= 0
+        cells = positions[known] * days + (fechas[known] - start.toordinal())
+        totals = np.bincount(cells, weights=montos[known], minlength=len(categoria_ids) * days)
+        return totals.reshape(len(categoria_ids), days)
+
+    def percentiles(self, start: date, end: date, quantiles: list[float]) -> list[int]:
+        """Return nearest-rank percentiles of amounts (cents) for start <= fecha <= end"""
+        _, _, montos = self._select(start.toordinal(), end.toordinal() + 1)
+        if not len(montos):
+            return [0 for _ in quantiles]
+        values = np.percentile(montos, [q * 100 for q in quantiles], method="inverted_cdf")
+        return [int(value) for value in values]
+
+
+_stores: dict[str, ColumnarExpenseStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_expense_store(db: Session) -> ColumnarExpenseStore | None:
+    """Return the process-wide store for this session's database, if enabled"""
+    if not settings.analytics_store_enabled:
+        return None
+    key = str(db.get_bind().url)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ColumnarExpenseStore()
+        return store
@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import tarfile
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator
+from sqlalchemy.orm import Session
+from ..archive import SCHEMA, archive_path
+from ..config import settings
+
+# Bytes read from the snapshot per compressed chunk
+CHUNK_SIZE = 1024 * 1024
+
+
+class BackupService:
+    """Service for online database backups"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def snapshot(
+        self,
+        pages_per_step: int | None = None,
+        sleep_seconds: float | None = None
+    ) -> list[tuple[str, Path]]:
+        """
+        Copy the live database and its archive into temporary files
+
+        Returns the (file name, temporary path) of each copy. Both are read
+        inside one read transaction, so they are consistent with each other.
+        In WAL mode that transaction never blocks writers and the database
+        is copied in steps of pages_per_step pages with a pause in between,
+        leaving I/O for live traffic. In rollback-journal mode a write by
+        another connection would restart a stepped backup, so the file is
+        copied in a single step during which writers wait, and asking for
+        steps is an error.
+        """
+        bind = self.db.get_bind()
+        if bind.dialect.name != "sqlite":
+            raise ValueError("Online backups are only supported for SQLite databases")
+
+        source = bind.raw_connection()
+        copies: list[tuple[str, Path]] = []
+        try:
+            connection = source.driver_connection
+            wal = connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            if not wal and (pages_per_step is not None or sleep_seconds is not None):
+                raise ValueError(
+                    "pages_per_step and sleep_seconds need SQLITE_JOURNAL_MODE=wal: in "
+                    "rollback-journal mode the backup runs in one step"
+                )
+            attached = {row[1] for row in connection.execute("PRAGMA database_list")}
+            schemas = ["main"] + ([SCHEMA] if SCHEMA in attached else [])
+
+            connection.execute("BEGIN")
+            for schema in schemas:
+                connection.execute(f"SELECT 1 FROM {schema}.sqlite_master").fetchall()
+            pages = pages_per_step or settings.backup_pages_per_step
+            sleep = settings.backup_sleep_seconds if sleep_seconds is None else sleep_seconds
+            names = {"main": Path(bind.url.database).name, SCHEMA: archive_path(bind).name}
+            for schema in schemas:
+                fd, name = tempfile.mkstemp(suffix=".db")
+                os.close(fd)
+                copies.append((names[schema], Path(name)))
+                target = sqlite3.connect(name)
+                try:
+                    if wal and schema == "main":
+                        connection.backup(
+                            target, pages=pages, name=schema, progress=lambda *_: time.sleep(sleep)
+                        )
+                    else:
+                        # The archive only changes when a year is (un)archived
+                        connection.backup(target, name=schema)
+                    # A copy of a WAL database is marked WAL too; make it a standalone file
+                    target.execute("PRAGMA journal_mode = DELETE")
+                finally:
+                    target.close()
+        except Exception:
+            for _, path in copies:
+                path.unlink(missing_ok=True)
+            raise
+        finally:
+            source.rollback()
+            source.close()
+        return copies
+
+
+def _tar_member(name: str, path: Path) -> Iterator[bytes]:
+    """A file as a tar member: header, content in chunks, padding"""
+    info = tarfile.TarInfo(name)
+    info.size = path.stat().st_size
+    info.mtime = int(time.time())
+    yield info.tobuf(format=tarfile.PAX_FORMAT)
+    with open(path, "rb") as snapshot:
+        while chunk := snapshot.read(CHUNK_SIZE):
+            yield chunk
+    yield b"\0" * (-info.size % tarfile.BLOCKSIZE)
+
+
+def stream_tar_gz(files: list[tuple[str, Path]]) -> Iterator[bytes]:
+    """Stream files as a gzip-compressed tar archive, deleting them once sent"""
+    compressor = zlib.compressobj(level=6, wbits=31)  # wbits=31 writes a gzip header
+    try:
+        for name, path in files:
+            for block in _tar_member(name, path):
+                compressed = compressor.compress(block)
+                if compressed:
+                    yield compressed
+        yield compressor.compress(b"\0" * (2 * tarfile.BLOCKSIZE))
+        yield compressor.flush()
+    finally:
+        for _, path in files:
+            path.unlink(missing_ok=True)
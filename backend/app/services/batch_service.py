@@ -0,0 +1,65 @@
+from sqlalchemy.orm import Session
+from ..schemas.batch import (
+    BatchOperation,
+    BatchResult,
+    CreateExpenseOperation,
+    DeleteExpenseOperation,
+    GetSummaryOperation,
+    ListCategoriesOperation,
+)
+from ..schemas.categoria import CategoriaResponse
+from ..schemas.gasto import GastoResponse
+from ..utils.exceptions import BatchOperationError, ExpenseNotFoundError, CategoryNotFoundError
+from .category_service import CategoryService
+from .expense_service import ExpenseService
+
+
+class BatchService:
+    """Runs a list of operations through the regular services in one transaction"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.expense_service = ExpenseService(db, autocommit=False)
+        self.category_service = CategoryService(db)
+        self._handlers = {
+            "create_expense": self._create_expense,
+            "delete_expense": self._delete_expense,
+            "get_summary": self._get_summary,
+            "list_categories": self._list_categories,
+        }
+
+    def execute(self, operations: list[BatchOperation]) -> list[BatchResult]:
+        """Execute operations in order, committing all writes or none"""
+        results = []
+        try:
+            for index, operation in enumerate(operations):
+                try:
+                    result = self._handlers[operation.op](operation)
+                except (ExpenseNotFoundError, CategoryNotFoundError) as e:
+                    raise BatchOperationError(index, operation.op, e) from e
+                results.append(BatchResult(op=operation.op, result=result))
+            self.expense_service.commit()
+        except Exception:
+            self.expense_service.rollback()
+            raise
+        return results
+
+    def _create_expense(self, operation: CreateExpenseOperation) -> GastoResponse:
+        expense = self.expense_service.create_expense(operation.data)
+        return GastoResponse.model_validate(expense)
+
+    def _delete_expense(self, operation: DeleteExpenseOperation) -> None:
+        self.expense_service.delete_expense(operation.id)
+        return None
+
+    def _get_summary(self, operation: GetSummaryOperation):
+        if operation.year and operation.month:
+            return self.expense_service.get_monthly_summary(operation.year, operation.month)
+        return self.expense_service.get_current_month_summary()
+
+    def _list_categories(self, operation: ListCategoriesOperation) -> list[CategoriaResponse]:
+        if operation.active_only:
+            categorias = self.category_service.get_active_categories()
+        else:
+            categorias = self.category_service.get_all_categories()
+        return [CategoriaResponse.model_validate(categoria) for categoria in categorias]
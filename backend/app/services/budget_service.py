@@ -0,0 +1,83 @@
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..models.presupuesto import Presupuesto
+from ..schemas.presupuesto import PresupuestoCreate, BudgetAlert, BudgetStatus
+from ..repositories.presupuesto_repository import PresupuestoRepository
+from ..repositories.categoria_repository import CategoriaRepository
+from ..utils.exceptions import BudgetNotFoundError, CategoryNotFoundError
+from ..utils.money import from_centavos
+
+
+class BudgetService:
+    """Service for category budget business logic"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.presupuesto_repo = PresupuestoRepository(db)
+        self.categoria_repo = CategoriaRepository(db)
+
+    def set_budget(self, data: PresupuestoCreate) -> Presupuesto:
+        """Create or replace the monthly budget of a category"""
+        categoria = self.categoria_repo.find_by_id(data.categoria_id)
+        if not categoria:
+            raise CategoryNotFoundError(f"Category {data.categoria_id} not found")
+
+        presupuesto = self.presupuesto_repo.find_by_categoria(data.categoria_id)
+        if presupuesto:
+            presupuesto.monto_centavos = data.monto_centavos
+        else:
+            presupuesto = Presupuesto(
+                categoria_id=data.categoria_id,
+                monto_centavos=data.monto_centavos
+            )
+        return self.presupuesto_repo.save(presupuesto)
+
+    def get_all_budgets(self) -> list[Presupuesto]:
+        """Get all budgets"""
+        return self.presupuesto_repo.find_all()
+
+    def delete_budget(self, budget_id: int) -> bool:
+        """Delete budget by ID"""
+        if not self.presupuesto_repo.delete_by_id(budget_id):
+            raise BudgetNotFoundError(f"Budget {budget_id} not found")
+        return True
+
+    def get_status(self, year: int, month: int) -> list[BudgetStatus]:
+        """Get spend against every budget for a month, from the monthly totals"""
+        return [
+            self._status(presupuesto, nombre, gastado)
+            for presupuesto, nombre, gastado in self.presupuesto_repo.find_with_spend(year, month)
+        ]
+
+    def evaluate_change(
+        self, categoria_id: int, year: int, month: int, antes: int, despues: int
+    ) -> list[BudgetAlert]:
+        """Return the thresholds crossed when month spend goes from antes to despues cents"""
+        presupuesto = self.presupuesto_repo.find_by_categoria(categoria_id)
+        if not presupuesto or despues <= antes:
+            return []
+
+        return [
+            BudgetAlert(
+                categoria_id=categoria_id,
+                year=year,
+                month=month,
+                umbral=umbral,
+                presupuesto=presupuesto.monto,
+                gastado=from_centavos(despues)
+            )
+            for umbral in sorted(settings.budget_thresholds)
+            if antes < umbral * presupuesto.monto_centavos <= despues
+        ]
+
+    def _status(self, presupuesto: Presupuesto, nombre: str, gastado: int) -> BudgetStatus:
+        porcentaje = gastado / presupuesto.monto_centavos
+        reached = [u for u in settings.budget_thresholds if porcentaje >= u]
+        return BudgetStatus(
+            categoria_id=presupuesto.categoria_id,
+            categoria=nombre,
+            presupuesto=presupuesto.monto,
+            gastado=from_centavos(gastado),
+            porcentaje=round(porcentaje, 4),
+            umbral_alcanzado=max(reached) if reached else None
+        )
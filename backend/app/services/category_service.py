@@ -1,8 +1,15 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
 from ..models.categoria import Categoria
-from ..schemas.categoria import CategoriaCreate
+from ..schemas.categoria import CategoriaCreate, CategoriaUpdate
 from ..repositories.categoria_repository import CategoriaRepository
-from ..utils.exceptions import CategoryNotFoundError, DuplicateCategoryError
+from ..repositories.gasto_repository import GastoRepository
+from ..repositories.presupuesto_repository import PresupuestoRepository
+from ..repositories.resumen_repository import ResumenMensualRepository
+from ..repositories.suscripcion_repository import SuscripcionRepository
+from ..utils.exceptions import CategoryMergeError, CategoryNotFoundError, DuplicateCategoryError
+from .analytics_store import get_expense_store
+from .result_cache import database_tag, summary_cache
 
 
 class CategoryService:
@@ -41,3 +48,88 @@ class CategoryService:
     def get_active_categories(self) -> list[Categoria]:
         """Get all active categories"""
         return self.categoria_repo.find_active()
+
+    def update_category(self, category_id: int, data: CategoriaUpdate) -> Categoria:
+        """Rename, recolor or (de)activate a category"""
+        categoria = self.get_category_by_id(category_id)
+        changes = data.model_dump(exclude_unset=True)
+
+        nombre = changes.get("nombre")
+        if nombre is not None and nombre != categoria.nombre:
+            if self.categoria_repo.find_by_nombre(nombre):
+                raise DuplicateCategoryError(f"Category '{nombre}' already exists")
+
+        for field, value in changes.items():
+            # nombre and activo are required, an explicit null leaves them unchanged
+            if value is None and field in ("nombre", "activo"):
+                continue
+            setattr(categoria, field, value)
+        self.db.commit()
+        # Summaries are keyed by category name
+        summary_cache.invalidate(database_tag(self.db))
+        self.db.refresh(categoria)
+        return categoria
+
+    def merge_category(self, source_id: int, target_id: int) -> tuple[Categoria, int]:
+        """
+        Merge a category into another one, returns the target and the expenses moved
+
+        Expenses, subscriptions and monthly totals are reassigned with set-based
+        statements in one transaction, so the cost does not grow with the number
+        of expenses loaded in Python. The source category is deactivated.
+        Archived years are read-only, so a category with archived expenses
+        cannot be merged until they are unarchived.
+        """
+        if source_id == target_id:
+            raise CategoryMergeError("A category cannot be merged into itself")
+        source = self.get_category_by_id(source_id)
+        target = self.get_category_by_id(target_id)
+        if GastoRepository(self.db).has_archived_categoria(source_id):
+            raise CategoryMergeError(
+                f"Category {source_id} has expenses in archived years, unarchive them first"
+            )
+
+        try:
+            moved = GastoRepository(self.db).reassign_categoria(source_id, target_id)
+            ResumenMensualRepository(self.db).merge_categoria(source_id, target_id)
+            SuscripcionRepository(self.db).reassign_categoria(source_id, target_id)
+
+            # A category has at most one budget; the target keeps its own if it has one
+            presupuesto_repo = PresupuestoRepository(self.db)
+            presupuesto = presupuesto_repo.find_by_categoria(source_id)
+            if presupuesto is not None:
+                if presupuesto_repo.find_by_categoria(target_id) is None:
+                    presupuesto.categoria_id = target_id
+                else:
+                    self.db.delete(presupuesto)
+
+            source.activo = False
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        store = get_expense_store(self.db)
+        if store is not None:
+            store.record_reassign(source_id, target_id)
+        summary_cache.invalidate(database_tag(self.db))
+        self.db.refresh(target)
+        return target, moved
+
+    def import_categories(self, data: list[CategoriaCreate]) -> list[Categoria]:
+        """Create or update categories by name in a single upsert"""
+        # A statement may not touch the same row twice, the last entry wins
+        data = list({item.nombre: item for item in data}.values())
+        rows = [
+            {
+                "nombre": item.nombre,
+                "icono": item.icono,
+                "color": item.color,
+                "activo": item.activo,
+                "fecha_creacion": datetime.utcnow(),
+            }
+            for item in data
+        ]
+        self.categoria_repo.upsert_many(rows)
+        self.db.commit()
+        return self.categoria_repo.find_by_nombres([item.nombre for item in data])
@@ -0,0 +1,182 @@
+"""
+In-process publish/subscribe of expense changes for server-sent events.
+
+ExpenseService publishes a small delta (the month and category an expense
+touched and their new totals) once a create, update or delete commits, and
+SubscriptionService one per month and category of materialized charges. Every
+``GET /api/events`` connection subscribes to the topic of its database
+with a queue bounded to ``events_queue_size``. A subscriber whose queue is
+full is not reading: it is dropped and its stream ends, so a slow client
+never holds memory or delays the others, and EventSource reconnects it.
+
+Publishing encodes the event once and hands it to every subscriber's event
+loop with a single callback, so a write in a worker thread costs the same
+however many dashboards are open. An idle subscriber is a queue and a
+suspended coroutine with no timer of its own: one task per event loop
+queues a keepalive comment on the idle streams every
+``events_keepalive_seconds``, so a worker keeps thousands of them.
+"""
+import asyncio
+import json
+import threading
+from typing import AsyncIterator
+
+from ..config import settings
+
+# How long EventSource waits before reconnecting a stream that ended
+RECONNECT_DELAY_MS = 2000
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+class Subscription:
+    """One stream's bounded queue of pending event frames"""
+
+    def __init__(self, topic: str, max_queue: int):
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[bytes | None] = asyncio.Queue(max_queue)
+        self.dropped = False
+
+
+def format_event(event: str, data: dict) -> bytes:
+    """Server-sent event frame"""
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    return f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+class EventBroker:
+    """Topics of subscriptions, published to from any thread"""
+
+    def __init__(self, max_queue: int, keepalive_seconds: float):
+        self.max_queue = max_queue
+        self.keepalive_seconds = keepalive_seconds
+        self._topics: dict[str, set[Subscription]] = {}
+        self._keepalives: dict[asyncio.AbstractEventLoop, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, topic: str) -> Subscription:
+        """Subscribe the running event loop to a topic"""
+        subscription = Subscription(topic, self.max_queue)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(subscription)
+        task = self._keepalives.get(subscription.loop)
+        if task is None or task.done():
+            self._keepalives[subscription.loop] = subscription.loop.create_task(
+                self._keep_alive(subscription.loop)
+            )
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[subscription.topic]
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self._topics
+
+    def publish(self, topic: str, event: str, data: dict) -> None:
+        """Queue an event for every subscriber of a topic"""
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        if not subscribers:
+            return
+        self.published += 1
+        frame = format_event(event, data)
+
+        by_loop: dict[asyncio.AbstractEventLoop, list[Subscription]] = {}
+        for subscription in subscribers:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for loop, subscriptions in by_loop.items():
+            if loop is running:
+                self._deliver(subscriptions, frame)
+                continue
+            try:
+                loop.call_soon_threadsafe(self._deliver, subscriptions, frame)
+            except RuntimeError:
+                # The loop is closed, its streams are gone
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+
+    def _deliver(self, subscriptions: list[Subscription], frame: bytes) -> None:
+        """Runs on the subscribers' event loop"""
+        for subscription in subscriptions:
+            if subscription.dropped:
+                continue
+            try:
+                subscription.queue.put_nowait(frame)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        subscription.dropped = True
+        self.dropped += 1
+        self.unsubscribe(subscription)
+        # Free the backlog and wake the stream so it ends right away
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    async def _keep_alive(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Queue a keepalive on the idle streams of a loop until it has none"""
+        try:
+            while True:
+                await asyncio.sleep(self.keepalive_seconds)
+                with self._lock:
+                    subscriptions = [
+                        subscription
+                        for subscribers in self._topics.values()
+                        for subscription in subscribers
+                        if subscription.loop is loop
+                    ]
+                if not subscriptions:
+                    return
+                for subscription in subscriptions:
+                    if subscription.queue.empty():
+                        subscription.queue.put_nowait(KEEPALIVE)
+        finally:
+            self._keepalives.pop(loop, None)
+
+    async def stream(self, topic: str) -> AsyncIterator[bytes]:
+        """
+        Event frames of a topic until the subscription is dropped
+
+        Subscribes on the first frame, so a response that never starts does
+        not leave a subscription behind.
+        """
+        subscription = self.subscribe(topic)
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n".encode()
+            while True:
+                frame = await subscription.queue.get()
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            subscribers = sum(len(subscriptions) for subscriptions in self._topics.values())
+            topics = len(self._topics)
+        return {
+            "topics": topics,
+            "subscribers": subscribers,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+event_broker = EventBroker(settings.events_queue_size, settings.events_keepalive_seconds)
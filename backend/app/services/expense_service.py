@@ -1,20 +1,118 @@
-from datetime import date, datetime
+import base64
+import binascii
+import json
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+from functools import partial
+from typing import Callable, Iterator
 from sqlalchemy.orm import Session
+from ..config import settings
 from ..models.gasto import Gasto
-from ..schemas.gasto import GastoCreate, MonthlySummary
-from ..repositories.gasto_repository import GastoRepository
+from ..schemas.gasto import (
+    CategoryStats,
+    ExpenseForecast,
+    ExpenseStats,
+    GastoCreate,
+    GastoFilter,
+    GastoUpdate,
+    MonthForecast,
+    MonthlySummary,
+    StatsExpense,
+    YearlySummary,
+)
+from ..repositories.gasto_repository import SEARCH_SORTS, GastoRepository
 from ..repositories.categoria_repository import CategoriaRepository
-from ..utils.exceptions import ExpenseNotFoundError, CategoryNotFoundError
+from ..repositories.resumen_repository import ResumenMensualRepository
+from ..utils.exceptions import (
+    ExpenseNotFoundError,
+    ExpenseVersionConflictError,
+    CategoryNotFoundError,
+)
+from ..utils.money import CENTAVO, from_centavos, to_centavos
+from .analytics_store import ColumnarExpenseStore, get_expense_store
+from .budget_service import BudgetService
+from .event_broker import event_broker
+from .forecast import daily_matrix, forecast_months
+from .result_cache import database_tag, month_tag, summary_cache
+
+# Median, p90 and maximum of the category statistics, nearest-rank
+STATS_PERCENTILES = (50, 90, 100)
+
+
+def _months_between(start: date, end: date) -> list[tuple[int, int]]:
+    """(year, month) of every month from start to end, both included"""
+    first, last = start.year * 12 + start.month - 1, end.year * 12 + end.month - 1
+    return [(index // 12, index % 12 + 1) for index in range(first, last + 1)]
+
+
+def totals_event(
+    resumen_repo: ResumenMensualRepository, year: int, month: int, categoria_id: int,
+    total: int, cantidad: int
+) -> dict:
+    """
+    Event fields of a month/category's new totals and its month's
+
+    total and cantidad are the category's; the month's are read here, inside
+    the writing transaction, so a batch's events carry the totals as of
+    each write.
+    """
+    month_total, month_count = resumen_repo.get_month_totals(year, month)
+    return {
+        "year": year,
+        "month": month,
+        "categoria_id": categoria_id,
+        "categoria_total": from_centavos(total),
+        "categoria_count": cantidad,
+        "month_total": from_centavos(month_total),
+        "month_count": month_count,
+    }
+
+
+def encode_cursor(sort: str, expense: Gasto) -> str:
+    """Opaque cursor of the page after an expense, for one sort order"""
+    column, _ = SEARCH_SORTS[sort]
+    value = getattr(expense, column)
+    if isinstance(value, date):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, expense.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """(sort value, id) of a cursor, ValueError if it is invalid or for another sort"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, expense_id = json.loads(base64.urlsafe_b64decode(padded))
+        if cursor_sort != sort or not isinstance(expense_id, int):
+            raise ValueError
+        if SEARCH_SORTS[sort][0] == "fecha":
+            value = date.fromisoformat(value)
+        elif not isinstance(value, int):
+            raise ValueError
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError(f"Invalid cursor for sort {sort}") from None
+    return value, expense_id
 
 
 class ExpenseService:
     """Service for expense business logic"""
 
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        store: ColumnarExpenseStore | None = None,
+        autocommit: bool = True
+    ):
         self.db = db
+        # With autocommit=False writes are only flushed; the caller ends the
+        # unit of work with commit() or rollback()
+        self.autocommit = autocommit
+        self._after_commit: list[Callable[[], None]] = []
         self.gasto_repo = GastoRepository(db)
         self.categoria_repo = CategoriaRepository(db)
+        self.resumen_repo = ResumenMensualRepository(db)
+        self.budget_service = BudgetService(db)
+        self.store = store if store is not None else get_expense_store(db)
 
     def create_expense(self, data: GastoCreate) -> Gasto:
         """Create a new expense"""
@@ -25,13 +123,33 @@ class ExpenseService:
 
         # Create expense
         expense = Gasto(
-            monto=data.monto,
+            monto_centavos=data.monto_centavos,
             descripcion=data.descripcion,
             categoria_id=data.categoria_id,
             fecha=data.fecha,
             notas=data.notas
         )
-        return self.gasto_repo.save(expense)
+        self.gasto_repo.add(expense)
+        total, cantidad = self._apply_to_resumen(expense, 1)
+        expense.alertas_presupuesto = self.budget_service.evaluate_change(
+            expense.categoria_id,
+            expense.fecha.year,
+            expense.fecha.month,
+            total - expense.monto_centavos,
+            total
+        )
+
+        if self.store is not None:
+            self._after_commit.append(partial(
+                self.store.record_insert,
+                expense.id, expense.fecha, expense.categoria_id, expense.monto_centavos
+            ))
+        self._invalidate_month(expense.fecha.year, expense.fecha.month)
+        self._publish_change("expense_created", expense, total, cantidad)
+        self._commit()
+        if self.autocommit:
+            self.db.refresh(expense)
+        return expense
 
     def get_expense_by_id(self, expense_id: int) -> Gasto:
         """Get expense by ID"""
@@ -56,35 +174,334 @@ class ExpenseService:
         """Get expenses by category"""
         return self.gasto_repo.find_by_categoria(categoria_id)
 
+    def search_expenses(
+        self, filters: GastoFilter, limit: int, cursor: str | None = None
+    ) -> tuple[list[Gasto], str | None]:
+        """
+        One page of the expenses matching every filter
+
+        Returns the page and the cursor of the next one, None on the last page.
+        """
+        expenses = self.gasto_repo.search(
+            start_date=filters.start,
+            end_date=filters.end,
+            categoria_ids=filters.categoria_ids,
+            monto_min=to_centavos(filters.monto_min) if filters.monto_min is not None else None,
+            monto_max=to_centavos(filters.monto_max) if filters.monto_max is not None else None,
+            texto=filters.q,
+            sort=filters.sort,
+            after=decode_cursor(cursor, filters.sort) if cursor else None,
+            # One row more tells whether there is a next page
+            limit=limit + 1,
+        )
+        if len(expenses) <= limit:
+            return expenses, None
+        expenses = expenses[:limit]
+        return expenses, encode_cursor(filters.sort, expenses[-1])
+
+    def export_expenses(self) -> Iterator[Gasto]:
+        """Stream every expense in date order without loading them all at once"""
+        return self.gasto_repo.stream_all(settings.export_batch_size)
+
     def delete_expense(self, expense_id: int) -> bool:
         """Delete expense by ID"""
         expense = self.get_expense_by_id(expense_id)
-        self.gasto_repo.delete(expense)
+        self.gasto_repo.remove(expense)
+        total, cantidad = self._apply_to_resumen(expense, -1)
+
+        if self.store is not None:
+            self._after_commit.append(partial(self.store.record_delete, expense_id))
+        self._invalidate_month(expense.fecha.year, expense.fecha.month)
+        self._publish_change("expense_deleted", expense, total, cantidad)
+        self._commit()
         return True
 
+    def update_expense(self, expense_id: int, version: int, data: GastoUpdate) -> Gasto:
+        """
+        Update an expense if it is still at the given version
+
+        The expense row is changed with a compare-and-swap UPDATE and the
+        monthly totals are moved by the old and new amounts, without reading
+        the expense first.
+        """
+        values = data.model_dump(exclude_unset=True, exclude={"version", "monto"})
+        if data.monto is not None:
+            values["monto_centavos"] = to_centavos(data.monto)
+        # Required columns cannot be cleared, an explicit null leaves them unchanged
+        values = {
+            field: value for field, value in values.items()
+            if value is not None or field == "notas"
+        }
+        if "categoria_id" in values and not self.categoria_repo.find_by_id(values["categoria_id"]):
+            raise CategoryNotFoundError(f"Category {values['categoria_id']} not found")
+
+        previous = self.resumen_repo.subtract_expense(expense_id, version)
+        expense = self.gasto_repo.update_if_version(expense_id, version, values)
+        if expense is None:
+            self.rollback()
+            if self.gasto_repo.find_by_id(expense_id) is None:
+                raise ExpenseNotFoundError(f"Expense {expense_id} not found")
+            raise ExpenseVersionConflictError(expense_id, version)
+        total, cantidad = self._apply_to_resumen(expense, 1)
+
+        # Spend before the update: the old amount still counted if the
+        # expense stayed in the same month and category
+        antes = total - expense.monto_centavos
+        bucket = (expense.fecha.year, expense.fecha.month, expense.categoria_id)
+        if previous is not None and previous[:3] == bucket:
+            antes += previous[3]
+        expense.alertas_presupuesto = self.budget_service.evaluate_change(
+            expense.categoria_id, expense.fecha.year, expense.fecha.month, antes, total
+        )
+
+        if self.store is not None:
+            self._after_commit.append(partial(self.store.record_delete, expense.id))
+            self._after_commit.append(partial(
+                self.store.record_insert,
+                expense.id, expense.fecha, expense.categoria_id, expense.monto_centavos
+            ))
+        if previous is not None:
+            self._invalidate_month(*previous[:2])
+            if previous[:3] != bucket:
+                self._publish_totals(*previous[:3], *previous[4:])
+        self._invalidate_month(expense.fecha.year, expense.fecha.month)
+        self._publish_change("expense_updated", expense, total, cantidad)
+        if self.autocommit:
+            # Keep the RETURNING values; committing would expire them and cost a reload
+            self.db.expunge(expense)
+        self._commit()
+        return expense
+
+    def commit(self) -> None:
+        """Commit pending writes and apply their in-memory side effects"""
+        self.db.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self) -> None:
+        """Discard pending writes and their in-memory side effects"""
+        self.db.rollback()
+        self._after_commit = []
+
+    def _commit(self) -> None:
+        if self.autocommit:
+            self.commit()
+        else:
+            self.db.flush()
+
+    def _apply_to_resumen(self, expense: Gasto, sign: int) -> tuple[int, int]:
+        """Add (sign=1) or remove (sign=-1) an expense from its month/category totals"""
+        return self.resumen_repo.apply_delta(
+            expense.fecha.year,
+            expense.fecha.month,
+            expense.categoria_id,
+            sign * expense.monto_centavos,
+            sign
+        )
+
+    def _invalidate_month(self, year: int, month: int) -> None:
+        """Evict cached summaries of a month once the pending writes commit"""
+        self._after_commit.append(partial(summary_cache.invalidate, month_tag(self.db, year, month)))
+
+    def _publish_change(self, event: str, expense: Gasto, total: int, cantidad: int) -> None:
+        """
+        Push an expense's new month/category totals to open event streams once
+        the pending writes commit
+
+        total and cantidad are the category's new totals for the month.
+        """
+        topic = database_tag(self.db)
+        if not event_broker.has_subscribers(topic):
+            return
+        self._after_commit.append(partial(event_broker.publish, topic, event, {
+            "id": expense.id,
+            "fecha": expense.fecha,
+            "monto": from_centavos(expense.monto_centavos),
+            **totals_event(
+                self.resumen_repo, expense.fecha.year, expense.fecha.month,
+                expense.categoria_id, total, cantidad
+            ),
+        }))
+
+    def _publish_totals(
+        self, year: int, month: int, categoria_id: int, total: int, cantidad: int
+    ) -> None:
+        """Push a month/category's new totals, with no expense, once the pending writes commit"""
+        topic = database_tag(self.db)
+        if not event_broker.has_subscribers(topic):
+            return
+        self._after_commit.append(partial(
+            event_broker.publish, topic, "totals_changed",
+            totals_event(self.resumen_repo, year, month, categoria_id, total, cantidad)
+        ))
+
+    def _cached(self, key: tuple, months: list[tuple[int, int]], compute: Callable):
+        """Serve a summary from the result cache unless there are pending writes"""
+        if self._after_commit:
+            return compute()
+        tags = [database_tag(self.db)] + [month_tag(self.db, year, month) for year, month in months]
+        return summary_cache.get_or_compute((database_tag(self.db), *key), tags, compute)
+
+    def _use_store(self) -> bool:
+        """Whether analytics can be served from the snapshot"""
+        # The snapshot only sees committed writes; pending ones need SQL
+        return self.store is not None and not self._after_commit
+
     def get_monthly_summary(self, year: int, month: int) -> MonthlySummary:
-        """Calculate monthly expense summary"""
-        expenses = self.gasto_repo.find_by_month(year, month)
+        """Get the monthly expense summary, cached until the month changes"""
+        return self._cached(
+            ("monthly", year, month), [(year, month)],
+            partial(self._compute_monthly_summary, year, month)
+        )
 
-        total = sum(expense.monto for expense in expenses)
-        count = len(expenses)
+    def _compute_monthly_summary(self, year: int, month: int) -> MonthlySummary:
+        if self._use_store():
+            self.store.ensure_loaded(self.db)
+            nombres = {c.id: c.nombre for c in self.categoria_repo.find_all()}
+            rows = [
+                (nombres[categoria_id], categoria_count, categoria_total)
+                for categoria_id, (categoria_count, categoria_total)
+                in self.store.month_totals_by_categoria(year, month).items()
+            ]
+        else:
+            rows = self.gasto_repo.get_monthly_totals_by_categoria(year, month)
 
-        # Group by category
+        total = 0
+        count = 0
         por_categoria: dict[str, Decimal] = {}
-        for expense in expenses:
-            categoria_nombre = expense.categoria.nombre
-            if categoria_nombre not in por_categoria:
-                por_categoria[categoria_nombre] = Decimal(0)
-            por_categoria[categoria_nombre] += expense.monto
+        for categoria_nombre, categoria_count, categoria_total in rows:
+            total += categoria_total
+            count += categoria_count
+            por_categoria[categoria_nombre] = from_centavos(categoria_total)
 
         return MonthlySummary(
             year=year,
             month=month,
-            total=Decimal(total),
+            total=from_centavos(total),
             count=count,
             por_categoria=por_categoria
         )
 
+    def get_yearly_summary(self, year: int) -> YearlySummary:
+        """Get per-month totals and amount percentiles for a year, cached until it changes"""
+        return self._cached(
+            ("yearly", year), [(year, month) for month in range(1, 13)],
+            partial(self._compute_yearly_summary, year)
+        )
+
+    def _compute_yearly_summary(self, year: int) -> YearlySummary:
+        start, end = date(year, 1, 1), date(year, 12, 31)
+
+        if self._use_store():
+            self.store.ensure_loaded(self.db)
+            counts, totals = self.store.monthly_series(year)
+            mediana, p90 = self.store.percentiles(start, end, [0.5, 0.9])
+        else:
+            counts, totals = [0] * 12, [0] * 12
+            for month, month_count, month_total in self.gasto_repo.get_yearly_totals_by_month(year):
+                counts[month - 1] = month_count
+                totals[month - 1] = month_total
+            mediana, p90 = self.gasto_repo.get_amount_percentiles(start, end, [0.5, 0.9])
+
+        return YearlySummary(
+            year=year,
+            total=from_centavos(sum(totals)),
+            count=sum(counts),
+            por_mes=[from_centavos(total) for total in totals],
+            mediana=from_centavos(mediana),
+            p90=from_centavos(p90)
+        )
+
+    def get_forecast(self, months: int = 1, today: date | None = None) -> ExpenseForecast:
+        """
+        Project per-category spend for the current month and the following ones
+
+        Fitted on the daily totals of the last forecast_history_days, and
+        cached until an expense in that history changes.
+        """
+        today = today or date.today()
+        start = today - timedelta(days=settings.forecast_history_days - 1)
+        return self._cached(
+            ("forecast", today, months), _months_between(start, today),
+            partial(self._compute_forecast, start, today, months)
+        )
+
+    def _compute_forecast(self, start: date, today: date, months: int) -> ExpenseForecast:
+        categorias = self.categoria_repo.find_all()
+        ids = [categoria.id for categoria in categorias]
+        if self._use_store():
+            self.store.ensure_loaded(self.db)
+            matrix = self.store.daily_totals(ids, start, today)
+        else:
+            rows = self.gasto_repo.get_daily_totals_by_categoria(start, today)
+            matrix = daily_matrix(rows, ids, start, today)
+
+        projected, actual = forecast_months(matrix, start, today, months)
+        projected = projected.round().astype("int64")
+        actual = actual.round().astype("int64")
+        por_mes = []
+        for offset in range(months):
+            year, month = divmod(today.year * 12 + today.month - 1 + offset, 12)
+            por_mes.append(MonthForecast(
+                year=year,
+                month=month + 1,
+                total=from_centavos(int(projected[:, offset].sum())),
+                actual=from_centavos(int(actual[:, offset].sum())),
+                por_categoria={
+                    categoria.nombre: from_centavos(int(total))
+                    for categoria, total in zip(categorias, projected[:, offset])
+                    if total
+                }
+            ))
+        return ExpenseForecast(
+            fecha=today,
+            history_days=settings.forecast_history_days,
+            por_mes=por_mes
+        )
+
+    def get_category_stats(self, start: date, end: date, top: int = 5) -> ExpenseStats:
+        """
+        Get the amount distribution and largest expenses of every category
+
+        Ranked in the database, so only a few rows per category are read
+        back. Cached until an expense of the range changes.
+        """
+        return self._cached(
+            ("stats", start, end, top), _months_between(start, end),
+            partial(self._compute_category_stats, start, end, top)
+        )
+
+    def _compute_category_stats(self, start: date, end: date, top: int) -> ExpenseStats:
+        stats = self.gasto_repo.get_amount_stats_by_categoria(start, end, top, STATS_PERCENTILES)
+        ids = [expense_id for *_, mayores in stats for expense_id, _ in mayores]
+        gastos = {gasto.id: gasto for gasto in self.gasto_repo.find_by_ids(ids, start, end)} if ids else {}
+        nombres = {categoria.id: categoria.nombre for categoria in self.categoria_repo.find_all()}
+
+        por_categoria = []
+        for categoria_id, cantidad, total, (mediana, p90, maximo), mayores in stats:
+            por_categoria.append(CategoryStats(
+                categoria_id=categoria_id,
+                nombre=nombres.get(categoria_id, f"#{categoria_id}"),
+                count=cantidad,
+                total=from_centavos(total),
+                media=(Decimal(total) / cantidad).scaleb(-2).quantize(CENTAVO),
+                mediana=from_centavos(mediana),
+                p90=from_centavos(p90),
+                maximo=from_centavos(maximo),
+                mayores=[
+                    StatsExpense(
+                        id=expense_id,
+                        fecha=gastos[expense_id].fecha,
+                        descripcion=gastos[expense_id].descripcion,
+                        monto=from_centavos(monto),
+                    )
+                    for expense_id, monto in mayores
+                ],
+            ))
+        por_categoria.sort(key=lambda categoria: -categoria.total)
+        return ExpenseStats(start=start, end=end, por_categoria=por_categoria)
+
     def get_current_month_summary(self) -> MonthlySummary:
         """Get summary for current month"""
         today = datetime.now()
@@ -0,0 +1,223 @@
+"""
+Group commit for expense creates and deletes.
+
+With ``group_commit_enabled``, the expense routes hand their writes to one
+writer task per database instead of committing in the request. The task
+waits up to ``group_commit_max_delay_ms`` after the first pending write (or
+until ``group_commit_max_batch`` are queued), applies the whole batch
+through ExpenseService in a worker thread and commits once, so concurrent
+writers share one transaction and one fsync instead of queueing on the
+SQLite lock. Each caller awaits a future resolved with its own outcome.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Callable
+
+from sqlalchemy.orm import sessionmaker
+
+from ..config import settings
+from ..database import tenant_engines
+from ..schemas.gasto import GastoCreate, GastoResponse
+from ..utils.exceptions import CategoryNotFoundError, ExpenseNotFoundError
+from .expense_service import ExpenseService
+
+logger = logging.getLogger(__name__)
+
+# Raised before an operation writes anything, so the rest of the batch is unaffected
+_OPERATION_ERRORS = (CategoryNotFoundError, ExpenseNotFoundError)
+
+Operation = Callable[[ExpenseService], Any]
+
+
+def _create(data: GastoCreate) -> Operation:
+    def apply(service: ExpenseService) -> GastoResponse:
+        # Built before the commit expires the instance, ids are assigned at flush
+        return GastoResponse.model_validate(service.create_expense(data))
+    return apply
+
+
+def _delete(expense_id: int) -> Operation:
+    def apply(service: ExpenseService) -> bool:
+        return service.delete_expense(expense_id)
+    return apply
+
+
+class GroupCommitWriter:
+    """Single writer task batching expense writes of one database into shared commits"""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        max_delay_ms: float | None = None,
+        max_batch: int | None = None
+    ):
+        self.session_factory = session_factory
+        self.max_delay = (
+            max_delay_ms if max_delay_ms is not None else settings.group_commit_max_delay_ms
+        ) / 1000
+        self.max_batch = max_batch or settings.group_commit_max_batch
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue | None = None
+        self._full: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.batches = 0
+        self.writes = 0
+
+    async def create(self, data: GastoCreate) -> GastoResponse:
+        """Create an expense in the next group commit"""
+        return await self._submit(_create(data))
+
+    async def delete(self, expense_id: int) -> bool:
+        """Delete an expense in the next group commit"""
+        return await self._submit(_delete(expense_id))
+
+    async def _submit(self, operation: Operation) -> Any:
+        self._ensure_running()
+        future = self._loop.create_future()
+        self._queue.put_nowait((operation, future))
+        if self._queue.qsize() >= self.max_batch:
+            self._full.set()
+        return await future
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        # First use, or the previous event loop is gone
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._full = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        stopping = False
+        # Once stopping, writes still queued are committed before the task ends,
+        # so a write submitted by a caller that got the writer just before
+        # close() is never left waiting
+        while not (stopping and self._queue.empty()):
+            item = await self._queue.get()
+            if item is None:
+                stopping = True
+                continue
+            batch = [item]
+            if not stopping and self.max_delay > 0 and self._queue.qsize() < self.max_batch - 1:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    continue
+                batch.append(item)
+            await self._commit_batch(batch)
+
+    async def _commit_batch(self, batch: list[tuple[Operation, asyncio.Future]]) -> None:
+        try:
+            outcomes = await asyncio.to_thread(self._write, [operation for operation, _ in batch])
+        except Exception as e:
+            logger.exception("Group commit of %d expense writes failed", len(batch))
+            outcomes = [(False, e)] * len(batch)
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _write(self, operations: list[Operation]) -> list[tuple[bool, Any]]:
+        """Apply a batch in one transaction, returns (ok, result or exception) per operation"""
+        try:
+            outcomes = self._apply(operations)
+        except Exception:
+            if len(operations) == 1:
+                raise
+            # Isolate the failing write: retry each one in its own transaction
+            outcomes = []
+            for operation in operations:
+                try:
+                    outcomes.extend(self._apply([operation]))
+                except Exception as e:
+                    outcomes.append((False, e))
+        self.batches += 1
+        self.writes += len(operations)
+        return outcomes
+
+    def _apply(self, operations: list[Operation]) -> list[tuple[bool, Any]]:
+        db = self.session_factory()
+        service = ExpenseService(db, autocommit=False)
+        try:
+            outcomes = []
+            for operation in operations:
+                try:
+                    outcomes.append((True, operation(service)))
+                except _OPERATION_ERRORS as e:
+                    outcomes.append((False, e))
+            service.commit()
+            return outcomes
+        except Exception:
+            service.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def stop(self) -> None:
+        """Commit the writes already queued, then stop the writer task"""
+        if self._task is None or self._task.done():
+            return
+        if self._loop is asyncio.get_running_loop():
+            self._queue.put_nowait(None)
+            await self._task
+        else:
+            self._task.cancel()
+        self._task = None
+
+    def close(self) -> None:
+        """Stop the writer task once the writes already queued commit, from any thread"""
+        if self._task is None or self._task.done():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        except RuntimeError:
+            # The event loop is closed, and the task with it
+            pass
+
+    def stats(self) -> dict[str, int]:
+        return {"batches": self.batches, "writes": self.writes}
+
+
+_writers: dict[str, GroupCommitWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_expense_writer(session_factory: sessionmaker) -> GroupCommitWriter:
+    """Return the writer of a session factory's database, creating it on first use"""
+    key = str(session_factory.kw["bind"].url)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = GroupCommitWriter(session_factory)
+        return writer
+
+
+def _discard_writer(session_factory: sessionmaker) -> None:
+    """Stop the writer of a tenant engine evicted from the cache"""
+    with _writers_lock:
+        writer = _writers.pop(str(session_factory.kw["bind"].url), None)
+    if writer is not None:
+        writer.close()
+
+
+tenant_engines.add_eviction_listener(_discard_writer)
+
+
+async def stop_expense_writers() -> None:
+    """Flush and stop every writer, on shutdown"""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        await writer.stop()
@@ -0,0 +1,133 @@
+"""
+Per-category spend forecast from a daily totals matrix.
+
+History is a (categories x days) matrix of daily totals in cents. Each
+category gets a month-of-year seasonal index (the ratio of every month's
+daily rate to its trailing 12-month rate, averaged per calendar month and
+shrunk towards 1 when there are few years), and a level: an exponentially
+weighted average of the deseasonalized daily totals. A future day is
+forecast as level x seasonal index of its month. Everything is vectorized
+across categories, so a decade of daily history takes a few milliseconds.
+"""
+from calendar import monthrange
+from datetime import date
+
+import numpy as np
+
+# Half-life of the level's exponential weights: older days count half as much
+LEVEL_HALFLIFE_DAYS = 60
+
+# Pseudo-observations of a neutral (1.0) seasonal ratio per calendar month
+SEASONAL_PRIOR = 0.5
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def month_numbers(ordinals: np.ndarray) -> np.ndarray:
+    """Months since January 1970 of date ordinals"""
+    return (ordinals - _EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def daily_matrix(
+    rows, categoria_ids: list[int], start: date, end: date
+) -> np.ndarray:
+    """Scatter (fecha, categoria_id, total) rows into a (categories x days) matrix"""
+    matrix = np.zeros((len(categoria_ids), end.toordinal() - start.toordinal() + 1))
+    if not rows:
+        return matrix
+    index = {categoria_id: position for position, categoria_id in enumerate(categoria_ids)}
+    fechas, categorias, totals = zip(*rows)
+    days = np.fromiter((fecha.toordinal() for fecha in fechas), np.int64, len(fechas)) - start.toordinal()
+    positions = np.fromiter((index.get(c, -1) for c in categorias), np.int64, len(categorias))
+    known = positions >= 0
+    np.add.at(matrix, (positions[known], days[known]), np.asarray(totals, dtype=np.float64)[known])
+    return matrix
+
+
+def seasonal_indexes(history: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """
+    Month-of-year seasonal index per category, shape (categories, 12)
+
+    history holds whole days of whole months (a partial first month is
+    skipped); months are their month numbers.
+    """
+    categories = history.shape[0]
+    indexes = np.ones((categories, 12))
+    if history.shape[1] == 0:
+        return indexes
+
+    starts = np.flatnonzero(np.diff(months, prepend=months[0] - 1))
+    days = np.diff(starts, append=len(months))
+    rates = np.add.reduceat(history, starts, axis=1) / days
+    # Drop a partial first month, its rate is not comparable
+    first_year, first_month = divmod(int(months[0]), 12)
+    if days[0] < monthrange(1970 + first_year, first_month + 1)[1]:
+        starts, rates = starts[1:], rates[:, 1:]
+    month_of_year = months[starts] % 12
+    if rates.shape[1] < 12:
+        return indexes
+
+    # Trailing 12-month mean rate for every month that has a full year behind it
+    cumulative = np.cumsum(rates, axis=1)
+    trailing = (cumulative[:, 11:] - np.pad(cumulative, ((0, 0), (1, 0)))[:, :-12]) / 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = rates[:, 11:] / trailing
+    # Before a category's first expense, trailing windows are padded with zeros
+    started = np.cumsum(rates > 0, axis=1) > 0
+    valid = np.isfinite(ratios) & started[:, :-11]
+    ratios = np.where(valid, ratios, 0.0)
+
+    moy = month_of_year[11:]
+    offsets = (np.arange(categories)[:, None] * 12 + moy[None, :]).ravel()
+    sums = np.bincount(offsets, weights=ratios.ravel(), minlength=categories * 12)
+    counts = np.bincount(offsets, weights=valid.ravel(), minlength=categories * 12)
+    indexes = ((sums + SEASONAL_PRIOR) / (counts + SEASONAL_PRIOR)).reshape(categories, 12)
+    return indexes / indexes.mean(axis=1, keepdims=True)
+
+
+def forecast_months(
+    matrix: np.ndarray, start: date, today: date, months: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Project per-category totals for the current month and the following ones
+
+    matrix covers start..today, today included. Returns (projected, actual),
+    both (categories x months) in cents; actual is the month-to-date of the
+    current month (today included) and zero for later months.
+    """
+    categories = matrix.shape[0]
+    projected = np.zeros((categories, months))
+    actual = np.zeros((categories, months))
+    if categories == 0:
+        return projected, actual
+
+    ordinals = np.arange(start.toordinal(), today.toordinal() + 1)
+    month_of_day = month_numbers(ordinals)
+    history, history_months = matrix[:, :-1], month_of_day[:-1]
+
+    first_of_month = today.toordinal() - today.day + 1
+    actual[:, 0] = matrix[:, first_of_month - start.toordinal():].sum(axis=1)
+    if history.shape[1] == 0:
+        projected[:, 0] = actual[:, 0]
+        return projected, actual
+
+    # The current month is still partial, seasonality only uses closed ones
+    closed = max(0, first_of_month - start.toordinal())
+    indexes = seasonal_indexes(history[:, :closed], history_months[:closed])
+    deseasonalized = history / indexes[:, history_months % 12]
+    ages = np.arange(history.shape[1] - 1, -1, -1)
+    weights = 0.5 ** (ages / LEVEL_HALFLIFE_DAYS)
+    # Normalized over each category's days since its first expense, so a new
+    # category is not diluted by the years before it existed
+    first_day = np.argmax(history > 0, axis=1)
+    cumulative = np.concatenate(([0.0], np.cumsum(weights)))
+    level = deseasonalized @ weights / (cumulative[-1] - cumulative[first_day])
+
+    current = month_of_day[-1]
+    for offset in range(months):
+        year, month0 = divmod(int(current) + offset, 12)
+        days = monthrange(1970 + year, month0 + 1)[1]
+        if offset == 0:
+            days -= today.day
+        projected[:, offset] = actual[:, offset] + level * indexes[:, month0] * days
+    return projected, actual
@@ -0,0 +1,347 @@
+"""
+Yearly report jobs built in a process pool.
+
+A report aggregates a whole year (monthly and category tables, the
+month x category matrix, daily chart series and the largest expenses), so
+it is built in a worker process instead of the request handler. Workers
+open their own read-only connection to the database.
+
+Finished reports are written to ``report_cache_dir`` named after the data
+version: a hash of the year's expenses and the categories. Requesting the
+same report again is served from disk until the data changes. Reports of
+outdated data are never requested again, so the directory keeps the
+``report_cache_max_files`` most recently used ones.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from calendar import monthrange
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, extract, func, select
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from ..archive import gastos_for_range, install_archive_attach
+from ..config import settings
+from ..models.categoria import Categoria
+from ..schemas.reporte import YearlyReport
+from ..utils.money import from_centavos
+from .result_cache import database_tag
+from .subscription_service import SUBSCRIPTION_NOTE_PREFIX
+
+# Bump when the report layout changes so cached reports are rebuilt
+REPORT_FORMAT = 1
+
+TOP_EXPENSES = 10
+
+
+def report_months(year: int, today: date | None = None) -> int:
+    """Months a yearly report covers: up to the current month for the current year"""
+    today = today or date.today()
+    return today.month if year == today.year else 12
+
+
+def _year_range(year: int, meses: int) -> tuple[date, date]:
+    return date(year, 1, 1), date(year, meses, monthrange(year, meses)[1])
+
+
+def data_version(db: Session, year: int, meses: int) -> str:
+    """
+    Hash of everything a yearly report is built from
+
+    Updates bump the row version and inserts and deletes change the count or
+    the ids. Ids can be reused in tables created before AUTOINCREMENT (the
+    newest expense deleted, then another one created), so the amounts and
+    the newest creation time are hashed too: a new expense is always the
+    newest created. Merging categories moves rows without bumping their
+    version, so each row's category is hashed as categoria_id * id, and the
+    merged-away category's activo flag is part of the category list.
+    """
+    start, end = _year_range(year, meses)
+    gastos = gastos_for_range(db, start, end)
+    aggregates = db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(gastos.id), 0),
+            func.coalesce(func.sum(gastos.version), 0),
+            func.coalesce(func.sum(gastos.monto_centavos), 0),
+            func.coalesce(func.sum(gastos.categoria_id * gastos.id), 0),
+            func.max(gastos.fecha_creacion),
+        ).where(gastos.fecha.between(start, end))
+    ).one()
+    categorias = db.execute(select(Categoria.id, Categoria.nombre, Categoria.activo).order_by(Categoria.id)).all()
+    payload = json.dumps([
+        REPORT_FORMAT,
+        db.get_bind().url.render_as_string(hide_password=True),
+        year,
+        meses,
+        list(aggregates),
+        [list(categoria) for categoria in categorias],
+    ], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def compute_yearly_report(db: Session, year: int, meses: int) -> YearlyReport:
+    """Build the yearly report from the expenses of its months"""
+    start, end = _year_range(year, meses)
+    gastos = gastos_for_range(db, start, end)
+    in_year = gastos.fecha.between(start, end)
+    nombres = dict(db.execute(select(Categoria.id, Categoria.nombre)).all())
+
+    mes = extract("month", gastos.fecha).label("mes")
+    suscripcion = gastos.notas.like(f"{SUBSCRIPTION_NOTE_PREFIX}%").label("suscripcion")
+    grouped = db.execute(
+        select(mes, gastos.categoria_id, suscripcion, func.sum(gastos.monto_centavos), func.count())
+        .where(in_year)
+        .group_by(mes, gastos.categoria_id, suscripcion)
+    ).all()
+
+    por_mes = [[0, 0, 0] for _ in range(meses)]  # one-off, subscriptions, count
+    por_categoria: dict[int, list] = {}  # total, count, per month
+    for numero, categoria_id, es_suscripcion, total, cantidad in grouped:
+        month = por_mes[int(numero) - 1]
+        month[1 if es_suscripcion else 0] += total
+        month[2] += cantidad
+        categoria = por_categoria.setdefault(categoria_id, [0, 0, [0] * meses])
+        categoria[0] += total
+        categoria[1] += cantidad
+        categoria[2][int(numero) - 1] += total
+
+    total = sum(gastos_mes + suscripciones for gastos_mes, suscripciones, _ in por_mes)
+    diario = db.execute(
+        select(gastos.fecha, func.sum(gastos.monto_centavos))
+        .where(in_year)
+        .group_by(gastos.fecha)
+        .order_by(gastos.fecha)
+    ).all()
+    mayores = db.execute(
+        select(gastos.id, gastos.fecha, gastos.descripcion, gastos.categoria_id, gastos.monto_centavos)
+        .where(in_year)
+        .order_by(gastos.monto_centavos.desc(), gastos.id)
+        .limit(TOP_EXPENSES)
+    ).all()
+
+    return YearlyReport(
+        year=year,
+        meses=meses,
+        total=from_centavos(total),
+        count=sum(month[2] for month in por_mes),
+        por_mes=[
+            {
+                "mes": numero,
+                "gastos": from_centavos(gastos_mes),
+                "suscripciones": from_centavos(suscripciones),
+                "total": from_centavos(gastos_mes + suscripciones),
+                "count": cantidad,
+            }
+            for numero, (gastos_mes, suscripciones, cantidad) in enumerate(por_mes, start=1)
+        ],
+        por_categoria=[
+            {
+                "categoria_id": categoria_id,
+                "nombre": nombres.get(categoria_id, f"#{categoria_id}"),
+                "total": from_centavos(categoria_total),
+                "count": cantidad,
+                "porcentaje": round(categoria_total * 100 / total, 2) if total else 0.0,
+                "por_mes": [from_centavos(value) for value in mensual],
+            }
+            for categoria_id, (categoria_total, cantidad, mensual) in sorted(
+                por_categoria.items(), key=lambda item: -item[1][0]
+            )
+        ],
+        diario=[{"fecha": fecha, "total": from_centavos(value)} for fecha, value in diario],
+        mayores=[
+            {
+                "id": gasto_id,
+                "fecha": fecha,
+                "descripcion": descripcion,
+                "categoria": nombres.get(categoria_id, f"#{categoria_id}"),
+                "monto": from_centavos(monto),
+            }
+            for gasto_id, fecha, descripcion, categoria_id, monto in mayores
+        ],
+    )
+
+
+def read_only_engine(database_url: str) -> Engine:
+    """Engine whose connections cannot write to the database"""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        uri = f"{Path(url.database).resolve().as_uri()}?mode=ro"
+        bind = create_engine(
+            url, poolclass=NullPool, creator=lambda: sqlite3.connect(uri, uri=True)
+        )
+        install_archive_attach(bind)
+        return bind
+
+    bind = create_engine(url, poolclass=NullPool)
+    if url.get_backend_name() == "postgresql":
+        @event.listens_for(bind, "connect")
+        def set_read_only(dbapi_connection, connection_record):
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+    return bind
+
+
+def _write_atomic(path: Path, content: str) -> None:
+    """Write a file so readers never see it half written"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def build_yearly_report(database_url: str, year: int, meses: int, path: str) -> str:
+    """Worker entry point: build a report on a read-only connection and write it to path"""
+    bind = read_only_engine(database_url)
+    try:
+        with Session(bind) as db:
+            report = compute_yearly_report(db, year, meses)
+    finally:
+        bind.dispose()
+    _write_atomic(Path(path), report.model_dump_json())
+    return path
+
+
+class ReportJob:
+    """A requested report: the cached file, and the worker future while it is built"""
+
+    def __init__(
+        self, tenant: str, year: int, version: str, path: Path, future: Future | None = None
+    ):
+        self.id = uuid.uuid4().hex
+        # Database the report is of, only requests on the same one see the job
+        self.tenant = tenant
+        self.year = year
+        self.version = version
+        self.path = path
+        self.future = future
+
+    @property
+    def status(self) -> str:
+        if self.future is None:
+            return "done"
+        if not self.future.done():
+            return "running" if self.future.running() else "pending"
+        return "failed" if self.future.exception() is not None else "done"
+
+    def as_dict(self) -> dict:
+        status = self.status
+        job = {"id": self.id, "year": self.year, "status": status, "version": self.version}
+        if status == "failed":
+            job["error"] = str(self.future.exception())
+        elif status == "done":
+            job["resultado"] = json.loads(self.path.read_text(encoding="utf-8"))
+        return job
+
+
+class ReportJobs:
+    """Registry of report jobs, bounded to the most recent max_jobs"""
+
+    def __init__(self, cache_dir: str, workers: int, max_jobs: int, max_files: int):
+        self.cache_dir = Path(cache_dir)
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.max_files = max_files
+        self._jobs: OrderedDict[str, ReportJob] = OrderedDict()
+        # Jobs still building, by cached file, so identical requests share them
+        self._building: dict[Path, ReportJob] = {}
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking a process that runs threads (the server) is unsafe
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, db: Session, year: int) -> ReportJob:
+        """Start a yearly report, or return one already cached or being built"""
+        bind = db.get_bind()
+        if bind.dialect.name == "sqlite" and bind.url.database in (None, "", ":memory:"):
+            raise ValueError("Reports need a database that worker processes can open")
+
+        meses = report_months(year)
+        version = data_version(db, year, meses)
+        path = self.cache_dir / f"{version}.json"
+        tenant = database_tag(db)
+
+        with self._lock:
+            job = self._building.get(path)
+            if job is None:
+                if path.exists():
+                    # Most recently used reports are the last pruned
+                    os.utime(path)
+                    job = ReportJob(tenant, year, version, path)
+                else:
+                    database_url = bind.url.render_as_string(hide_password=False)
+                    future = self._pool().submit(build_yearly_report, database_url, year, meses, str(path))
+                    job = self._building[path] = ReportJob(tenant, year, version, path, future)
+                    future.add_done_callback(lambda _: self._finished(path))
+            self._jobs[job.id] = job
+            self._jobs.move_to_end(job.id)
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def _finished(self, path: Path) -> None:
+        with self._lock:
+            self._building.pop(path, None)
+        self.prune()
+
+    def prune(self) -> int:
+        """Delete the least recently used reports over max_files, returns how many"""
+        with self._lock:
+            in_use = {job.path for job in self._jobs.values()} | set(self._building)
+        files = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        files.sort(reverse=True)
+        removed = 0
+        for _, path in files[self.max_files:]:
+            # Reports of registered jobs are still served by GET /api/reports/{id}
+            if path not in in_use:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def get(self, job_id: str, tenant: str) -> ReportJob | None:
+        """A job, if it was requested on the given database"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None and job.tenant == tenant else None
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, cancelling reports not started yet"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+report_jobs = ReportJobs(
+    settings.report_cache_dir,
+    settings.report_workers,
+    settings.report_jobs_max,
+    settings.report_cache_max_files,
+)
@@ -0,0 +1,122 @@
+"""
+Bounded LRU cache for computed service results.
+
+Entries are tagged with what they were computed from (a database and the
+months they cover). Writes invalidate tags instead of individual keys, so
+a new expense only evicts the summaries of its own month.
+"""
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+
+
+class ResultCache:
+    """Thread-safe LRU cache bounded by the approximate size of its values"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, tuple[Any, frozenset, int]] = OrderedDict()
+        self._by_tag: dict[Hashable, set[Hashable]] = {}
+        # Bumped whenever a tag is invalidated, so a result computed from
+        # data that changed meanwhile is not stored
+        self._generations: dict[Hashable, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get_or_compute(self, key: Hashable, tags: Iterable[Hashable], compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and storing it on a miss"""
+        if not self.enabled:
+            return compute()
+
+        tags = frozenset(tags)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generations = {tag: self._generations.get(tag, 0) for tag in tags}
+
+        value = compute()
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+        with self._lock:
+            stale = any(self._generations.get(tag, 0) != generation for tag, generation in generations.items())
+            if not stale and size <= self.max_bytes:
+                self._discard(key)
+                self._entries[key] = (value, tags, size)
+                self._size += size
+                for tag in tags:
+                    self._by_tag.setdefault(tag, set()).add(key)
+                while self._size > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, *tags: Hashable) -> None:
+        """Drop every entry carrying any of the tags"""
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._by_tag.get(tag, ())):
+                    self._discard(key)
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+            self._generations.clear()
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        _, tags, size = entry
+        self._size -= size
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+
+summary_cache = ResultCache(settings.summary_cache_max_bytes)
+
+
+def database_tag(db: Session) -> str:
+    """Tag shared by every cached result of a session's database"""
+    return str(db.get_bind().url)
+
+
+def month_tag(db: Session, year: int, month: int) -> tuple[str, int, int]:
+    """Tag of the results computed from one month of a database"""
+    return database_tag(db), year, month
@@ -0,0 +1,64 @@
+"""
+In-process scheduler for recurring subscription charges.
+
+Started from the FastAPI lifespan. Every ``scheduler_interval_seconds`` it
+materializes due charges in a worker thread; materialization is idempotent,
+so checking more often than once per billing period only costs one query.
+"""
+import asyncio
+import logging
+from typing import Callable, Iterable
+from sqlalchemy.orm import sessionmaker
+from ..config import settings
+from .subscription_service import SubscriptionService
+
+logger = logging.getLogger(__name__)
+
+
+class RecurringChargeScheduler:
+    """Background task materializing due subscriptions as expenses"""
+
+    def __init__(
+        self,
+        session_factories: Callable[[], Iterable[sessionmaker]],
+        interval_seconds: float | None = None
+    ):
+        self.session_factories = session_factories
+        self.interval_seconds = interval_seconds or settings.scheduler_interval_seconds
+        self._task: asyncio.Task | None = None
+
+    def run_once(self) -> int:
+        """Materialize due charges in every database, returns the expenses created"""
+        created = 0
+        for session_factory in self.session_factories():
+            db = session_factory()
+            try:
+                created += SubscriptionService(db).materialize_due()
+            finally:
+                db.close()
+        return created
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                created = await asyncio.to_thread(self.run_once)
+                if created:
+                    logger.info("Materialized %d recurring charges", created)
+            except Exception:
+                logger.exception("Failed to materialize recurring charges")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        """Start the background task on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the background task and wait for it to finish"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
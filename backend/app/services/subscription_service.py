@@ -0,0 +1,148 @@
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date
+from functools import partial
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from ..models.gasto import Gasto
+from ..models.suscripcion import Suscripcion
+from ..schemas.suscripcion import SuscripcionCreate
+from ..repositories.suscripcion_repository import SuscripcionRepository
+from ..repositories.categoria_repository import CategoriaRepository
+from ..repositories.resumen_repository import ResumenMensualRepository
+from ..utils.exceptions import CategoryNotFoundError, SubscriptionNotFoundError
+from .analytics_store import get_expense_store
+from .event_broker import event_broker
+from .expense_service import totals_event
+from .result_cache import database_tag, month_tag, summary_cache
+
+# Notes of materialized charges, which tell them apart from one-off expenses
+SUBSCRIPTION_NOTE_PREFIX = "Suscripción #"
+
+
+def _charge_date(start: date, year: int, month: int) -> date:
+    """Charge day for a month: the start day, clamped to the month length"""
+    return date(year, month, min(start.day, monthrange(year, month)[1]))
+
+
+def due_charge_dates(suscripcion: Suscripcion, today: date) -> list[date]:
+    """Charges due after the watermark up to today, computed without queries"""
+    step = 12 if suscripcion.periodicidad == "anual" else 1
+    start = suscripcion.fecha_inicio
+    last = suscripcion.materializado_hasta
+
+    if last is None:
+        index = start.year * 12 + start.month - 1
+    else:
+        index = last.year * 12 + last.month - 1 + step
+
+    due = []
+    while True:
+        charge = _charge_date(start, index // 12, index % 12 + 1)
+        if charge > today:
+            return due
+        due.append(charge)
+        index += step
+
+
+class SubscriptionService:
+    """Service for recurring subscription business logic"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.suscripcion_repo = SuscripcionRepository(db)
+        self.categoria_repo = CategoriaRepository(db)
+        self.resumen_repo = ResumenMensualRepository(db)
+
+    def create_subscription(self, data: SuscripcionCreate) -> Suscripcion:
+        """Create a new subscription"""
+        categoria = self.categoria_repo.find_by_id(data.categoria_id)
+        if not categoria:
+            raise CategoryNotFoundError(f"Category {data.categoria_id} not found")
+
+        suscripcion = Suscripcion(
+            nombre=data.nombre,
+            monto_centavos=data.monto_centavos,
+            categoria_id=data.categoria_id,
+            periodicidad=data.periodicidad,
+            fecha_inicio=data.fecha_inicio,
+            activo=data.activo
+        )
+        return self.suscripcion_repo.save(suscripcion)
+
+    def get_all_subscriptions(self) -> list[Suscripcion]:
+        """Get all subscriptions"""
+        return self.suscripcion_repo.find_all()
+
+    def delete_subscription(self, subscription_id: int) -> bool:
+        """Delete subscription by ID, already materialized expenses are kept"""
+        if not self.suscripcion_repo.delete_by_id(subscription_id):
+            raise SubscriptionNotFoundError(f"Subscription {subscription_id} not found")
+        return True
+
+    def materialize_due(self, today: date | None = None) -> int:
+        """
+        Create Gasto rows for every charge due up to today in one transaction
+
+        Each subscription's watermark is advanced with a compare-and-swap in
+        the same transaction, so reruns, restarts and concurrent workers never
+        materialize a charge twice; a subscription another worker got to first
+        is skipped. Returns the number of expenses created.
+        Each month and category the charges land in sends a ``totals_changed``
+        event once committed.
+        """
+        today = today or date.today()
+        rows = []
+        deltas: dict[tuple[int, int, int], list[int]] = defaultdict(lambda: [0, 0])
+        topic = database_tag(self.db)
+        events = []
+
+        try:
+            for suscripcion in self.suscripcion_repo.find_active():
+                due = due_charge_dates(suscripcion, today)
+                if not due:
+                    continue
+                if not self.suscripcion_repo.advance_watermark(
+                    suscripcion.id, suscripcion.materializado_hasta, due[-1]
+                ):
+                    # Another worker materialized it concurrently; the failed
+                    # compare-and-swap changed nothing, the others go on
+                    continue
+
+                for fecha in due:
+                    rows.append({
+                        "monto_centavos": suscripcion.monto_centavos,
+                        "descripcion": suscripcion.nombre,
+                        "categoria_id": suscripcion.categoria_id,
+                        "fecha": fecha,
+                        "notas": f"{SUBSCRIPTION_NOTE_PREFIX}{suscripcion.id}",
+                    })
+                    delta = deltas[(fecha.year, fecha.month, suscripcion.categoria_id)]
+                    delta[0] += suscripcion.monto_centavos
+                    delta[1] += 1
+
+            if not rows:
+                self.db.rollback()
+                return 0
+
+            self.db.execute(insert(Gasto), rows)
+            for (anio, mes, categoria_id), (total, cantidad) in deltas.items():
+                totals = self.resumen_repo.apply_delta(anio, mes, categoria_id, total, cantidad)
+                if event_broker.has_subscribers(topic):
+                    events.append(partial(
+                        event_broker.publish, topic, "totals_changed",
+                        totals_event(self.resumen_repo, anio, mes, categoria_id, *totals)
+                    ))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        # Bulk inserts bypass incremental tracking, rebuild the snapshot lazily
+        store = get_expense_store(self.db)
+        if store is not None:
+            store.clear()
+        summary_cache.invalidate(*{month_tag(self.db, anio, mes) for anio, mes, _ in deltas})
+        for publish in events:
+            publish()
+        return len(rows)
@@ -0,0 +1,37 @@
+"""
+Provision tenants for per_user tenant mode.
+
+Usage (from the backend directory, with AUTH_SECRET set):
+
+    python -m app.tenants create alice
+    python -m app.tenants token alice
+
+create initializes the tenant's database and prints its bearer token;
+token prints the token of a tenant that already exists. Requests with a
+token of a tenant that was never created are rejected.
+"""
+import argparse
+import sys
+
+from .database import tenant_engines
+from .security import tenant_token
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.tenants", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create", help="Create a tenant and print its token").add_argument("tenant_id")
+    commands.add_parser("token", help="Print the token of a tenant").add_argument("tenant_id")
+
+    args = parser.parse_args(argv)
+    if args.command == "create":
+        path = tenant_engines.create(args.tenant_id)
+        print(f"[OK] Created {path}", file=sys.stderr)
+    elif not tenant_engines.path_for(args.tenant_id).exists():
+        parser.exit(1, f"Tenant {args.tenant_id} does not exist\n")
+    print(tenant_token(args.tenant_id))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,32 @@
 from .exceptions import (
     ExpenseNotFoundError,
+    ExpenseVersionConflictError,
     CategoryNotFoundError,
     InvalidAmountError,
     DuplicateCategoryError,
+    BudgetNotFoundError,
+    SubscriptionNotFoundError,
+    BatchOperationError,
+    CategoryMergeError,
+    UnknownTenantError,
 )
+from .money import to_centavos, from_centavos
+from .encoding import MSGPACK_MEDIA_TYPE, wants_msgpack, pack_table
 
 __all__ = [
     "ExpenseNotFoundError",
+    "ExpenseVersionConflictError",
     "CategoryNotFoundError",
     "InvalidAmountError",
     "DuplicateCategoryError",
+    "BudgetNotFoundError",
+    "SubscriptionNotFoundError",
+    "BatchOperationError",
+    "CategoryMergeError",
+    "UnknownTenantError",
+    "to_centavos",
+    "from_centavos",
+    "MSGPACK_MEDIA_TYPE",
+    "wants_msgpack",
+    "pack_table",
 ]
@@ -0,0 +1,50 @@
+"""
+Compact MessagePack encoding for record lists.
+
+A table is sent as a stream of MessagePack objects: first an array with
+the field names, then one array per record in the same order. Clients read
+it with ``msgpack.Unpacker`` and zip each row with the header. Dates are
+sent as proleptic ordinals and datetimes as Unix seconds, so no value
+carries its own key or a formatted string.
+"""
+from datetime import date, datetime, timezone
+from typing import Iterable, Iterator, Sequence
+
+import msgpack
+from starlette.requests import Request
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+# Rows are packed into chunks of about this size before being sent
+CHUNK_SIZE = 64 * 1024
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Whether the client asked for MessagePack in its Accept header"""
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in _MSGPACK_MEDIA_TYPES)
+
+
+def date_ordinal(value: date | None) -> int | None:
+    return value.toordinal() if value is not None else None
+
+
+def datetime_seconds(value: datetime | None) -> int | None:
+    """Unix seconds of a naive UTC datetime"""
+    if value is None:
+        return None
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def pack_table(fields: Sequence[str], rows: Iterable[Sequence]) -> Iterator[bytes]:
+    """Encode a header and its rows, yielding chunks suitable for streaming"""
+    packer = msgpack.Packer()
+    chunk = bytearray(packer.pack(list(fields)))
+    for row in rows:
+        chunk += packer.pack(row)
+        if len(chunk) >= CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
@@ -3,6 +3,15 @@ class ExpenseNotFoundError(Exception):
     pass
 
 
+class ExpenseVersionConflictError(Exception):
+    """Raised when an expense was modified since the version the client read"""
+
+    def __init__(self, expense_id: int, version: int):
+        super().__init__(f"Expense {expense_id} is no longer at version {version}")
+        self.expense_id = expense_id
+        self.version = version
+
+
 class CategoryNotFoundError(Exception):
     """Raised when category is not found"""
     pass
@@ -16,3 +25,33 @@ class InvalidAmountError(Exception):
 class DuplicateCategoryError(Exception):
     """Raised when trying to create a category with existing name"""
     pass
+
+
+class BudgetNotFoundError(Exception):
+    """Raised when budget is not found"""
+    pass
+
+
+class SubscriptionNotFoundError(Exception):
+    """Raised when subscription is not found"""
+    pass
+
+
+class BatchOperationError(Exception):
+    """Raised when an operation of a batch fails, the whole batch is rolled back"""
+
+    def __init__(self, index: int, op: str, error: Exception):
+        super().__init__(f"Operation {index} ({op}) failed: {error}")
+        self.index = index
+        self.op = op
+        self.error = error
+
+
+class CategoryMergeError(Exception):
+    """Raised when a category cannot be merged into the requested target"""
+    pass
+
+
+class UnknownTenantError(Exception):
+    """Raised when a request names a tenant that has not been provisioned"""
+    pass
@@ -0,0 +1,13 @@
+from decimal import Decimal
+
+CENTAVO = Decimal("0.01")
+
+
+def to_centavos(amount: Decimal) -> int:
+    """Convert a two-decimal amount into integer minor units (cents)"""
+    return int(Decimal(amount).quantize(CENTAVO).scaleb(2))
+
+
+def from_centavos(centavos: int) -> Decimal:
+    """Convert integer minor units (cents) back into a two-decimal amount"""
+    return Decimal(int(centavos)).scaleb(-2)
@@ -0,0 +1,54 @@
+"""
+Compare dashboard analytics over SQL against the columnar snapshot.
+
+Reports snapshot build time, memory per million rows and query latency
+for the monthly summary and yearly series on both paths.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date
+
+from app.services.analytics_store import ColumnarExpenseStore
+from app.services.expense_service import ExpenseService
+
+from .common import build_database, measure, report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        _, SessionLocal = build_database(url, args.rows)
+        db = SessionLocal()
+        today = date.today()
+
+        store = ColumnarExpenseStore()
+        start = time.perf_counter()
+        store.load(db)
+        build_ms = (time.perf_counter() - start) * 1000
+        per_million = store.nbytes / max(len(store), 1) * 1_000_000 / 2**20
+
+        print(f"rows={len(store)}")
+        report("snapshot build", {"ms": build_ms})
+        report("snapshot memory", {"MiB_per_1M_rows": per_million})
+
+        sql = ExpenseService(db)
+        columnar = ExpenseService(db, store=store)
+        for name, service in (("sql", sql), ("columnar", columnar)):
+            report(f"{name} monthly summary", measure(
+                lambda: service.get_monthly_summary(today.year, today.month), args.repeat
+            ))
+            report(f"{name} yearly summary", measure(
+                lambda: service.get_yearly_summary(today.year), args.repeat
+            ))
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
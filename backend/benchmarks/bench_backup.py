@@ -0,0 +1,113 @@
+"""
+Measure write latency while an online backup runs.
+
+Seeds a SQLite database of roughly --size-mb (in WAL mode by default),
+then runs a writer thread committing one expense at a time. Write latency
+is reported for a quiet window and while BackupService.snapshot() copies
+the database (with the given pages-per-step and sleep in WAL mode),
+followed by the backup duration and the compressed size.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import init_db, make_engine
+from app.seed import generate_expenses, seed_categories
+from app.services.backup_service import BackupService, stream_tar_gz
+
+from .common import report
+
+# Seeded expenses take about this many bytes each, indexes included
+BYTES_PER_ROW = 107
+
+
+def latency_stats(samples: list[float]) -> dict[str, float]:
+    samples = sorted(samples)
+    if not samples:
+        return {"writes": 0}
+    return {
+        "writes": len(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "max_ms": samples[-1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--pages-per-step", type=int, default=256)
+    parser.add_argument("--sleep", type=float, default=0.005)
+    parser.add_argument("--quiet-seconds", type=float, default=5)
+    parser.add_argument("--journal-mode", default="wal")
+    parser.add_argument("--write-interval", type=float, default=0.01,
+                        help="Pause between the writer's commits")
+    args = parser.parse_args()
+    settings.sqlite_journal_mode = args.journal_mode
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bind = make_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        init_db(bind)
+        with Session(bind) as db:
+            seed_categories(db)
+        rows = args.size_mb * 1024 * 1024 // BYTES_PER_ROW
+        generate_expenses(bind, rows, date(2015, 1, 1), date.today())
+        size = Path(bind.url.database).stat().st_size
+        print(f"rows={rows} size_MiB={size / 2**20:.0f} journal_mode={args.journal_mode}")
+
+        # (start, latency ms) of every write, split by when the write started
+        samples: list[tuple[float, float]] = []
+        stop = threading.Event()
+
+        def writer() -> None:
+            with bind.connect() as conn:
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    conn.exec_driver_sql(
+                        "INSERT INTO gastos (monto_centavos, descripcion, categoria_id, fecha, "
+                        "fecha_creacion, version) VALUES (100, 'bench', 1, '2024-01-01', "
+                        "'2024-01-01 00:00:00', 1)"
+                    )
+                    conn.commit()
+                    samples.append((start, (time.perf_counter() - start) * 1000))
+                    time.sleep(args.write_interval)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        time.sleep(args.quiet_seconds)
+
+        start = time.perf_counter()
+        with Session(bind) as db:
+            if args.journal_mode == "wal":
+                snapshot = BackupService(db).snapshot(args.pages_per_step, args.sleep)
+            else:
+                # Rollback-journal backups run in one step
+                snapshot = BackupService(db).snapshot()
+        end = time.perf_counter()
+        backup_seconds = end - start
+        stop.set()
+        thread.join()
+        quiet = [latency for began, latency in samples if began < start]
+        during = [latency for began, latency in samples if start <= began < end]
+
+        compressed = sum(len(chunk) for chunk in stream_tar_gz(snapshot))
+        report("writes without backup", latency_stats(quiet))
+        report("writes during backup", latency_stats(during))
+        report("backup", {
+            "seconds": backup_seconds,
+            "pages_per_step": args.pages_per_step,
+            "sleep_ms": args.sleep * 1000,
+            "gzip_MiB": compressed / 2**20,
+        })
+        bind.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Idle event streams per worker and fan-out latency of expense events.
+
+Starts one uvicorn worker on a temporary database, opens --connections
+``GET /api/events`` streams against it and reports the worker's resident
+memory per open stream. Then creates expenses one at a time and reports
+the create latency and how long until every stream received the event,
+compared with the same creates and no stream open.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from .common import build_database, report
+
+
+def rss_mib(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def latency_stats(samples: list[float]) -> dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "p50_ms": samples[len(samples) // 2],
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "max_ms": samples[-1],
+    }
+
+
+async def open_stream(port: int) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /api/events HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n")
+    await writer.drain()
+    await reader.readuntil(b"retry:")
+    return reader, writer
+
+
+async def next_event(reader: asyncio.StreamReader) -> float:
+    """Read until an event frame arrives, returns when it did"""
+    await reader.readuntil(b"event: ")
+    return time.perf_counter()
+
+
+async def run(port: int, pid: int, connections: int, writes: int) -> None:
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+        async def create() -> float:
+            start = time.perf_counter()
+            response = await client.post("/api/expenses", json={
+                "monto": "1.00", "descripcion": "bench", "categoria_id": 1, "fecha": "2024-01-01"
+            })
+            response.raise_for_status()
+            return start
+
+        # Warm up the worker before measuring its memory
+        for _ in range(20):
+            await create()
+        baseline = rss_mib(pid)
+        quiet = []
+        for _ in range(writes):
+            start = await create()
+            quiet.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        streams = []
+        for offset in range(0, connections, 500):
+            streams.extend(await asyncio.gather(
+                *(open_stream(port) for _ in range(min(500, connections - offset)))
+            ))
+        opened = time.perf_counter() - start
+        await asyncio.sleep(1)
+        stats = (await client.get("/api/admin/events")).json()
+        memory = rss_mib(pid) - baseline
+        report("open streams", {
+            "streams": stats["subscribers"],
+            "open_seconds": opened,
+            "rss_MiB": memory,
+            "KiB_per_stream": memory * 1024 / max(1, stats["subscribers"]),
+        })
+
+        creates, fan_out = [], []
+        cpu = cpu_seconds(pid)
+        for _ in range(writes):
+            waiting = [asyncio.create_task(next_event(reader)) for reader, _ in streams]
+            await asyncio.sleep(0)
+            start = await create()
+            created = time.perf_counter()
+            arrivals = await asyncio.gather(*waiting)
+            creates.append((created - start) * 1000)
+            fan_out.append((max(arrivals) - start) * 1000)
+
+        cpu = cpu_seconds(pid) - cpu
+        report("create, no stream open", latency_stats(quiet))
+        report(f"create, {connections} streams open", latency_stats(creates))
+        report(f"create until every stream has the event", latency_stats(fan_out))
+        report("worker CPU per event", {
+            "ms": cpu * 1000 / writes,
+            "us_per_stream": cpu * 1e6 / writes / connections,
+        })
+        report("broker", (await client.get("/api/admin/events")).json())
+        for _, writer in streams:
+            writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine, _ = build_database(url, args.rows)
+        engine.dispose()
+        env = dict(
+            os.environ, DATABASE_URL=url, SCHEDULER_ENABLED="False",
+            SQLITE_JOURNAL_MODE="wal", EVENTS_KEEPALIVE_SECONDS="15"
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+             "--log-level", "warning", "--backlog", str(args.connections + 100)],
+            env=env
+        )
+        try:
+            for _ in range(100):
+                try:
+                    httpx.get(f"http://127.0.0.1:{args.port}/api/version")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            asyncio.run(run(args.port, server.pid, args.connections, args.writes))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
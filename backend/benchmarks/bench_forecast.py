@@ -0,0 +1,64 @@
+"""
+Measure the spend forecast over a decade of daily history.
+
+Reports the uncached forecast on the SQL path (one grouped query answered
+from the covering index) and on the columnar snapshot, split into the
+history fetch and the NumPy projection, plus a cached call.
+"""
+import argparse
+import os
+import tempfile
+from datetime import date, timedelta
+
+from app.config import settings
+from app.services.analytics_store import ColumnarExpenseStore
+from app.services.expense_service import ExpenseService
+from app.services.forecast import daily_matrix, forecast_months
+
+from .common import build_database, measure, report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        _, SessionLocal = build_database(url, args.rows, years=10)
+        db = SessionLocal()
+        today = date.today()
+        start = today - timedelta(days=settings.forecast_history_days - 1)
+        print(f"rows={args.rows} history_days={settings.forecast_history_days}")
+
+        sql = ExpenseService(db)
+        ids = [categoria.id for categoria in sql.categoria_repo.find_all()]
+        rows = sql.gasto_repo.get_daily_totals_by_categoria(start, today)
+        matrix = daily_matrix(rows, ids, start, today)
+        print(f"grouped_rows={len(rows)} matrix={matrix.shape}")
+
+        report("sql grouped query", measure(
+            lambda: sql.gasto_repo.get_daily_totals_by_categoria(start, today), args.repeat
+        ))
+        report("matrix from rows", measure(lambda: daily_matrix(rows, ids, start, today), args.repeat))
+        report("numpy projection", measure(
+            lambda: forecast_months(matrix, start, today, args.months), args.repeat
+        ))
+        report("sql forecast (uncached)", measure(
+            lambda: sql._compute_forecast(start, today, args.months), args.repeat
+        ))
+
+        store = ColumnarExpenseStore()
+        store.load(db)
+        columnar = ExpenseService(db, store=store)
+        report("columnar forecast (uncached)", measure(
+            lambda: columnar._compute_forecast(start, today, args.months), args.repeat
+        ))
+        report("cached forecast", measure(lambda: sql.get_forecast(args.months), args.repeat))
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
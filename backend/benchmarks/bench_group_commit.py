@@ -0,0 +1,106 @@
+"""
+Compare per-request commits with the group commit writer for expense creates.
+
+For each concurrency level, that many clients create expenses back to back
+for --seconds: either each in its own session and transaction on a worker
+thread (the regular write path), or through GroupCommitWriter. Reports
+sustained inserts per second, latency percentiles and failed writes.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import init_db, make_engine, make_session_factory
+from app.schemas.gasto import GastoCreate
+from app.seed import seed_categories
+from app.services.expense_service import ExpenseService
+from app.services.expense_writer import GroupCommitWriter
+
+from .common import report
+
+
+def latency_stats(samples: list[float], errors: int, seconds: float) -> dict[str, float]:
+    samples = sorted(samples)
+    stats = {"inserts_per_s": len(samples) / seconds, "errors": errors}
+    if samples:
+        stats["p50_ms"] = samples[len(samples) // 2]
+        stats["p99_ms"] = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        stats["max_ms"] = samples[-1]
+    return stats
+
+
+async def run_clients(write, clients: int, seconds: float) -> tuple[list[float], int]:
+    samples: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                await write()
+            except Exception:
+                errors += 1
+                continue
+            samples.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return samples, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--max-delay-ms", type=float, default=settings.group_commit_max_delay_ms)
+    parser.add_argument("--max-batch", type=int, default=settings.group_commit_max_batch)
+    parser.add_argument("--journal-mode", help="e.g. wal (default: the file's mode)")
+    args = parser.parse_args()
+    settings.sqlite_journal_mode = args.journal_mode
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bind = make_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        init_db(bind)
+        with Session(bind) as db:
+            seed_categories(db)
+        SessionLocal = make_session_factory(bind)
+        data = GastoCreate(monto=12.5, descripcion="bench", categoria_id=1, fecha=date.today())
+
+        def create_committed() -> None:
+            db = SessionLocal()
+            try:
+                ExpenseService(db).create_expense(data)
+            finally:
+                db.close()
+
+        print(f"journal_mode={args.journal_mode or 'default'} seconds={args.seconds} "
+              f"max_delay_ms={args.max_delay_ms} max_batch={args.max_batch}")
+        for clients in args.clients:
+            samples, errors = asyncio.run(run_clients(
+                lambda: asyncio.to_thread(create_committed), clients, args.seconds
+            ))
+            report(f"per-request commit, {clients} clients", latency_stats(samples, errors, args.seconds))
+
+            writer = GroupCommitWriter(SessionLocal, args.max_delay_ms, args.max_batch)
+
+            async def grouped() -> tuple[list[float], int]:
+                result = await run_clients(lambda: writer.create(data), clients, args.seconds)
+                await writer.stop()
+                return result
+
+            samples, errors = asyncio.run(grouped())
+            stats = latency_stats(samples, errors, args.seconds)
+            stats["writes_per_commit"] = writer.writes / max(writer.batches, 1)
+            report(f"group commit, {clients} clients", stats)
+        bind.dispose()
+
+
+if __name__ == "__main__":
+    main()
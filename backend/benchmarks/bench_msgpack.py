@@ -0,0 +1,60 @@
+"""
+Compare the JSON and MessagePack encodings of the expense list.
+
+Loads --rows expenses and reports payload size (raw and gzipped) and
+encode latency for the JSON response FastAPI builds from GastoResponse
+and for the MessagePack rows sent with Accept: application/msgpack.
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+
+from pydantic import TypeAdapter
+
+from app.routers.gastos import MSGPACK_FIELDS, _msgpack_row
+from app.schemas.gasto import GastoResponse
+from app.services.expense_service import ExpenseService
+from app.utils.encoding import pack_table
+
+from .common import build_database, measure, report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        _, SessionLocal = build_database(url, args.rows)
+        db = SessionLocal()
+        expenses = ExpenseService(db).get_all_expenses()
+        adapter = TypeAdapter(list[GastoResponse])
+
+        def encode_json() -> bytes:
+            # What FastAPI does for response_model=list[GastoResponse]
+            content = adapter.dump_python(
+                adapter.validate_python(expenses, from_attributes=True), mode="json"
+            )
+            return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+        def encode_msgpack() -> bytes:
+            return b"".join(pack_table(MSGPACK_FIELDS, map(_msgpack_row, expenses)))
+
+        print(f"rows={len(expenses)}")
+        for name, encode in (("json", encode_json), ("msgpack", encode_msgpack)):
+            payload = encode()
+            report(f"{name} payload", {
+                "KiB": len(payload) / 1024,
+                "gzip_KiB": len(gzip.compress(payload)) / 1024,
+                "bytes_per_row": len(payload) / len(expenses),
+            })
+            report(f"{name} encode", measure(encode, args.repeat))
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
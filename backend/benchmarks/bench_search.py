@@ -0,0 +1,97 @@
+"""
+Measure the expense search over every combination of filters.
+
+For each combination of date range, categories, amount range, text and
+sort order, prints the index SQLite walks (from EXPLAIN QUERY PLAN) and the
+latency of the first page and of a page deep into the results (reached
+through the keyset cursor). A plan without an index is flagged.
+"""
+import argparse
+import itertools
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+from app.schemas.gasto import GastoFilter
+from app.services.expense_service import ExpenseService, decode_cursor
+
+from .common import build_database, measure, report
+
+
+def plan_steps(db, query) -> list[str]:
+    sql = str(query.compile(db.get_bind(), compile_kwargs={"literal_binds": True}))
+    return [row[3] for row in db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--deep-pages", type=int, default=20,
+                        help="Pages followed before timing the deep page")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        _, SessionLocal = build_database(url, args.rows)
+        db = SessionLocal()
+        service = ExpenseService(db)
+        today = date.today()
+        print(f"rows={args.rows} limit={args.limit}")
+
+        unindexed = 0
+        for dated, categorias, montos, texto, sort in itertools.product(
+            (False, True),
+            ((), (2,), (1, 3, 5)),
+            ((None, None), (Decimal("10"), Decimal("50")), (Decimal("29.81"), Decimal("29.81"))),
+            (None, "gas"),
+            ("-fecha", "monto"),
+        ):
+            filters = GastoFilter(
+                start=today - timedelta(days=90) if dated else None,
+                end=today if dated else None,
+                categoria_ids=list(categorias),
+                monto_min=montos[0],
+                monto_max=montos[1],
+                q=texto,
+                sort=sort,
+            )
+            cursor = None
+            for _ in range(args.deep_pages):
+                _, cursor = service.search_expenses(filters, args.limit, cursor)
+                if cursor is None:
+                    break
+            query = service.gasto_repo.search_query(
+                start_date=filters.start,
+                end_date=filters.end,
+                categoria_ids=filters.categoria_ids,
+                monto_min=int(montos[0] * 100) if montos[0] is not None else None,
+                monto_max=int(montos[1] * 100) if montos[1] is not None else None,
+                texto=texto,
+                sort=sort,
+                after=decode_cursor(cursor, sort) if cursor else None,
+                limit=args.limit + 1,
+            )
+            steps = plan_steps(db, query)
+            indexed = all("USING INDEX" in step or "TEMP B-TREE" in step for step in steps)
+            unindexed += not indexed
+            amount = "any" if montos[0] is None else ("exact" if montos[0] == montos[1] else "range")
+            name = (
+                f"{'90d' if dated else 'all'} cat={len(categorias)} amt={amount} "
+                f"q={'y' if texto else 'n'} {sort}"
+            )
+            first = measure(lambda: service.search_expenses(filters, args.limit), args.repeat)
+            stats = {"first_p50_ms": first["p50_ms"], "first_p99_ms": first["p99_ms"]}
+            if cursor is not None:
+                deep = measure(lambda: service.search_expenses(filters, args.limit, cursor), args.repeat)
+                stats.update(deep_p50_ms=deep["p50_ms"], deep_p99_ms=deep["p99_ms"])
+            report(name, stats)
+            print(f"    {'; '.join(steps)}{'' if indexed else '  <-- NO INDEX'}")
+        print(f"combinations without an index: {unindexed}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Measure the per-category statistics endpoint.
+
+For a month, a year and the whole history, reports both ways the
+repository reaches the ranks (ROW_NUMBER over the sorted range, and walking
+ix_gastos_categoria_monto to each rank), the complete uncached computation
+on the path it picks, a cached call, and loading every amount of the range
+into Python to sort it there for comparison.
+"""
+import argparse
+import os
+import tempfile
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from app.models.gasto import Gasto
+from app.repositories import gasto_repository
+from app.services.expense_service import STATS_PERCENTILES, ExpenseService
+
+from .common import build_database, measure, report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        _, SessionLocal = build_database(url, args.rows)
+        db = SessionLocal()
+        service = ExpenseService(db)
+        repo = service.gasto_repo
+        today = date.today()
+        default_fraction = gasto_repository.STATS_WALK_FRACTION
+        print(f"rows={args.rows} top={args.top} walk_fraction={default_fraction}")
+
+        for name, start in (
+            ("month", today.replace(day=1)),
+            ("year", today - timedelta(days=365)),
+            ("all", date(1970, 1, 1)),
+        ):
+            stats = lambda: repo.get_amount_stats_by_categoria(start, today, args.top, STATS_PERCENTILES)
+            print(f"{name}: {sum(row[1] for row in stats())} expenses, "
+                  f"span fraction {repo._date_span_fraction(start, today):.3f}")
+            for path, fraction in (("window", 2.0), ("index walk", 0.0)):
+                gasto_repository.STATS_WALK_FRACTION = fraction
+                report(f"{name} {path}", measure(stats, args.repeat))
+            gasto_repository.STATS_WALK_FRACTION = default_fraction
+
+            report(f"{name} stats (uncached)", measure(
+                lambda: service._compute_category_stats(start, today, args.top), args.repeat
+            ))
+            report(f"{name} stats (cached)", measure(
+                lambda: service.get_category_stats(start, today, args.top), args.repeat
+            ))
+
+            def load_and_sort():
+                amounts: dict[int, list[int]] = {}
+                for categoria_id, monto in db.execute(
+                    select(Gasto.categoria_id, Gasto.monto_centavos).where(Gasto.fecha.between(start, today))
+                ):
+                    amounts.setdefault(categoria_id, []).append(monto)
+                for values in amounts.values():
+                    values.sort()
+
+            report(f"{name} load every row + sort", measure(load_and_sort, args.repeat))
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
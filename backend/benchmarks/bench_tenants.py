@@ -0,0 +1,80 @@
+"""
+Compare write throughput of one shared database against per-user databases.
+
+Several threads create expenses through ExpenseService concurrently, first
+all against a single SQLite file and then each against its own tenant file.
+"""
+import argparse
+import tempfile
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from app.database import TenantEngineCache
+from app.models.categoria import Categoria
+from app.schemas.gasto import GastoCreate
+from app.services.expense_service import ExpenseService
+
+from .common import report
+
+
+def write(session_factory, count: int) -> None:
+    db = session_factory()
+    try:
+        service = ExpenseService(db)
+        for _ in range(count):
+            service.create_expense(GastoCreate(
+                monto=Decimal("12.34"),
+                descripcion="bench",
+                categoria_id=1,
+                fecha=date.today()
+            ))
+    finally:
+        db.close()
+
+
+def run(factories, inserts_per_thread: int) -> float:
+    for factory in set(factories):
+        with factory.kw["bind"].begin() as conn:
+            conn.execute(insert(Categoria), [{"nombre": "bench", "activo": True}])
+
+    threads = [
+        threading.Thread(target=write, args=(factory, inserts_per_thread))
+        for factory in factories
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(threads) * inserts_per_thread / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--inserts", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as shared_dir, tempfile.TemporaryDirectory() as tenant_dir:
+        shared_cache = TenantEngineCache(shared_dir, args.threads)
+        shared_cache.create("shared")
+        shared = shared_cache.session_factory("shared")
+        report("single database", {
+            "inserts_per_s": run([shared] * args.threads, args.inserts)
+        })
+
+        tenants = TenantEngineCache(tenant_dir, args.threads)
+        for i in range(args.threads):
+            tenants.create(f"user-{i}")
+        factories = [tenants.session_factory(f"user-{i}") for i in range(args.threads)]
+        report("per-user databases", {
+            "inserts_per_s": run(factories, args.inserts)
+        })
+
+
+if __name__ == "__main__":
+    main()
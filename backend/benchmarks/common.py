@@ -0,0 +1,71 @@
+"""
+Shared helpers for the backend benchmarks.
+
+Run benchmarks from the backend directory, e.g.
+``python -m benchmarks.bench_analytics --rows 1000000``.
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.categoria import Categoria
+from app.models.gasto import Gasto
+
+
+def build_database(url: str, rows: int, categories: int = 7, years: int = 5, seed: int = 42):
+    """Create a database with synthetic expenses and return (engine, SessionLocal)"""
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    rng = random.Random(seed)
+    first_day = date.today().replace(month=1, day=1) - timedelta(days=365 * (years - 1))
+    span = (date.today() - first_day).days + 1
+    now = date.today()
+
+    with engine.begin() as conn:
+        conn.execute(insert(Categoria), [
+            {"nombre": f"Categoria {i}", "activo": True} for i in range(1, categories + 1)
+        ])
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "monto_centavos": int(rng.lognormvariate(8, 1)),
+                "descripcion": "gasto",
+                "categoria_id": rng.randint(1, categories),
+                "fecha": first_day + timedelta(days=rng.randrange(span)),
+                "fecha_creacion": now,
+            })
+            if len(batch) == 50_000:
+                conn.execute(insert(Gasto), batch)
+                batch.clear()
+        if batch:
+            conn.execute(insert(Gasto), batch)
+
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def measure(func, repeat: int = 20) -> dict[str, float]:
+    """Run func repeatedly and return latency statistics in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": statistics.median(samples),
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "max_ms": samples[-1],
+    }
+
+
+def report(name: str, stats: dict[str, float]) -> None:
+    """Print one benchmark line"""
+    values = "  ".join(f"{key}={value:.2f}" for key, value in stats.items())
+    print(f"{name:<40} {values}")
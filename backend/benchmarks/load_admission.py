@@ -0,0 +1,90 @@
+"""
+Load test for admission control.
+
+Saturates the heavy class with concurrent unfiltered ``GET /api/expenses``
+calls while a single client measures latency of the cheap
+``GET /api/categories/1`` route, once with the configured limits and once
+with admission effectively disabled.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from app.database import get_db
+from app.main import app
+from app.middleware.admission import ConcurrencyClass, admission_controller
+
+from .common import build_database, report
+
+
+async def run(heavy_clients: int, seconds: float) -> tuple[dict[str, float], dict[str, int]]:
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    timeout = httpx.Timeout(60)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+        deadline = time.perf_counter() + seconds
+        statuses: dict[str, int] = {}
+
+        async def heavy():
+            while time.perf_counter() < deadline:
+                response = await client.get("/api/expenses")
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+                if response.status_code == 503:
+                    await asyncio.sleep(0.05)
+
+        async def cheap():
+            samples = []
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await client.get("/api/categories/1")
+                samples.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.005)
+            return samples
+
+        tasks = [asyncio.create_task(heavy()) for _ in range(heavy_clients)]
+        samples = await cheap()
+        await asyncio.gather(*tasks)
+
+    samples.sort()
+    latency = {
+        "requests": len(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "max_ms": samples[-1],
+    }
+    return latency, statuses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=3_000)
+    parser.add_argument("--heavy-clients", type=int, default=24)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _, SessionLocal = build_database(f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.rows)
+
+        def override_get_db():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        configured = admission_controller.heavy
+        unbounded = ConcurrencyClass("heavy", limit=10**6, max_queue=10**6)
+
+        for name, heavy in (("without admission", unbounded), ("with admission", configured)):
+            admission_controller.heavy = heavy
+            latency, statuses = asyncio.run(run(args.heavy_clients, args.seconds))
+            report(f"cheap route, {name}", latency)
+            print(f"  heavy responses by status: {statuses}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ Script to initialize default categories in the database.
 Run this after the database is created.
 """
 from app.database import SessionLocal, init_db
-from app.models.categoria import Categoria
+from app.seed import seed_categories
 
 
 def init_categories():
@@ -15,30 +15,11 @@ def init_categories():
 
     db = SessionLocal()
 
-    default_categories = [
-        {"nombre": "Comida", "icono": "🍔", "color": "#10B981"},
-        {"nombre": "Transporte", "icono": "🚗", "color": "#3B82F6"},
-        {"nombre": "Servicios", "icono": "💡", "color": "#F59E0B"},
-        {"nombre": "Compras", "icono": "🛍️", "color": "#8B5CF6"},
-        {"nombre": "Entretenimiento", "icono": "🎬", "color": "#EC4899"},
-        {"nombre": "Salud", "icono": "⚕️", "color": "#EF4444"},
-        {"nombre": "Otros", "icono": "📦", "color": "#6B7280"},
-    ]
-
     try:
-        # Check if categories already exist
-        existing_count = db.query(Categoria).count()
-
-        if existing_count == 0:
-            print("Creating default categories...")
-            for cat_data in default_categories:
-                categoria = Categoria(**cat_data)
-                db.add(categoria)
-
-            db.commit()
-            print(f"[OK] Created {len(default_categories)} default categories")
-        else:
-            print(f"Categories already exist ({existing_count} found). Skipping initialization.")
+        # Missing defaults are inserted, existing categories are left untouched
+        print("Creating default categories...")
+        count = seed_categories(db)
+        print(f"[OK] Ensured {count} default categories")
 
     except Exception as e:
         print(f"Error initializing categories: {e}")
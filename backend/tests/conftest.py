@@ -1,28 +1,105 @@
+import glob
+import os
+import shutil
+import socket
+import subprocess
 import pytest
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 from app.models.base import Base
 from app.models.categoria import Categoria
 from app.main import app
-from app.database import get_db
+from app.config import settings
+from app.database import get_db, get_write_db, make_engine
+from app.services.result_cache import summary_cache
 
 # Test database
 TEST_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = make_engine(TEST_DATABASE_URL)
+
+
+def _find_pg_bin() -> str | None:
+    """Locate the PostgreSQL server binaries (initdb, pg_ctl)"""
+    if os.environ.get("PG_BIN"):
+        return os.environ["PG_BIN"]
+    initdb = shutil.which("initdb")
+    if initdb:
+        return os.path.dirname(initdb)
+    candidates = sorted(glob.glob("/usr/lib/postgresql/*/bin/initdb"))
+    return os.path.dirname(candidates[-1]) if candidates else None
+
+
+@pytest.fixture(scope="session")
+def postgres_url(tmp_path_factory):
+    """URL of a throwaway PostgreSQL server started for the test session"""
+    if os.environ.get("TEST_POSTGRES_URL"):
+        yield os.environ["TEST_POSTGRES_URL"]
+        return
+
+    pytest.importorskip("psycopg2")
+    pg_bin = _find_pg_bin()
+    if pg_bin is None:
+        pytest.skip("PostgreSQL server binaries not found")
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        pytest.skip("initdb refuses to run as root, set TEST_POSTGRES_URL instead")
+
+    data_dir = tmp_path_factory.mktemp("pgdata")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    subprocess.run(
+        # UTF8 explicitly: with the C locale initdb defaults to SQL_ASCII
+        [
+            os.path.join(pg_bin, "initdb"), "-D", str(data_dir), "-U", "postgres",
+            "-E", "UTF8", "--locale=C", "--auth=trust",
+        ],
+        check=True, capture_output=True
+    )
+    subprocess.run(
+        [
+            os.path.join(pg_bin, "pg_ctl"), "-D", str(data_dir), "-w", "start",
+            "-l", str(data_dir / "server.log"),
+            "-o", f"-p {port} -k {data_dir} -c listen_addresses=127.0.0.1",
+        ],
+        check=True, capture_output=True
+    )
+    try:
+        yield f"postgresql+psycopg2://postgres@127.0.0.1:{port}/postgres"
+    finally:
+        subprocess.run(
+            [os.path.join(pg_bin, "pg_ctl"), "-D", str(data_dir), "-m", "immediate", "stop"],
+            capture_output=True
+        )
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def db_engine(request):
+    """Engine of each supported database backend"""
+    if request.param == "sqlite":
+        yield engine
+        return
+
+    pg_engine = make_engine(request.getfixturevalue("postgres_url"))
+    try:
+        yield pg_engine
+    finally:
+        pg_engine.dispose()
 
 
 @pytest.fixture
-def db_session():
+def db_session(db_engine):
     """Create a fresh database for each test"""
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=db_engine)
+    # Cached results are keyed by database URL, which every test reuses
+    summary_cache.clear()
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
     db = TestingSessionLocal()
     try:
         yield db
     finally:
         db.close()
-        Base.metadata.drop_all(bind=engine)
+        Base.metadata.drop_all(bind=db_engine)
 
 
 @pytest.fixture
@@ -34,7 +111,14 @@ def client(db_session):
         finally:
             db_session.close()
 
+    def override_get_write_db():
+        if settings.group_commit_enabled:
+            yield None
+        else:
+            yield from override_get_db()
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_write_db] = override_get_write_db
 
     return TestClient(app)
 
@@ -0,0 +1,456 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app import database
+from app.config import settings
+from app.database import TenantEngineCache
+from app.main import app
+
+
+def test_tenant_engine_cache_is_lru(tmp_path):
+    """Test tenant engines are opened lazily, only for provisioned tenants, and the oldest is evicted"""
+    import pytest
+    from app.utils.exceptions import UnknownTenantError
+
+    cache = TenantEngineCache(str(tmp_path), max_size=2)
+    for tenant in ("alice", "bob", "carol"):
+        cache.create(tenant)
+
+    alice = cache.session_factory("alice")
+    cache.session_factory("bob")
+    assert cache.session_factory("alice") is alice  # alice is now most recent
+    cache.session_factory("carol")
+
+    assert len(cache) == 2
+    assert cache.session_factory("alice") is alice
+    assert cache.path_for("bob").exists()  # evicted engine keeps its file
+    assert len(cache.tenant_paths()) == 3
+    with pytest.raises(UnknownTenantError):
+        cache.session_factory("mallory")
+    assert not cache.path_for("mallory").exists()
+    cache.clear()
+
+
+def test_tenant_engine_cache_retries_failed_opens(tmp_path, monkeypatch):
+    """Test a tenant database that fails to open leaves no state behind and opens on the next try"""
+    import pytest
+
+    cache = TenantEngineCache(str(tmp_path), max_size=2)
+    cache.create("alice")
+    init_db = database.init_db
+
+    def broken_init_db(bind):
+        raise RuntimeError("disk I/O error")
+
+    monkeypatch.setattr(database, "init_db", broken_init_db)
+    with pytest.raises(RuntimeError):
+        cache.session_factory("alice")
+    assert cache._opening == {} and len(cache) == 0
+
+    monkeypatch.setattr(database, "init_db", init_db)
+    assert cache.session_factory("alice") is cache.session_factory("alice")
+    assert cache._opening == {}
+    cache.clear()
+
+
+def test_get_db_routes_by_token(tmp_path, monkeypatch):
+    """Test each tenant reads and writes only its own database, chosen by a signed token"""
+    from app.security import tenant_token
+
+    monkeypatch.setattr(settings, "tenant_mode", "per_user")
+    monkeypatch.setattr(settings, "auth_secret", "test-secret")
+    monkeypatch.setattr(database, "tenant_engines", TenantEngineCache(str(tmp_path), 8))
+    monkeypatch.setattr(app, "dependency_overrides", {})
+    client = TestClient(app)
+
+    def auth(tenant: str) -> dict[str, str]:
+        return {"Authorization": f"Bearer {tenant_token(tenant)}"}
+
+    for user in ("alice", "bob"):
+        database.tenant_engines.create(user)
+        response = client.post("/api/categories", json={"nombre": f"Comida {user}"}, headers=auth(user))
+        assert response.status_code == 201
+
+    response = client.get("/api/categories", headers=auth("alice"))
+    assert [c["nombre"] for c in response.json()] == ["Comida alice"]
+
+    assert client.get("/api/categories").status_code == 401
+    forged = tenant_token("alice").split(".")[0] + "." + tenant_token("bob").split(".")[1]
+    assert client.get("/api/categories", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+    assert client.get("/api/categories", headers=auth("mallory")).status_code == 403
+    assert len(database.tenant_engines.tenant_paths()) == 2
+    database.tenant_engines.clear()
+
+
+def test_event_streams_take_a_signed_query_token(tmp_path, monkeypatch):
+    """Test EventSource clients reach only their tenant's stream, through a short-lived query token"""
+    from app.routers import eventos
+    from app.security import events_token, tenant_token
+
+    class Broker:
+        async def stream(self, topic):
+            yield topic.encode()
+
+    monkeypatch.setattr(settings, "tenant_mode", "per_user")
+    monkeypatch.setattr(settings, "auth_secret", "test-secret")
+    monkeypatch.setattr(database, "tenant_engines", TenantEngineCache(str(tmp_path), 8))
+    monkeypatch.setattr(eventos, "event_broker", Broker())
+    monkeypatch.setattr(app, "dependency_overrides", {})
+    client = TestClient(app)
+    for tenant in ("alice", "bob"):
+        database.tenant_engines.create(tenant)
+
+    assert client.post("/api/events/token").status_code == 401
+    response = client.post("/api/events/token",
+                           headers={"Authorization": f"Bearer {tenant_token('alice')}"})
+    assert response.status_code == 200
+    token = response.json()["token"]
+
+    response = client.get("/api/events", params={"token": token})
+    assert response.status_code == 200
+    assert response.text.endswith(str(database.tenant_engines.path_for("alice")))
+    assert client.get("/api/events").status_code == 401
+    # The bearer token and an expired or forged stream token are not stream tokens
+    assert client.get("/api/events", params={"token": tenant_token("bob")}).status_code == 401
+    assert client.get("/api/events", params={"token": events_token("bob", 0)}).status_code == 401
+    forged = token.split(".")[0] + "." + events_token("bob", 2**40).split(".")[1]
+    assert client.get("/api/events", params={"token": forged}).status_code == 401
+    database.tenant_engines.clear()
+
+
+def test_evicted_tenants_stop_their_writer(tmp_path):
+    """Test a tenant engine leaving the LRU takes its group commit writer with it"""
+    import asyncio
+    from app.services import expense_writer
+
+    cache = TenantEngineCache(str(tmp_path), max_size=1)
+    cache.add_eviction_listener(expense_writer._discard_writer)
+    for tenant in ("alice", "bob"):
+        cache.create(tenant)
+
+    async def main():
+        writer = expense_writer.get_expense_writer(cache.session_factory("alice"))
+        writer._ensure_running()
+        cache.session_factory("bob")
+        await asyncio.wait_for(writer._task, 5)
+        return writer
+
+    writer = asyncio.run(main())
+    assert writer._task.done()
+    assert writer not in expense_writer._writers.values()
+    cache.clear()
+
+
+def test_background_jobs_do_not_churn_tenant_engines(tmp_path, monkeypatch):
+    """Test iterating every tenant for background jobs leaves the request LRU alone"""
+    monkeypatch.setattr(settings, "tenant_mode", "per_user")
+    cache = TenantEngineCache(str(tmp_path), max_size=1)
+    monkeypatch.setattr(database, "tenant_engines", cache)
+    for tenant in ("alice", "bob", "carol"):
+        cache.create(tenant)
+    alice = cache.session_factory("alice")
+
+    factories = []
+    for factory in database.session_factories():
+        with factory() as db:
+            db.execute(text("SELECT count(*) FROM gastos")).scalar()
+        factories.append(factory)
+
+    assert len(factories) == 3 and alice in factories
+    assert len(cache) == 1 and cache.session_factory("alice") is alice
+    cache.clear()
+
+
+def test_slow_query_log_records_caller_and_plan(tmp_path):
+    """Test slow statements are recorded with their caller, parameter shape and plan"""
+    import pytest
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import Session
+    from app.database import SlowQueryLog, install_slow_query_log, make_engine, init_db
+    from app.repositories.gasto_repository import GastoRepository
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'slow.db'}")
+    init_db(engine)
+    log = SlowQueryLog(max_size=2)
+    install_slow_query_log(engine, threshold_ms=0, log=log)
+
+    with Session(engine) as db:
+        GastoRepository(db).get_monthly_total(2024, 1)
+        GastoRepository(db).get_monthly_total(2024, 2)
+        GastoRepository(db).get_monthly_total(2024, 3)
+
+    entries = log.entries()
+    assert len(entries) == 2
+    assert entries[0]["caller"] == "GastoRepository.get_monthly_total"
+    assert set(entries[0]["parameters"]) <= {"int", "str"}
+    assert any("gastos" in step for step in entries[0]["plan"])
+
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        assert conn.info["query_start"] == []
+    engine.dispose()
+
+
+def test_archive_routes_queries_by_year(tmp_path):
+    """Test archived years move to the attached archive and only ranges reaching them read it"""
+    from datetime import date
+    from sqlalchemy import event, func, select
+    from sqlalchemy.orm import Session
+    from app.archive import archive_path, archive_year, archived_years, unarchive_year
+    from app.database import init_db, make_engine
+    from app.models import Categoria, Gasto
+    from app.repositories.gasto_repository import GastoRepository
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'hot.db'}")
+    init_db(engine)
+    this_year = date.today().year
+    with Session(engine) as db:
+        db.add(Categoria(nombre="Comida"))
+        db.flush()
+        for fecha in (date(2021, 3, 1), date(2021, 7, 1), date(this_year, 1, 1)):
+            db.add(Gasto(monto_centavos=100, descripcion="x", categoria_id=1, fecha=fecha))
+        db.commit()
+
+    assert archive_year(engine, 2021) == 2
+    assert archive_path(engine).exists()
+    assert archived_years(engine) == {2021}
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    with Session(engine) as db:
+        repo = GastoRepository(db)
+        assert db.scalar(select(func.count()).select_from(Gasto)) == 1
+        assert len(repo.find_by_month(this_year, 1)) == 1
+        assert not any("archive.gastos" in statement for statement in statements)
+
+        assert [g.fecha for g in repo.find_by_month(2021, 3)] == [date(2021, 3, 1)]
+        assert len(repo.find_by_date_range(date(2021, 1, 1), date(this_year, 12, 31))) == 3
+        assert repo.get_monthly_total(2021, 7) == 100
+        page = repo.search(start_date=date(2021, 1, 1), sort="fecha", limit=2)
+        assert [g.fecha for g in page] == [date(2021, 3, 1), date(2021, 7, 1)]
+        # Every listing agrees on what the expenses are
+        assert len(repo.find_all()) == len(repo.find_by_categoria(1)) == 3
+        assert [g.fecha for g in repo.find_recent(3)][-1] == date(2021, 3, 1)
+
+    assert unarchive_year(engine, 2021) == 2
+    assert archived_years(engine) == set()
+    with Session(engine) as db:
+        assert db.scalar(select(func.count()).select_from(Gasto)) == 3
+        assert len(GastoRepository(db).find_by_categoria(1)) == 3
+    engine.dispose()
+
+
+def test_category_with_archived_expenses_is_not_merged(tmp_path):
+    """Test a merge cannot leave a category's archived expenses behind on the deactivated category"""
+    from datetime import date
+    import pytest
+    from sqlalchemy.orm import Session
+    from app.archive import archive_year, unarchive_year
+    from app.database import init_db, make_engine
+    from app.models import Categoria, Gasto
+    from app.services.category_service import CategoryService
+    from app.services.expense_service import ExpenseService
+    from app.utils.exceptions import CategoryMergeError
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'hot.db'}")
+    init_db(engine)
+    with Session(engine) as db:
+        db.add_all([Categoria(nombre="A"), Categoria(nombre="B")])
+        db.flush()
+        db.add(Gasto(monto_centavos=1000, descripcion="x", categoria_id=1, fecha=date(2022, 3, 1)))
+        db.commit()
+    archive_year(engine, 2022)
+
+    with Session(engine) as db:
+        with pytest.raises(CategoryMergeError):
+            CategoryService(db).merge_category(1, 2)
+        assert ExpenseService(db).get_monthly_summary(2022, 3).por_categoria == {"A": 10}
+
+    unarchive_year(engine, 2022)
+    with Session(engine) as db:
+        CategoryService(db).merge_category(1, 2)
+        assert ExpenseService(db).get_monthly_summary(2022, 3).por_categoria == {"B": 10}
+    engine.dispose()
+
+
+def test_analytics_cover_archived_years(tmp_path, monkeypatch):
+    """Test the analytics snapshot reads archived years and is rebuilt when the archive changes"""
+    from datetime import date
+    from sqlalchemy.orm import Session
+    from app.archive import archive_year, unarchive_year
+    from app.database import init_db, make_engine
+    from app.models import Categoria, Gasto
+    from app.services.analytics_store import get_expense_store
+    from app.services.expense_service import ExpenseService
+
+    monkeypatch.setattr(settings, "analytics_store_enabled", True)
+    engine = make_engine(f"sqlite:///{tmp_path / 'hot.db'}")
+    init_db(engine)
+    with Session(engine) as db:
+        db.add(Categoria(nombre="A"))
+        db.flush()
+        db.add(Gasto(monto_centavos=1000, descripcion="x", categoria_id=1, fecha=date(2022, 3, 1)))
+        db.commit()
+        store = get_expense_store(db)
+        assert ExpenseService(db).get_yearly_summary(2022).total == 10
+    assert store.loaded
+
+    for move in (archive_year, unarchive_year, archive_year):
+        move(engine, 2022)
+        with Session(engine) as db:
+            db.connection()
+            # Rows moved between files: the snapshot is rebuilt from where they are now
+            assert not store.loaded
+            service = ExpenseService(db)
+            assert service.get_yearly_summary(2022).total == 10
+            assert service.get_monthly_summary(2022, 3).por_categoria == {"A": 10}
+            assert store.loaded and len(store) == 1
+    engine.dispose()
+
+
+def test_archive_attaches_once_for_any_number_of_years(tmp_path):
+    """Test more archived years than SQLite can attach files still leave the database usable"""
+    from datetime import date
+    from sqlalchemy.orm import Session
+    from app.archive import archive_year
+    from app.database import init_db, make_engine
+    from app.models import Categoria, Gasto
+    from app.repositories.gasto_repository import GastoRepository
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'hot.db'}")
+    init_db(engine)
+    years = range(2008, 2020)
+    with Session(engine) as db:
+        db.add(Categoria(nombre="Comida"))
+        db.flush()
+        for year in [*years, date.today().year]:
+            db.add(Gasto(monto_centavos=100, descripcion="x", categoria_id=1, fecha=date(year, 1, 1)))
+        db.commit()
+    for year in years:
+        assert archive_year(engine, year) == 1
+
+    with Session(engine) as db:
+        repo = GastoRepository(db)
+        assert repo.get_monthly_total(2024, 1) == 0
+        assert repo.get_monthly_total(2010, 1) == 100
+        assert len(repo.find_by_categoria(1)) == len(years) + 1
+    engine.dispose()
+
+
+def test_backup_includes_archive(tmp_path, monkeypatch):
+    """Test a stepped WAL backup copies the archived years along with the database"""
+    import io
+    import sqlite3
+    import tarfile
+    from datetime import date
+    from sqlalchemy.orm import Session
+    from app.archive import archive_year
+    from app.database import init_db, make_engine
+    from app.models import Categoria, Gasto
+    from app.services.backup_service import BackupService, stream_tar_gz
+
+    monkeypatch.setattr(settings, "sqlite_journal_mode", "wal")
+    engine = make_engine(f"sqlite:///{tmp_path / 'hot.db'}")
+    init_db(engine)
+    with Session(engine) as db:
+        db.add(Categoria(nombre="Comida"))
+        db.flush()
+        for fecha in (date(2021, 3, 1), date(date.today().year, 1, 1)):
+            db.add(Gasto(monto_centavos=100, descripcion=str(fecha.year), categoria_id=1, fecha=fecha))
+        db.commit()
+    archive_year(engine, 2021)
+
+    with Session(engine) as db:
+        snapshot = BackupService(db).snapshot(pages_per_step=1, sleep_seconds=0)
+    content = b"".join(stream_tar_gz(snapshot))
+    assert not any(path.exists() for _, path in snapshot)
+
+    rows = {}
+    with tarfile.open(fileobj=io.BytesIO(content), mode="r:gz") as backup:
+        for member in backup.getmembers():
+            copy = sqlite3.connect(":memory:")
+            copy.deserialize(backup.extractfile(member).read())
+            rows[member.name] = copy.execute("SELECT descripcion FROM gastos").fetchall()
+    assert rows == {"hot.db": [(str(date.today().year),)], "hot.db.archive.db": [("2021",)]}
+    engine.dispose()
+
+
+def test_expense_search_is_index_backed(tmp_path):
+    """Test every combination of search filters walks an index on SQLite"""
+    import itertools
+    from datetime import date
+    from sqlalchemy.orm import Session
+    from app.database import init_db, make_engine
+    from app.repositories.gasto_repository import GastoRepository
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    init_db(engine)
+    with Session(engine) as db:
+        repo = GastoRepository(db)
+        for dated, categorias, montos, texto, sort, after in itertools.product(
+            (False, True), ((), (1,), (1, 2)), ((None, None), (100, 500), (250, 250)),
+            (None, "cafe"), ("-fecha", "monto"), (False, True),
+        ):
+            query = repo.search_query(
+                start_date=date(2024, 1, 1) if dated else None,
+                end_date=date(2024, 3, 31) if dated else None,
+                categoria_ids=categorias,
+                monto_min=montos[0],
+                monto_max=montos[1],
+                texto=texto,
+                sort=sort,
+                after=((date(2024, 2, 1) if sort == "-fecha" else 300), 10) if after else None,
+            )
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            assert "INDEXED BY" in sql
+            plan = [row[3] for row in db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+            assert all("USING INDEX" in step or "TEMP B-TREE" in step for step in plan), plan
+            repo.search(
+                categoria_ids=categorias, monto_min=montos[0], monto_max=montos[1],
+                texto=texto, sort=sort,
+            )
+    engine.dispose()
+
+
+def test_expense_search_survives_missing_or_unusable_indexes(tmp_path):
+    """Test search hints never turn a dropped or unusable index into an error"""
+    from datetime import date
+    from sqlalchemy import select
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.orm import Session
+    from app.database import init_db, make_engine
+    from app.models import Categoria, Gasto
+    from app.repositories.gasto_repository import GastoRepository
+
+    # Table hints stay ignored on SQLite: the repository does not patch the compiler
+    hinted = select(Gasto).with_hint(Gasto, "INDEXED BY ix_gastos_monto", "sqlite")
+    assert "INDEXED BY" not in str(hinted.compile(dialect=sqlite.dialect()))
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    init_db(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_gastos_fecha_categoria_monto")
+        # A partial index the planner cannot use for an unfiltered walk
+        conn.exec_driver_sql("DROP INDEX ix_gastos_monto")
+        conn.exec_driver_sql(
+            "CREATE INDEX ix_gastos_monto ON gastos (monto_centavos) WHERE monto_centavos > 100000"
+        )
+    with Session(engine) as db:
+        db.add(Categoria(nombre="Comida"))
+        db.flush()
+        db.add(Gasto(monto_centavos=100, descripcion="x", categoria_id=1, fecha=date(2024, 1, 1)))
+        db.commit()
+
+        repo = GastoRepository(db)
+        assert len(repo.search(sort="-fecha")) == 1
+        assert len(repo.search(sort="monto")) == 1
+    engine.dispose()
+
+
+def test_make_engine_rejects_unsupported_databases():
+    """Test databases without ON CONFLICT/RETURNING upserts are refused up front"""
+    import pytest
+    from app.database import make_engine
+
+    with pytest.raises(ValueError, match="mysql"):
+        make_engine("mysql+pymysql://user@localhost/gastos")
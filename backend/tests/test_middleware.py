@@ -0,0 +1,69 @@
+import asyncio
+from app.middleware.admission import AdmissionController, ConcurrencyClass
+
+
+def make_controller() -> AdmissionController:
+    return AdmissionController(
+        heavy=ConcurrencyClass("heavy", limit=1, max_queue=1),
+        light=ConcurrencyClass("light", limit=8, max_queue=8),
+        heavy_routes=["GET /api/expenses?", "GET /api/expenses/dashboard/*", "GET /api/export?*full=1*"],
+        exempt_routes=["GET /api/events"]
+    )
+
+
+def test_classify_routes():
+    """Test requests are mapped to the configured concurrency classes"""
+    controller = make_controller()
+
+    assert controller.classify("GET", "/api/expenses").name == "heavy"
+    assert controller.classify("GET", "/api/expenses", "limit=10").name == "light"
+    assert controller.classify("GET", "/api/expenses/dashboard/monthly", "year=2024").name == "heavy"
+    assert controller.classify("GET", "/api/expenses/dashboard/monthly").name == "heavy"
+    assert controller.classify("GET", "/api/export", "full=1").name == "heavy"
+    assert controller.classify("GET", "/api/export", "full=0").name == "light"
+    assert controller.classify("GET", "/api/categories/1").name == "light"
+    assert controller.classify("GET", "/health") is None
+    assert controller.classify("GET", "/api/events") is None
+
+
+def test_configured_heavy_routes_match_with_query_strings():
+    """Test the default heavy routes still match when their parameters are given"""
+    controller = AdmissionController.from_settings()
+
+    assert controller.classify("GET", "/api/expenses/forecast").name == "heavy"
+    assert controller.classify("GET", "/api/expenses/forecast", "months=3").name == "heavy"
+    stats_query = "start=2024-01-01&end=2024-12-31"
+    assert controller.classify("GET", "/api/expenses/stats", stats_query).name == "heavy"
+    # Listings are paginated, only a text search scans the table
+    assert controller.classify("GET", "/api/expenses").name == "light"
+    assert controller.classify("GET", "/api/expenses", "limit=50&sort=monto").name == "light"
+    assert controller.classify("GET", "/api/expenses", "q=cafe").name == "heavy"
+    assert controller.classify("GET", "/api/expenses", "limit=50&q=cafe").name == "heavy"
+
+
+def test_rejects_when_queue_is_full():
+    """Test a saturated class queues up to max_queue and rejects the rest"""
+    klass = ConcurrencyClass("heavy", limit=1, max_queue=1)
+
+    async def scenario():
+        assert await klass.acquire()
+        queued = asyncio.create_task(klass.acquire())
+        await asyncio.sleep(0)
+        assert klass.waiting == 1
+
+        assert not await klass.acquire()
+
+        klass.release()
+        assert await queued
+        klass.release()
+
+    asyncio.run(scenario())
+
+    assert klass.stats() == {
+        "limit": 1,
+        "max_queue": 1,
+        "in_flight": 0,
+        "waiting": 0,
+        "admitted": 2,
+        "rejected": 1,
+    }
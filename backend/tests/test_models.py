@@ -65,3 +65,94 @@ def test_gasto_categoria_relationship(db_session, sample_categoria):
     assert gasto.categoria.nombre == sample_categoria.nombre
     assert len(sample_categoria.gastos) == 1
     assert sample_categoria.gastos[0].id == gasto.id
+
+
+def test_gasto_monto_stored_as_centavos(db_session, sample_categoria):
+    """Test that amounts are stored as integer cents"""
+    gasto = Gasto(
+        monto=Decimal("19.99"),
+        descripcion="Test",
+        categoria_id=sample_categoria.id,
+        fecha=date(2024, 1, 15)
+    )
+
+    db_session.add(gasto)
+    db_session.commit()
+    db_session.refresh(gasto)
+
+    assert gasto.monto_centavos == 1999
+    assert gasto.monto == Decimal("19.99")
+
+
+def test_migrate_monto_to_centavos(tmp_path):
+    """Test migrating a legacy NUMERIC monto column to integer cents"""
+    from sqlalchemy import create_engine, text
+    from app.migrations import run_migrations
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE gastos (id INTEGER PRIMARY KEY, monto NUMERIC(10, 2) NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO gastos (id, monto) VALUES (1, 1500.5), (2, 0.07)"))
+
+    run_migrations(engine)
+    run_migrations(engine)  # Idempotent
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT * FROM gastos ORDER BY id")).mappings().all()
+
+    assert [dict(row) for row in rows] == [
+        {"id": 1, "monto_centavos": 150050, "version": 1},
+        {"id": 2, "monto_centavos": 7, "version": 1},
+    ]
+
+
+def test_redundant_date_index_is_dropped(tmp_path):
+    """Test databases created with ix_gastos_fecha lose it once the composite index covers it"""
+    from sqlalchemy import inspect
+    from app.database import init_db, make_engine
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    init_db(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE INDEX ix_gastos_fecha ON gastos (fecha)")
+
+    init_db(engine)
+
+    names = {index["name"] for index in inspect(engine).get_indexes("gastos")}
+    assert "ix_gastos_fecha" not in names and "ix_gastos_fecha_categoria_monto" in names
+    engine.dispose()
+
+
+def test_backfill_resumen_mensual(db_session, sample_categoria):
+    """Test monthly totals are rebuilt from gastos when missing"""
+    from app.migrations import backfill_resumen_mensual
+    from app.models.resumen_mensual import ResumenMensual
+
+    for monto, fecha in (("1.00", date(2024, 1, 5)), ("2.50", date(2024, 1, 9))):
+        db_session.add(Gasto(
+            monto=Decimal(monto),
+            descripcion="Test",
+            categoria_id=sample_categoria.id,
+            fecha=fecha
+        ))
+    db_session.commit()
+
+    backfill_resumen_mensual(db_session.connection())
+
+    resumen = db_session.query(ResumenMensual).one()
+    assert (resumen.anio, resumen.mes, resumen.total_centavos, resumen.cantidad) == (2024, 1, 350, 2)
+
+
+def test_gasto_date_indexes(db_session):
+    """Test the date indexes exist, BRIN only on PostgreSQL"""
+    from sqlalchemy import inspect
+
+    names = {index["name"] for index in inspect(db_session.get_bind()).get_indexes("gastos")}
+
+    assert {"ix_gastos_categoria_fecha", "ix_gastos_fecha_categoria_monto",
+            "ix_gastos_monto", "ix_gastos_categoria_monto"} <= names
+    # Covered by ix_gastos_fecha_categoria_monto
+    assert "ix_gastos_fecha" not in names
+    assert ("ix_gastos_fecha_brin" in names) == (db_session.get_bind().dialect.name == "postgresql")
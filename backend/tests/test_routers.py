@@ -1,3 +1,4 @@
+import io
 from decimal import Decimal
 from datetime import date
 
@@ -60,6 +61,52 @@ def test_get_expenses(client, sample_categoria):
     assert data[0]["descripcion"] == "Test"
 
 
+def test_search_expenses(client, sample_categoria):
+    """Test GET /api/expenses combines every filter and pages with a cursor"""
+    categoria_id = sample_categoria.id
+    otra_id = client.post("/api/categories", json={"nombre": "Transporte"}).json()["id"]
+    for monto, descripcion, categoria, fecha in [
+        (10, "Café", categoria_id, "2024-01-05"),
+        (25, "Café con leche", categoria_id, "2024-01-20"),
+        (40, "Cafetería", otra_id, "2024-02-10"),
+        (60, "Taxi al café", otra_id, "2024-02-11"),
+        (80, "Café 100%", categoria_id, "2024-03-01"),
+        (90, "Almuerzo", categoria_id, "2024-02-15"),
+    ]:
+        client.post("/api/expenses", json={
+            "monto": monto, "descripcion": descripcion, "categoria_id": categoria, "fecha": fecha
+        })
+
+    response = client.get("/api/expenses", params={
+        "start": "2024-01-10", "end": "2024-03-31",
+        "categoria_id": [categoria_id, otra_id],
+        "monto_min": "20", "monto_max": "85", "q": "CAF", "sort": "-monto",
+    })
+    assert response.status_code == 200
+    assert [e["monto"] for e in response.json()] == ["80.00", "60.00", "40.00", "25.00"]
+    assert "x-next-cursor" not in response.headers
+
+    # LIKE wildcards in the text are matched literally
+    assert [e["monto"] for e in client.get("/api/expenses", params={"q": "100%"}).json()] == ["80.00"]
+    assert len(client.get("/api/expenses", params={"year": 2024, "month": 2}).json()) == 3
+
+    pages, cursor = [], None
+    while True:
+        params = {"sort": "fecha", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/expenses", params=params)
+        pages.append([e["fecha"] for e in response.json()])
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert pages == [
+        ["2024-01-05", "2024-01-20"], ["2024-02-10", "2024-02-11"], ["2024-02-15", "2024-03-01"]
+    ]
+
+    assert client.get("/api/expenses", params={"cursor": "nope"}).status_code == 400
+    assert client.get("/api/expenses", params={"monto_min": 5, "monto_max": 1}).status_code == 400
+    assert client.get("/api/expenses", params={"month": 2}).status_code == 400
+
+
 def test_get_expense_by_id(client, sample_categoria):
     """Test GET /api/expenses/{id}"""
     # Create expense
@@ -160,3 +207,514 @@ def test_health_check(client):
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "ok"
+
+
+def test_budget_endpoints(client, sample_categoria):
+    """Test POST /api/budgets and GET /api/budgets/status"""
+    categoria_id = sample_categoria.id
+
+    response = client.post(
+        "/api/budgets",
+        json={"categoria_id": categoria_id, "monto": 100}
+    )
+    assert response.status_code == 201
+
+    expense = client.post(
+        "/api/expenses",
+        json={
+            "monto": 90.00,
+            "descripcion": "Test",
+            "categoria_id": categoria_id,
+            "fecha": str(date.today())
+        }
+    ).json()
+    assert expense["alertas_presupuesto"][0]["umbral"] == 0.8
+
+    response = client.get("/api/budgets/status")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["categoria_id"] == categoria_id
+    assert data[0]["gastado"] == "90.00"
+
+
+def test_subscription_materialize(client, sample_categoria):
+    """Test POST /api/subscriptions and POST /api/subscriptions/materialize"""
+    response = client.post(
+        "/api/subscriptions",
+        json={
+            "nombre": "Streaming",
+            "monto": 9.99,
+            "categoria_id": sample_categoria.id,
+            "fecha_inicio": str(date.today())
+        }
+    )
+    assert response.status_code == 201
+
+    response = client.post("/api/subscriptions/materialize")
+
+    assert response.status_code == 200
+    assert response.json()["gastos_creados"] == 1
+    assert client.get("/api/subscriptions").json()[0]["materializado_hasta"] == str(date.today())
+
+
+def test_batch(client, sample_categoria):
+    """Test POST /api/batch runs writes and reads in one request"""
+    today = date.today()
+    expense = {
+        "monto": 10.50,
+        "descripcion": "Batch",
+        "categoria_id": sample_categoria.id,
+        "fecha": str(today)
+    }
+
+    response = client.post(
+        "/api/batch",
+        json={"operations": [
+            {"op": "create_expense", "data": expense},
+            {"op": "create_expense", "data": expense},
+            {"op": "get_summary", "year": today.year, "month": today.month},
+            {"op": "list_categories", "active_only": True},
+        ]}
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["op"] for r in results] == [
+        "create_expense", "create_expense", "get_summary", "list_categories"
+    ]
+    assert results[2]["result"]["total"] == "21.00"
+    assert results[3]["result"][0]["nombre"] == "Test Category"
+
+
+def test_batch_is_all_or_nothing(client, sample_categoria):
+    """Test a failing operation rolls back the whole batch"""
+    response = client.post(
+        "/api/batch",
+        json={"operations": [
+            {"op": "create_expense", "data": {
+                "monto": 10.50,
+                "descripcion": "Batch",
+                "categoria_id": sample_categoria.id,
+                "fecha": str(date.today())
+            }},
+            {"op": "delete_expense", "id": 999},
+        ]}
+    )
+
+    assert response.status_code == 404
+    assert response.json()["detail"]["index"] == 1
+    assert client.get("/api/expenses").json() == []
+
+
+def test_admission_stats(client):
+    """Test GET /api/admin/admission"""
+    client.get("/api/categories")
+
+    response = client.get("/api/admin/admission")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {"heavy", "light"}
+    assert data["light"]["admitted"] >= 1
+
+
+def test_slow_queries_require_admin_token(client, monkeypatch):
+    """Test GET /api/admin/slow-queries is disabled without ADMIN_TOKEN and checks it otherwise"""
+    from app.config import settings
+
+    assert client.get("/api/admin/slow-queries").status_code == 403
+
+    monkeypatch.setattr(settings, "admin_token", "admin-secret")
+    assert client.get("/api/admin/slow-queries").status_code == 401
+    wrong = client.get("/api/admin/slow-queries", headers={"X-Admin-Token": "guess"})
+    assert wrong.status_code == 401
+    response = client.get("/api/admin/slow-queries", headers={"X-Admin-Token": "admin-secret"})
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+
+def test_admission_rejections_carry_cors_headers(client, monkeypatch):
+    """Test a 503 from admission control is readable by browsers on other origins"""
+    from app.middleware.admission import ConcurrencyClass, admission_controller
+
+    monkeypatch.setattr(admission_controller, "heavy", ConcurrencyClass("heavy", limit=0, max_queue=0))
+
+    response = client.get("/api/expenses/forecast", headers={"Origin": "http://localhost:3000"})
+
+    assert response.status_code == 503
+    assert response.headers["access-control-allow-origin"]
+    assert "Retry-After" in response.headers["access-control-expose-headers"]
+
+
+def test_import_categories(client, sample_categoria):
+    """Test POST /api/categories/import upserts by name"""
+    response = client.post(
+        "/api/categories/import",
+        json=[
+            {"nombre": "Test Category", "color": "#00FF00"},
+            {"nombre": "Nueva", "icono": "🎯"},
+        ]
+    )
+
+    assert response.status_code == 200
+    data = {c["nombre"]: c for c in response.json()}
+    assert data["Test Category"]["color"] == "#00FF00"
+    assert data["Nueva"]["icono"] == "🎯"
+    assert len(client.get("/api/categories").json()) == 2
+
+
+def test_export_expenses(client, sample_categoria):
+    """Test GET /api/expenses/export streams CSV"""
+    categoria_id = sample_categoria.id
+
+    for descripcion in ("Primero", "Segundo"):
+        client.post(
+            "/api/expenses",
+            json={
+                "monto": 12.5,
+                "descripcion": descripcion,
+                "categoria_id": categoria_id,
+                "fecha": "2024-01-15"
+            }
+        )
+
+    response = client.get("/api/expenses/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert lines[0] == "id,fecha,monto,categoria_id,descripcion,notas"
+    assert lines[1].split(",")[1:4] == ["2024-01-15", "12.50", str(categoria_id)]
+    assert len(lines) == 3
+
+
+def test_update_category(client, sample_categoria):
+    """Test PATCH /api/categories/{id} only changes the fields sent"""
+    categoria_id = sample_categoria.id
+
+    response = client.patch(
+        f"/api/categories/{categoria_id}",
+        json={"nombre": "Renombrada", "activo": False}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["nombre"] == "Renombrada"
+    assert data["activo"] is False
+    assert data["color"] == "#FF0000"
+    assert client.patch("/api/categories/999", json={"activo": False}).status_code == 404
+
+
+def test_merge_category(client, sample_categoria):
+    """Test POST /api/categories/{id}/merge-into/{target} moves expenses and totals"""
+    source_id = sample_categoria.id
+    target_id = client.post("/api/categories", json={"nombre": "Destino"}).json()["id"]
+
+    for categoria_id, monto in ((source_id, 10), (source_id, 5), (target_id, 1)):
+        client.post(
+            "/api/expenses",
+            json={
+                "monto": monto,
+                "descripcion": "Gasto",
+                "categoria_id": categoria_id,
+                "fecha": "2024-01-15"
+            }
+        )
+
+    response = client.post(f"/api/categories/{source_id}/merge-into/{target_id}")
+
+    assert response.status_code == 200
+    assert response.json()["gastos_reasignados"] == 2
+    summary = client.get("/api/expenses/dashboard/monthly?year=2024&month=1").json()
+    assert summary["por_categoria"] == {"Destino": "16.00"}
+    assert client.get(f"/api/categories/{source_id}").json()["activo"] is False
+    assert client.post(f"/api/categories/{target_id}/merge-into/{target_id}").status_code == 400
+
+
+def test_update_expense(client, sample_categoria):
+    """Test PATCH /api/expenses/{id} is a versioned compare-and-swap"""
+    categoria_id = sample_categoria.id
+    created = client.post(
+        "/api/expenses",
+        json={
+            "monto": 10,
+            "descripcion": "Almuerzo",
+            "categoria_id": categoria_id,
+            "fecha": "2024-01-15"
+        }
+    ).json()
+    expense_id = created["id"]
+    etag = client.get(f"/api/expenses/{expense_id}").headers["etag"]
+
+    response = client.patch(
+        f"/api/expenses/{expense_id}",
+        json={"monto": 25.5, "fecha": "2024-02-01"},
+        headers={"If-Match": etag}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert response.json()["descripcion"] == "Almuerzo"
+    assert response.headers["etag"] == '"2"'
+
+    stale = client.patch(f"/api/expenses/{expense_id}", json={"monto": 1}, headers={"If-Match": etag})
+    assert stale.status_code == 409
+    assert client.patch(f"/api/expenses/{expense_id}", json={"monto": 1}).status_code == 428
+    assert client.patch("/api/expenses/999", json={"version": 1}).status_code == 404
+
+    any_version = client.patch(f"/api/expenses/{expense_id}", json={"notas": "x"}, headers={"If-Match": "*"})
+    assert any_version.headers["etag"] == '"3"'
+    listed = client.patch(
+        f"/api/expenses/{expense_id}", json={"notas": "y"}, headers={"If-Match": '"1", "3"'}
+    )
+    assert listed.headers["etag"] == '"4"'
+    unlisted = client.patch(
+        f"/api/expenses/{expense_id}", json={"notas": "z"}, headers={"If-Match": '"1", "2"'}
+    )
+    assert unlisted.status_code == 409
+    assert client.patch("/api/expenses/999", json={}, headers={"If-Match": "*"}).status_code == 404
+
+    enero = client.get("/api/expenses/dashboard/monthly?year=2024&month=1").json()
+    febrero = client.get("/api/expenses/dashboard/monthly?year=2024&month=2").json()
+    assert enero["count"] == 0
+    assert febrero["total"] == "25.50"
+    assert febrero["count"] == 1
+
+
+def test_group_commit_routes(client, db_session, sample_categoria, monkeypatch):
+    """Test creates and deletes go through the group commit writer when it is enabled"""
+    from sqlalchemy.orm import sessionmaker
+    from app.config import settings
+    from app.main import app
+    from app.routers.gastos import get_writer
+    from app.services.expense_writer import GroupCommitWriter
+
+    writer = GroupCommitWriter(sessionmaker(bind=db_session.get_bind()), max_delay_ms=0)
+    monkeypatch.setattr(settings, "group_commit_enabled", True)
+    monkeypatch.setitem(app.dependency_overrides, get_writer, lambda: writer)
+
+    created = client.post("/api/expenses", json={
+        "monto": 7, "descripcion": "Agrupado", "categoria_id": sample_categoria.id, "fecha": "2024-01-15"
+    })
+    assert created.status_code == 201
+    missing = client.post("/api/expenses", json={
+        "monto": 7, "descripcion": "x", "categoria_id": sample_categoria.id + 100, "fecha": "2024-01-15"
+    })
+    assert missing.status_code == 404
+    assert client.get(f"/api/expenses/{created.json()['id']}").json()["descripcion"] == "Agrupado"
+
+    assert client.delete(f"/api/expenses/{created.json()['id']}").status_code == 204
+    assert client.delete(f"/api/expenses/{created.json()['id']}").status_code == 404
+    assert writer.stats() == {"batches": 4, "writes": 4}
+
+
+def test_get_expenses_msgpack(client, sample_categoria):
+    """Test GET /api/expenses honors Accept: application/msgpack"""
+    import msgpack
+
+    categoria_id = sample_categoria.id
+    client.post(
+        "/api/expenses",
+        json={
+            "monto": 12.5,
+            "descripcion": "Café",
+            "categoria_id": categoria_id,
+            "fecha": "2024-01-15"
+        }
+    )
+
+    response = client.get("/api/expenses", headers={"Accept": "application/msgpack"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    header, *rows = msgpack.Unpacker(io.BytesIO(response.content))
+    expense = dict(zip(header, rows[0]))
+    assert len(rows) == 1
+    assert expense["monto_centavos"] == 1250
+    assert expense["fecha"] == date(2024, 1, 15).toordinal()
+    assert expense["descripcion"] == "Café"
+    assert response.headers["vary"] == "Accept"
+    as_json = client.get("/api/expenses")
+    assert as_json.json()[0]["monto"] == "12.50"
+    assert as_json.headers["vary"] == "Accept"
+
+
+def test_backup(client, db_session, sample_categoria, monkeypatch):
+    """Test GET /api/admin/backup streams a gzipped tar with a consistent copy of the database"""
+    import io
+    import sqlite3
+    import tarfile
+    import pytest
+    from app.config import settings
+
+    if db_session.get_bind().dialect.name != "sqlite":
+        pytest.skip("Online backups are SQLite only")
+
+    categoria_id = sample_categoria.id
+    client.post(
+        "/api/expenses",
+        json={"monto": 3, "descripcion": "Copia", "categoria_id": categoria_id, "fecha": "2024-01-15"}
+    )
+    assert client.get("/api/admin/backup").status_code == 403
+    monkeypatch.setattr(settings, "admin_token", "admin-secret")
+    headers = {"X-Admin-Token": "admin-secret"}
+
+    response = client.get("/api/admin/backup", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    with tarfile.open(fileobj=io.BytesIO(response.content), mode="r:gz") as archive:
+        (member,) = archive.getmembers()
+        copy = sqlite3.connect(":memory:")
+        copy.deserialize(archive.extractfile(member).read())
+    assert copy.execute("SELECT descripcion FROM gastos").fetchall() == [("Copia",)]
+
+    # The test database uses a rollback journal, where the copy cannot be stepped
+    stepped = client.get("/api/admin/backup?pages_per_step=1&sleep_seconds=0", headers=headers)
+    assert stepped.status_code == 400
+
+
+def test_report_job(client, db_session, sample_categoria, tmp_path, monkeypatch):
+    """Test POST /api/reports builds a yearly report in a worker and caches it by data version"""
+    import time
+    from app.services.report_service import report_jobs
+
+    monkeypatch.setattr(report_jobs, "cache_dir", tmp_path)
+    categoria_id = sample_categoria.id
+    for monto, fecha, notas in (("10.00", "2023-01-05", None), ("4.50", "2023-03-09", "Suscripción #1")):
+        client.post("/api/expenses", json={
+            "monto": monto, "descripcion": "Test", "categoria_id": categoria_id,
+            "fecha": fecha, "notas": notas
+        })
+
+    response = client.post("/api/reports", json={"year": 2023})
+    assert response.status_code == 202
+    job = response.json()
+    deadline = time.monotonic() + 60
+    while job["status"] in ("pending", "running") and time.monotonic() < deadline:
+        time.sleep(0.1)
+        job = client.get(f"/api/reports/{job['id']}").json()
+
+    assert job["status"] == "done"
+    report = job["resultado"]
+    assert (report["meses"], report["total"], report["count"]) == (12, "14.50", 2)
+    assert report["por_mes"][0]["gastos"] == "10.00"
+    assert report["por_mes"][2]["suscripciones"] == "4.50"
+    assert report["por_categoria"][0]["por_mes"][2] == "4.50"
+
+    # Unchanged data is served from the cached file straight away
+    cached = client.post("/api/reports", json={"year": 2023}).json()
+    assert (cached["status"], cached["version"]) == ("done", job["version"])
+
+    client.post("/api/expenses", json={
+        "monto": "1.00", "descripcion": "Nuevo", "categoria_id": categoria_id, "fecha": "2023-06-01"
+    })
+    assert client.post("/api/reports", json={"year": 2023}).json()["version"] != job["version"]
+    assert client.get("/api/reports/unknown").status_code == 404
+    # Jobs are only visible to requests on the database they were made for
+    assert report_jobs.get(job["id"], "sqlite:///another-tenant.db") is None
+
+
+def test_report_version_survives_reused_ids(db_session, sample_categoria):
+    """Test an expense recreated under a deleted expense's id changes the report's data version"""
+    from datetime import date
+    from app.models import Gasto
+    from app.services.report_service import data_version
+
+    def add(gasto_id, monto, fecha):
+        db_session.add(Gasto(
+            id=gasto_id, monto_centavos=monto, descripcion="x",
+            categoria_id=sample_categoria.id, fecha=fecha
+        ))
+        db_session.flush()
+
+    add(1, 500, date(2023, 2, 1))
+    add(2, 1000, date(2023, 3, 1))
+    before = data_version(db_session, 2023, 12)
+    # What SQLite does without AUTOINCREMENT: the newest id is handed out again
+    db_session.delete(db_session.get(Gasto, 2))
+    db_session.flush()
+    add(2, 99900, date(2023, 5, 1))
+
+    assert data_version(db_session, 2023, 12) != before
+
+
+def test_report_version_changes_on_category_merge(db_session, sample_categoria):
+    """Test merging categories changes the report's data version though no row version moves"""
+    from datetime import date
+    from app.models import Gasto
+    from app.schemas.categoria import CategoriaCreate
+    from app.services.category_service import CategoryService
+    from app.services.report_service import data_version
+
+    service = CategoryService(db_session)
+    otra = service.create_category(CategoriaCreate(nombre="Ocio"))
+    for categoria_id in (sample_categoria.id, otra.id):
+        db_session.add(Gasto(monto_centavos=500, descripcion="x",
+                             categoria_id=categoria_id, fecha=date(2023, 2, 1)))
+    db_session.commit()
+    before = data_version(db_session, 2023, 12)
+
+    service.merge_category(otra.id, sample_categoria.id)
+
+    assert data_version(db_session, 2023, 12) != before
+
+
+def test_report_cache_is_pruned(tmp_path):
+    """Test the report directory keeps the most recently used files, and those of live jobs"""
+    import os
+    from app.services.report_service import ReportJob, ReportJobs
+
+    jobs = ReportJobs(str(tmp_path), workers=1, max_jobs=10, max_files=2)
+    paths = []
+    for age in range(4, 0, -1):
+        path = tmp_path / f"{age}.json"
+        path.write_text("{}")
+        os.utime(path, (1000 - age, 1000 - age))
+        paths.append(path)
+    oldest = paths[0]
+    job = ReportJob("sqlite:///gastos.db", 2023, "4", oldest)
+    jobs._jobs[job.id] = job
+
+    assert jobs.prune() == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["1.json", "2.json", "4.json"]
+
+
+def test_forecast(client, sample_categoria):
+    """Test GET /api/expenses/forecast projects the requested months"""
+    from datetime import date
+
+    client.post("/api/expenses", json={
+        "monto": "20.00", "descripcion": "Hoy", "categoria_id": sample_categoria.id,
+        "fecha": date.today().isoformat()
+    })
+
+    response = client.get("/api/expenses/forecast?months=2")
+
+    assert response.status_code == 200
+    por_mes = response.json()["por_mes"]
+    assert len(por_mes) == 2
+    assert por_mes[0]["actual"] == "20.00"
+    assert client.get("/api/expenses/forecast?months=0").status_code == 422
+
+
+def test_category_stats(client, sample_categoria):
+    """Test GET /api/expenses/stats returns the distribution and largest expenses per category"""
+    categoria_id, nombre = sample_categoria.id, sample_categoria.nombre
+    for monto, fecha in (("10.00", "2024-05-01"), ("30.00", "2024-05-02"), ("20.00", "2024-05-03"),
+                         ("99.00", "2024-06-01")):
+        client.post("/api/expenses", json={
+            "monto": monto, "descripcion": f"Gasto {monto}", "categoria_id": categoria_id,
+            "fecha": fecha
+        })
+
+    response = client.get("/api/expenses/stats", params={"start": "2024-05-01", "end": "2024-05-31", "top": 2})
+
+    assert response.status_code == 200
+    [categoria] = response.json()["por_categoria"]
+    assert categoria["nombre"] == nombre
+    assert (categoria["count"], categoria["total"], categoria["media"]) == (3, "60.00", "20.00")
+    assert (categoria["mediana"], categoria["p90"], categoria["maximo"]) == ("20.00", "30.00", "30.00")
+    assert [e["descripcion"] for e in categoria["mayores"]] == ["Gasto 30.00", "Gasto 20.00"]
+    assert client.get("/api/expenses/stats", params={"start": "2024-06-01", "end": "2024-05-01"}).status_code == 400
@@ -3,7 +3,7 @@ from datetime import date
 import pytest
 from app.services.expense_service import ExpenseService
 from app.services.category_service import CategoryService
-from app.schemas.gasto import GastoCreate
+from app.schemas.gasto import GastoCreate, GastoUpdate
 from app.schemas.categoria import CategoriaCreate
 from app.utils.exceptions import ExpenseNotFoundError, CategoryNotFoundError, DuplicateCategoryError
 
@@ -139,3 +139,601 @@ def test_get_active_categories(db_session):
 
     assert len(active) == 1
     assert active[0].nombre == "Active"
+
+
+def test_get_monthly_summary(db_session, sample_categoria):
+    """Test monthly summary aggregates exact cents in SQL"""
+    service = ExpenseService(db_session)
+
+    for monto in ("0.10", "0.20", "1500.50"):
+        service.create_expense(GastoCreate(
+            monto=Decimal(monto),
+            descripcion="Test",
+            categoria_id=sample_categoria.id,
+            fecha=date(2024, 1, 15)
+        ))
+    service.create_expense(GastoCreate(
+        monto=Decimal("99.99"),
+        descripcion="Other month",
+        categoria_id=sample_categoria.id,
+        fecha=date(2024, 2, 1)
+    ))
+
+    summary = service.get_monthly_summary(2024, 1)
+
+    assert summary.total == Decimal("1500.80")
+    assert summary.count == 3
+    assert summary.por_categoria == {sample_categoria.nombre: Decimal("1500.80")}
+
+
+def test_analytics_store_keeps_writes_recorded_during_load(db_session, sample_categoria):
+    """Test changes committed while the snapshot query runs are replayed, and a clear discards the load"""
+    from sqlalchemy import event
+    from app.services.analytics_store import ColumnarExpenseStore
+
+    store = ColumnarExpenseStore()
+    first = ExpenseService(db_session).create_expense(GastoCreate(
+        monto=Decimal("10.00"), descripcion="Read by the load",
+        categoria_id=sample_categoria.id, fecha=date(2024, 3, 5)
+    ))
+    during_load = []
+
+    def commit_during_load(conn, cursor, statement, *args):
+        if "ORDER BY gastos.id" in statement and during_load:
+            during_load.pop()()
+
+    bind = db_session.get_bind()
+    event.listen(bind, "before_cursor_execute", commit_during_load)
+    try:
+        def writes():
+            # Seen by the query already, then two changes it cannot see
+            store.record_insert(first.id, first.fecha, first.categoria_id, first.monto_centavos)
+            store.record_insert(first.id + 100, date(2024, 3, 6), sample_categoria.id, 500)
+            store.record_delete(first.id)
+        during_load.append(writes)
+        store.ensure_loaded(db_session)
+        assert store.loaded
+        assert store.month_totals_by_categoria(2024, 3) == {sample_categoria.id: (1, 500)}
+
+        store.clear()
+        during_load.append(store.clear)
+        store.ensure_loaded(db_session)
+        assert not store.loaded
+    finally:
+        event.remove(bind, "before_cursor_execute", commit_during_load)
+
+
+def test_analytics_store_matches_sql(db_session, sample_categoria):
+    """Test columnar store summaries match the SQL path and track writes"""
+    from app.services.analytics_store import ColumnarExpenseStore
+
+    store = ColumnarExpenseStore()
+    service = ExpenseService(db_session, store=store)
+    sql_service = ExpenseService(db_session)
+
+    first = service.create_expense(GastoCreate(
+        monto=Decimal("10.00"),
+        descripcion="Before load",
+        categoria_id=sample_categoria.id,
+        fecha=date(2024, 3, 5)
+    ))
+    assert not store.loaded
+
+    assert service.get_monthly_summary(2024, 3) == sql_service.get_monthly_summary(2024, 3)
+    assert store.loaded
+
+    # Writes after the lazy load are applied incrementally
+    for monto, fecha in (("2.50", date(2024, 3, 20)), ("7.25", date(2024, 11, 1))):
+        service.create_expense(GastoCreate(
+            monto=Decimal(monto),
+            descripcion="After load",
+            categoria_id=sample_categoria.id,
+            fecha=fecha
+        ))
+    service.delete_expense(first.id)
+
+    assert len(store) == 2
+    assert service.get_monthly_summary(2024, 3) == sql_service.get_monthly_summary(2024, 3)
+    assert service.get_yearly_summary(2024) == sql_service.get_yearly_summary(2024)
+    assert service.get_yearly_summary(2024).por_mes[10] == Decimal("7.25")
+
+
+def test_budget_threshold_crossings(db_session, sample_categoria):
+    """Test budget alerts are raised once per crossed threshold"""
+    from app.services.budget_service import BudgetService
+    from app.schemas.presupuesto import PresupuestoCreate
+
+    BudgetService(db_session).set_budget(
+        PresupuestoCreate(categoria_id=sample_categoria.id, monto=Decimal("100.00"))
+    )
+    service = ExpenseService(db_session)
+
+    def spend(monto):
+        return service.create_expense(GastoCreate(
+            monto=Decimal(monto),
+            descripcion="Test",
+            categoria_id=sample_categoria.id,
+            fecha=date(2024, 5, 10)
+        ))
+
+    assert spend("50.00").alertas_presupuesto == []
+    assert [a.umbral for a in spend("35.00").alertas_presupuesto] == [0.8]
+    assert spend("5.00").alertas_presupuesto == []
+    over = spend("20.00")
+    assert [a.umbral for a in over.alertas_presupuesto] == [1.0]
+    assert over.alertas_presupuesto[0].gastado == Decimal("110.00")
+
+
+def test_budget_alerts_on_update(db_session, sample_categoria):
+    """Test raising an expense past a threshold alerts like a create does"""
+    from app.services.budget_service import BudgetService
+    from app.schemas.presupuesto import PresupuestoCreate
+
+    BudgetService(db_session).set_budget(
+        PresupuestoCreate(categoria_id=sample_categoria.id, monto=Decimal("100.00"))
+    )
+    service = ExpenseService(db_session)
+    expense = service.create_expense(GastoCreate(
+        monto=Decimal("70.00"),
+        descripcion="Test",
+        categoria_id=sample_categoria.id,
+        fecha=date(2024, 5, 10)
+    ))
+
+    raised = service.update_expense(expense.id, 1, GastoUpdate(monto=Decimal("85.00")))
+    assert [a.umbral for a in raised.alertas_presupuesto] == [0.8]
+    assert raised.alertas_presupuesto[0].gastado == Decimal("85.00")
+    # Already past 80%: only the next threshold alerts
+    assert service.update_expense(expense.id, 2, GastoUpdate(monto=Decimal("90.00"))).alertas_presupuesto == []
+    moved = service.update_expense(expense.id, 3, GastoUpdate(fecha=date(2024, 6, 1)))
+    assert [a.umbral for a in moved.alertas_presupuesto] == [0.8]
+
+
+def test_budget_status_tracks_deletes(db_session, sample_categoria):
+    """Test budget status follows creates and deletes via monthly totals"""
+    from app.services.budget_service import BudgetService
+    from app.schemas.presupuesto import PresupuestoCreate
+
+    budget_service = BudgetService(db_session)
+    budget_service.set_budget(
+        PresupuestoCreate(categoria_id=sample_categoria.id, monto=Decimal("200.00"))
+    )
+    service = ExpenseService(db_session)
+    expense = service.create_expense(GastoCreate(
+        monto=Decimal("180.00"),
+        descripcion="Test",
+        categoria_id=sample_categoria.id,
+        fecha=date(2024, 5, 10)
+    ))
+
+    [status] = budget_service.get_status(2024, 5)
+    assert status.gastado == Decimal("180.00")
+    assert status.porcentaje == 0.9
+    assert status.umbral_alcanzado == 0.8
+
+    service.delete_expense(expense.id)
+
+    [status] = budget_service.get_status(2024, 5)
+    assert status.gastado == Decimal("0.00")
+    assert status.umbral_alcanzado is None
+
+
+def test_materialize_due_skips_only_raced_subscriptions(db_session, sample_categoria, monkeypatch):
+    """Test a subscription another worker materialized first does not discard the others' charges"""
+    from app.services.subscription_service import SubscriptionService
+    from app.schemas.suscripcion import SuscripcionCreate
+
+    service = SubscriptionService(db_session)
+    for nombre in ("Streaming", "Gimnasio"):
+        service.create_subscription(SuscripcionCreate(
+            nombre=nombre, monto=Decimal("9.99"),
+            categoria_id=sample_categoria.id, fecha_inicio=date(2024, 1, 10)
+        ))
+    find_active = service.suscripcion_repo.find_active
+
+    def raced_find_active():
+        suscripciones = find_active()
+        # Another worker advances the first watermark after it was read
+        service.suscripcion_repo.advance_watermark(suscripciones[0].id, None, date(2024, 3, 10))
+        return suscripciones
+
+    monkeypatch.setattr(service.suscripcion_repo, "find_active", raced_find_active)
+    assert service.materialize_due(date(2024, 3, 31)) == 3
+
+    gastos = ExpenseService(db_session).get_expenses_by_categoria(sample_categoria.id)
+    assert {gasto.descripcion for gasto in gastos} == {"Gimnasio"}
+
+
+def test_due_charge_dates(sample_categoria):
+    """Test charge dates clamp to month length and respect periodicity"""
+    from app.models.suscripcion import Suscripcion
+    from app.services.subscription_service import due_charge_dates
+
+    mensual = Suscripcion(periodicidad="mensual", fecha_inicio=date(2024, 1, 31))
+    assert due_charge_dates(mensual, date(2024, 4, 29)) == [
+        date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31)
+    ]
+
+    mensual.materializado_hasta = date(2024, 3, 31)
+    assert due_charge_dates(mensual, date(2024, 4, 30)) == [date(2024, 4, 30)]
+
+    anual = Suscripcion(periodicidad="anual", fecha_inicio=date(2022, 6, 15))
+    assert due_charge_dates(anual, date(2024, 6, 14)) == [date(2022, 6, 15), date(2023, 6, 15)]
+
+
+def test_materialize_due_is_idempotent(db_session, sample_categoria):
+    """Test missed periods are caught up once and never duplicated"""
+    from app.services.subscription_service import SubscriptionService
+    from app.schemas.suscripcion import SuscripcionCreate
+
+    service = SubscriptionService(db_session)
+    service.create_subscription(SuscripcionCreate(
+        nombre="Streaming",
+        monto=Decimal("9.99"),
+        categoria_id=sample_categoria.id,
+        fecha_inicio=date(2024, 1, 10)
+    ))
+
+    assert service.materialize_due(date(2024, 4, 1)) == 3
+    assert service.materialize_due(date(2024, 4, 1)) == 0
+    assert service.materialize_due(date(2024, 4, 10)) == 1
+
+    expense_service = ExpenseService(db_session)
+    assert len(expense_service.get_expenses_by_categoria(sample_categoria.id)) == 4
+    summary = expense_service.get_monthly_summary(2024, 2)
+    assert summary.total == Decimal("9.99")
+    assert summary.count == 1
+
+
+def test_seed_generates_consistent_data(db_session):
+    """Test seeding is idempotent for categories and keeps monthly totals in sync"""
+    from app.seed import DEFAULT_CATEGORIES, generate_expenses, seed_categories
+
+    seed_categories(db_session)
+    seed_categories(db_session)
+    assert len(CategoryService(db_session).get_all_categories()) == len(DEFAULT_CATEGORIES)
+
+    generate_expenses(db_session.get_bind(), 500, date(2024, 1, 1), date(2024, 3, 31), seed=1)
+
+    service = ExpenseService(db_session)
+    expenses = service.get_all_expenses()
+    assert len(expenses) == 500
+    total = sum(service.get_monthly_summary(2024, mes).total for mes in (1, 2, 3))
+    assert total == sum(expense.monto for expense in expenses)
+
+
+def test_summary_cache_serves_closed_month_without_sql(db_session, sample_categoria):
+    """Test a cached month does no SQL and only writes to that month evict it"""
+    from sqlalchemy import event
+    from app.services.result_cache import summary_cache
+
+    service = ExpenseService(db_session)
+    for fecha in (date(2024, 1, 10), date(2024, 2, 10)):
+        service.create_expense(GastoCreate(
+            monto=Decimal("10.00"),
+            descripcion="Test",
+            categoria_id=sample_categoria.id,
+            fecha=fecha
+        ))
+    service.get_monthly_summary(2024, 1)
+    service.get_monthly_summary(2024, 2)
+
+    statements = []
+    engine = db_session.get_bind()
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        summary = service.get_monthly_summary(2024, 1)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert summary.total == Decimal("10.00")
+    assert statements == []
+
+    service.create_expense(GastoCreate(
+        monto=Decimal("5.00"),
+        descripcion="Test",
+        categoria_id=sample_categoria.id,
+        fecha=date(2024, 2, 11)
+    ))
+    misses = summary_cache.stats()["misses"]
+    assert service.get_monthly_summary(2024, 2).total == Decimal("15.00")
+    assert service.get_monthly_summary(2024, 1).total == Decimal("10.00")
+    assert summary_cache.stats()["misses"] == misses + 1
+
+
+def test_result_cache_bounded_by_memory():
+    """Test the least recently used entries are evicted past max_bytes"""
+    from app.services.result_cache import ResultCache
+
+    cache = ResultCache(max_bytes=3000)
+    for key in range(5):
+        cache.get_or_compute(key, [("db", key)], lambda: "x" * 1000)
+    cache.invalidate(("db", 4))
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 3000
+    assert stats["evictions"] == 3
+    assert stats["invalidations"] == 1
+    assert cache.get_or_compute(3, [], lambda: "recomputed") == "x" * 1000
+
+
+def test_forecast_projects_month_end(db_session, sample_categoria):
+    """Test the forecast adds the projected rest of the month to what was spent, cached until a write"""
+    from datetime import timedelta
+    from sqlalchemy import event
+    from app.models.gasto import Gasto
+
+    today = date(2024, 6, 15)
+    day = date(2022, 1, 1)
+    while day < today:
+        db_session.add(Gasto(
+            monto=Decimal("10.00"), descripcion="Diario", categoria_id=sample_categoria.id, fecha=day
+        ))
+        day += timedelta(days=1)
+    db_session.add(Gasto(
+        monto=Decimal("5.00"), descripcion="Hoy", categoria_id=sample_categoria.id, fecha=today
+    ))
+    db_session.commit()
+    service = ExpenseService(db_session)
+
+    forecast = service.get_forecast(2, today=today)
+
+    junio, julio = forecast.por_mes
+    assert (junio.month, junio.actual, junio.total) == (6, Decimal("145.00"), Decimal("295.00"))
+    assert junio.por_categoria == {sample_categoria.nombre: Decimal("295.00")}
+    assert (julio.month, julio.actual, julio.total) == (7, Decimal("0.00"), Decimal("310.00"))
+
+    statements = []
+    engine = db_session.get_bind()
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert service.get_forecast(2, today=today) == forecast
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert statements == []
+
+    service.create_expense(GastoCreate(
+        monto=Decimal("50.00"), descripcion="Extra", categoria_id=sample_categoria.id, fecha=today
+    ))
+    assert service.get_forecast(2, today=today).por_mes[0].actual == Decimal("195.00")
+
+
+def test_forecast_seasonality():
+    """Test a month that is always twice as expensive is forecast that way"""
+    import numpy as np
+    from app.services.forecast import forecast_months
+
+    start, today = date(2020, 1, 1), date(2023, 11, 1)
+    ordinals = np.arange(start.toordinal(), today.toordinal() + 1)
+    months = np.array([date.fromordinal(int(ordinal)).month for ordinal in ordinals])
+    matrix = np.where(months == 12, 200.0, 100.0)[None, :]
+
+    projected, _ = forecast_months(matrix, start, today, 2)
+
+    noviembre, diciembre = projected[0]
+    # Shrunk towards no seasonality with only three Decembers of history
+    assert diciembre / 31 == pytest.approx(2 * noviembre / 30, rel=0.1)
+
+
+def test_group_commit_writer(db_session, sample_categoria):
+    """Test concurrent writes share one commit and each caller gets its own outcome"""
+    import asyncio
+    from sqlalchemy.orm import sessionmaker
+    from app.services.expense_writer import GroupCommitWriter
+
+    writer = GroupCommitWriter(sessionmaker(bind=db_session.get_bind()), max_delay_ms=50)
+    data = [
+        GastoCreate(monto=Decimal("1.25"), descripcion=f"Gasto {i}",
+                    categoria_id=sample_categoria.id, fecha=date(2024, 3, 1))
+        for i in range(10)
+    ]
+    bad = GastoCreate(monto=Decimal("1.00"), descripcion="Sin categoría",
+                      categoria_id=sample_categoria.id + 100, fecha=date(2024, 3, 1))
+
+    async def main():
+        outcomes = await asyncio.gather(
+            *(writer.create(item) for item in data), writer.create(bad), return_exceptions=True
+        )
+        deleted = await writer.delete(outcomes[0].id)
+        missing = await asyncio.gather(writer.delete(outcomes[0].id), return_exceptions=True)
+        await writer.stop()
+        return outcomes, deleted, missing[0]
+
+    outcomes, deleted, missing = asyncio.run(main())
+
+    created, error = outcomes[:-1], outcomes[-1]
+    assert len({gasto.id for gasto in created}) == 10
+    assert isinstance(error, CategoryNotFoundError)
+    assert deleted is True and isinstance(missing, ExpenseNotFoundError)
+    assert writer.stats() == {"batches": 3, "writes": 13}
+    summary = ExpenseService(db_session).get_monthly_summary(2024, 3)
+    assert (summary.count, summary.total) == (9, Decimal("11.25"))
+
+
+def test_group_commit_writer_isolates_failing_write(db_session, sample_categoria):
+    """Test a write failing the shared transaction is retried alone and the others commit"""
+    from sqlalchemy.orm import sessionmaker
+    from app.services.expense_writer import GroupCommitWriter, _create
+
+    writer = GroupCommitWriter(sessionmaker(bind=db_session.get_bind()))
+    create = _create(GastoCreate(monto=Decimal("2.00"), descripcion="Bien",
+                                 categoria_id=sample_categoria.id, fecha=date(2024, 4, 1)))
+
+    def broken(service):
+        raise RuntimeError("disk I/O error")
+
+    outcomes = writer._write([create, broken, create])
+
+    assert [ok for ok, _ in outcomes] == [True, False, True]
+    assert isinstance(outcomes[1][1], RuntimeError)
+    assert outcomes[0][1].id != outcomes[2][1].id
+    assert writer.stats() == {"batches": 1, "writes": 3}
+    summary = ExpenseService(db_session).get_monthly_summary(2024, 4)
+    assert (summary.count, summary.total) == (2, Decimal("4.00"))
+
+
+@pytest.mark.parametrize("walk_fraction", [0.0, 2.0], ids=["index_walk", "window"])
+def test_category_stats_match_sorted_amounts(db_session, sample_categoria, monkeypatch, walk_fraction):
+    """Test category statistics ranked in SQL match computing them from every amount"""
+    import math
+    import random
+    from app.repositories import gasto_repository
+    from app.models.categoria import Categoria
+    from app.models.gasto import Gasto
+
+    otra = Categoria(nombre="Transporte")
+    db_session.add(otra)
+    db_session.flush()
+    rng = random.Random(7)
+    amounts = {sample_categoria.id: [], otra.id: []}
+    for categoria_id, count in ((sample_categoria.id, 101), (otra.id, 7)):
+        for _ in range(count):
+            monto = rng.randint(1, 50) * 100
+            amounts[categoria_id].append(monto)
+            db_session.add(Gasto(
+                monto_centavos=monto, descripcion="x", categoria_id=categoria_id,
+                fecha=date(2024, 3, rng.randint(1, 31))
+            ))
+    # Outside the range
+    db_session.add(Gasto(
+        monto_centavos=999999, descripcion="x", categoria_id=otra.id, fecha=date(2024, 4, 1)
+    ))
+    db_session.commit()
+    # Both ways of reaching the ranks: stepping through the index, or ROW_NUMBER
+    monkeypatch.setattr(gasto_repository, "STATS_WALK_FRACTION", walk_fraction)
+
+    stats = ExpenseService(db_session).get_category_stats(date(2024, 3, 1), date(2024, 3, 31), top=3)
+
+    assert [c.categoria_id for c in stats.por_categoria] == sorted(
+        amounts, key=lambda categoria_id: -sum(amounts[categoria_id])
+    )
+    for categoria in stats.por_categoria:
+        ordered = sorted(amounts[categoria.categoria_id])
+        rank = lambda quantile: ordered[math.ceil(quantile * len(ordered)) - 1]
+        assert categoria.count == len(ordered)
+        assert categoria.total == Decimal(sum(ordered)) / 100
+        assert categoria.media == (Decimal(sum(ordered)) / len(ordered) / 100).quantize(Decimal("0.01"))
+        assert (categoria.mediana, categoria.p90) == (Decimal(rank(0.5)) / 100, Decimal(rank(0.9)) / 100)
+        assert categoria.maximo == Decimal(ordered[-1]) / 100
+        assert [e.monto for e in categoria.mayores] == [Decimal(m) / 100 for m in ordered[:-4:-1]]
+
+
+def test_expense_events_follow_commits(db_session, sample_categoria, monkeypatch):
+    """Test creates and deletes reach event streams with new totals only once committed"""
+    import asyncio
+    import json
+    from app.services import expense_service
+    from app.services.event_broker import EventBroker
+    from app.services.result_cache import database_tag
+
+    broker = EventBroker(max_queue=8, keepalive_seconds=5)
+    monkeypatch.setattr(expense_service, "event_broker", broker)
+    data = GastoCreate(monto=Decimal("4.50"), descripcion="Café",
+                       categoria_id=sample_categoria.id, fecha=date(2024, 5, 2))
+
+    async def main():
+        stream = broker.stream(database_tag(db_session))
+        assert (await anext(stream)).startswith(b"retry:")
+        service = ExpenseService(db_session)
+        first = service.create_expense(data)
+        service.create_expense(data)
+        pending = ExpenseService(db_session, autocommit=False)
+        pending.create_expense(data)
+        pending.rollback()
+        service.delete_expense(first.id)
+        frames = [await anext(stream) for _ in range(3)]
+        await stream.aclose()
+        return first.id, frames
+
+    first_id, frames = asyncio.run(main())
+
+    frames = [frame.decode() for frame in frames]
+    events = [frame.split("\n")[0] for frame in frames]
+    assert events == ["event: expense_created", "event: expense_created", "event: expense_deleted"]
+    payloads = [json.loads(frame.split("\n")[1].removeprefix("data: ")) for frame in frames]
+    assert payloads[0]["id"] == payloads[2]["id"] == first_id
+    assert [(p["categoria_total"], p["categoria_count"]) for p in payloads] == [
+        ("4.50", 1), ("9.00", 2), ("4.50", 1)
+    ]
+    assert (payloads[1]["year"], payloads[1]["month"], payloads[1]["month_total"]) == (2024, 5, "9.00")
+    assert broker.stats()["subscribers"] == 0
+
+
+def test_updates_and_materialized_charges_send_events(db_session, sample_categoria, monkeypatch):
+    """Test updates and materialized subscription charges reach event streams with new totals"""
+    import asyncio
+    import json
+    from app.services import expense_service, subscription_service
+    from app.services.event_broker import EventBroker
+    from app.services.result_cache import database_tag
+    from app.services.subscription_service import SubscriptionService
+    from app.schemas.suscripcion import SuscripcionCreate
+
+    broker = EventBroker(max_queue=8, keepalive_seconds=5)
+    monkeypatch.setattr(expense_service, "event_broker", broker)
+    monkeypatch.setattr(subscription_service, "event_broker", broker)
+    service = ExpenseService(db_session)
+    expense = service.create_expense(GastoCreate(
+        monto=Decimal("4.50"), descripcion="Café",
+        categoria_id=sample_categoria.id, fecha=date(2024, 5, 2)
+    ))
+    subscriptions = SubscriptionService(db_session)
+    subscriptions.create_subscription(SuscripcionCreate(
+        nombre="Streaming", monto=Decimal("9.99"),
+        categoria_id=sample_categoria.id, fecha_inicio=date(2024, 5, 10)
+    ))
+
+    async def main():
+        stream = broker.stream(database_tag(db_session))
+        assert (await anext(stream)).startswith(b"retry:")
+        service.update_expense(expense.id, expense.version, GastoUpdate(fecha=date(2024, 6, 2)))
+        subscriptions.materialize_due(date(2024, 6, 30))
+        frames = [await anext(stream) for _ in range(4)]
+        await stream.aclose()
+        return frames
+
+    frames = [frame.decode() for frame in asyncio.run(main())]
+    events = [frame.split("\n")[0].removeprefix("event: ") for frame in frames]
+    payloads = [json.loads(frame.split("\n")[1].removeprefix("data: ")) for frame in frames]
+    # The update empties May and fills June; the charges land in both
+    assert events == ["totals_changed", "expense_updated", "totals_changed", "totals_changed"]
+    assert [(p["month"], p["categoria_total"], p["month_count"]) for p in payloads] == [
+        (5, "0.00", 0), (6, "4.50", 1), (5, "9.99", 1), (6, "14.49", 2)
+    ]
+    assert payloads[1]["id"] == expense.id
+
+
+def test_event_broker_drops_slow_subscriber():
+    """Test a subscriber that stops reading is dropped without holding back the others"""
+    import asyncio
+    from app.services.event_broker import KEEPALIVE, EventBroker
+
+    broker = EventBroker(max_queue=2, keepalive_seconds=0.05)
+
+    async def main():
+        fast, slow = broker.stream("db"), broker.stream("db")
+        await anext(fast)
+        await anext(slow)
+        received = []
+        for i in range(4):
+            # From a worker thread, as ExpenseService commits in the group commit writer
+            await asyncio.to_thread(broker.publish, "db", "expense_created", {"id": i})
+            await asyncio.sleep(0)
+            received.append(await anext(fast))
+        slow_frames = [frame async for frame in slow]
+        # Idle streams get a keepalive comment
+        keepalive = await asyncio.wait_for(anext(fast), 1)
+        await fast.aclose()
+        return received, slow_frames, keepalive
+
+    received, slow_frames, keepalive = asyncio.run(main())
+
+    assert [frame.split(b"\n")[1] for frame in received] == [
+        f'data: {{"id":{i}}}'.encode() for i in range(4)
+    ]
+    assert slow_frames == [] and keepalive == KEEPALIVE
+    assert broker.stats() == {
+        "topics": 0, "subscribers": 0, "published": 4, "delivered": 6, "dropped": 1
+    }